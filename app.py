@@ -1,7 +1,19 @@
 from flask import Flask
+from werkzeug.middleware.proxy_fix import ProxyFix
 from flask_login import LoginManager
 from models import db, User
 from routes import bp as routes_blueprint
+import db_routing
+import query_stats
+import metrics
+import ratelimit
+import singleflight
+import passwords
+import profiling
+import assets
+import fragment_cache
+import cli
+import images
 import os
 from dotenv import load_dotenv
 load_dotenv()
@@ -11,8 +23,32 @@ def create_app():
     app.config['SECRET_KEY'] = 'your_secret_key'
     app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv("SQLALCHEMY_DATABASE_URI")
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
+    # Request bodies above this are refused with 413 before they are read;
+    # views with their own limit (audio uploads) lower it per request.
+    app.config['MAX_CONTENT_LENGTH'] = int(os.getenv("MAX_CONTENT_LENGTH", 25 * 1024 * 1024))
+    # Seconds /api/gifts/inbox may hold a request open. Each open poll holds a
+    # worker thread, so raise GUNICORN_THREADS along with it.
+    app.config['GIFT_INBOX_MAX_WAIT'] = int(os.getenv("GIFT_INBOX_MAX_WAIT", 0))
+
+    # Render and Replit each put one proxy in front of the app. Trusting that
+    # many X-Forwarded-For/-Proto hops makes request.remote_addr the client's
+    # address, which the per-IP rate limits key on; 0 when exposed directly.
+    hops = app.config['TRUSTED_PROXY_HOPS'] = int(os.getenv("TRUSTED_PROXY_HOPS", 1))
+    if hops:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops)
+
+    db_routing.init_app(app)
     db.init_app(app)
+    query_stats.init_app(app)
+    metrics.init_app(app, db)
+    ratelimit.init_app(app)
+    singleflight.init_app(app)
+    passwords.init_app(app)
+    profiling.init_app(app)
+    assets.init_app(app)
+    fragment_cache.init_app(app)
+    images.init_app(app)
+    cli.init_app(app)
 
     login_manager = LoginManager()
     login_manager.init_app(app)
@@ -25,13 +61,3 @@ def create_app():
     app.register_blueprint(routes_blueprint)
 
     return app
-
-app = create_app()
-
-
-
-
-
-
-
-
@@ -0,0 +1,235 @@
+"""Fingerprinted, precompressed static assets.
+
+``flask --app main assets build`` copies everything under ``static/`` into
+``static/dist/`` with a content hash in the file name, writes ``.gz`` (and,
+when the ``brotli`` package is installed, ``.br``) siblings, subsets the Font
+Awesome fonts to the icons the templates use (requires ``fonttools``), and
+records the mapping in ``static/dist/manifest.json``.
+
+At runtime ``url_for('static', filename=...)`` resolves through the manifest
+and hashed files are served with ``Cache-Control: immutable``. Without a
+manifest everything falls back to the plain files.
+"""
+import gzip
+import hashlib
+import io
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import shutil
+
+from flask import request, send_from_directory, url_for
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+DIST = "dist"
+MANIFEST = "manifest.json"
+SKIP_DIRS = {DIST, "audio"}
+# Served by routes at fixed URLs, so never fingerprinted.
+SKIP_FILES = {"_manifest.json", "_service-worker.js"}
+COMPRESSIBLE = {".css", ".js", ".svg", ".json", ".ttf", ".ico", ".txt", ".map", ".html"}
+FONT_CSS = "fonts/css/fontawesome-all.min.css"
+FONT_DIR = "fonts/webfonts/"
+PRECACHE = [
+    "styles/bootstrap.css",
+    "styles/style.css",
+    FONT_CSS,
+    "app/icons/icon-192x192.png",
+]
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+CSS_URL = re.compile(r"url\(\s*(['\"]?)([^'\")]+)\1\s*\)")
+ICON_CLASS = re.compile(r"\bfa-[a-z0-9-]+")
+ICON_RULE = re.compile(r"((?:\.fa-[a-z0-9-]+:{1,2}before,?)+)\{content:\"\\([0-9a-f]+)\"")
+
+
+def _digest(data):
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+def _hashed_name(path, data):
+    root, ext = posixpath.splitext(path)
+    return f"{root}.{_digest(data)}{ext}"
+
+
+def _collect(static_folder):
+    for dirpath, dirnames, filenames in os.walk(static_folder):
+        rel_dir = os.path.relpath(dirpath, static_folder).replace(os.sep, "/")
+        if rel_dir == ".":
+            rel_dir = ""
+            dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS]
+        for filename in filenames:
+            if rel_dir == "" and filename in SKIP_FILES:
+                continue
+            if filename.endswith((".py", ".gz", ".br")):
+                continue
+            yield posixpath.join(rel_dir, filename)
+
+
+def used_icon_codepoints(static_folder, template_folder):
+    """Codepoints of the Font Awesome icons referenced in templates and JS."""
+    names = set()
+    for folder in (template_folder, os.path.join(static_folder, "js")):
+        for dirpath, _, filenames in os.walk(folder):
+            for filename in filenames:
+                with open(os.path.join(dirpath, filename), encoding="utf-8", errors="ignore") as f:
+                    names.update(ICON_CLASS.findall(f.read()))
+
+    with open(os.path.join(static_folder, FONT_CSS), encoding="utf-8") as f:
+        css = f.read()
+    codepoints = set()
+    for selectors, codepoint in ICON_RULE.findall(css):
+        if any(name in names for name in re.findall(r"fa-[a-z0-9-]+", selectors)):
+            codepoints.add(int(codepoint, 16))
+    return codepoints
+
+
+def subset_font(data, ext, codepoints):
+    from fontTools import subset
+    from fontTools.ttLib import TTFont
+
+    options = subset.Options()
+    options.layout_features = ["*"]
+    options.notdef_outline = True
+    font = TTFont(io.BytesIO(data))
+    subsetter = subset.Subsetter(options)
+    subsetter.populate(unicodes=codepoints)
+    subsetter.subset(font)
+    font.flavor = "woff2" if ext == ".woff2" else None
+    out = io.BytesIO()
+    font.save(out)
+    return out.getvalue()
+
+
+def _font_source(static_folder, path, data):
+    # Prefer the .ttf sibling as the source for .woff2 output.
+    ttf = os.path.join(static_folder, posixpath.splitext(path)[0] + ".ttf")
+    if path.endswith(".woff2") and os.path.isfile(ttf):
+        with open(ttf, "rb") as f:
+            return f.read()
+    return data
+
+
+def _rewrite_css(path, css, hashed):
+    base = posixpath.dirname(path)
+
+    def replace(match):
+        quote, ref = match.groups()
+        if ref.startswith(("data:", "http:", "https:", "//", "/")):
+            return match.group(0)
+        clean, suffix = re.match(r"([^?#]*)(.*)", ref).groups()
+        target = posixpath.normpath(posixpath.join(base, clean))
+        if target not in hashed:
+            return match.group(0)
+        # Hashing only renames files, so the directory layout is unchanged.
+        return f"url({quote}{posixpath.relpath(hashed[target], base)}{suffix}{quote})"
+
+    return CSS_URL.sub(replace, css)
+
+
+def _write(dist_folder, path, data):
+    target = os.path.join(dist_folder, path)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    with open(target, "wb") as f:
+        f.write(data)
+    if posixpath.splitext(path)[1] in COMPRESSIBLE:
+        with open(target + ".gz", "wb") as f:
+            f.write(gzip.compress(data, 9, mtime=0))
+        if brotli is not None:
+            with open(target + ".br", "wb") as f:
+                f.write(brotli.compress(data))
+
+
+def build(static_folder, template_folder, subset_fonts=True, clean=False, log=print):
+    """Build ``static/dist`` and return the manifest."""
+    dist_folder = os.path.join(static_folder, DIST)
+    if clean:
+        shutil.rmtree(dist_folder, ignore_errors=True)
+
+    paths = sorted(_collect(static_folder))
+    codepoints = None
+    if subset_fonts:
+        try:
+            import fontTools  # noqa: F401
+            codepoints = used_icon_codepoints(static_folder, template_folder)
+        except ImportError:
+            log("fonttools is not installed; fonts are copied without subsetting.")
+
+    assets = {}
+    # CSS goes last so it can point at the hashed names of fonts and images.
+    for path in sorted(paths, key=lambda p: p.endswith(".css")):
+        with open(os.path.join(static_folder, path), "rb") as f:
+            data = f.read()
+        ext = posixpath.splitext(path)[1]
+        if codepoints and path.startswith(FONT_DIR) and ext in (".ttf", ".woff2"):
+            before = len(data)
+            try:
+                data = subset_font(_font_source(static_folder, path, data), ext, codepoints)
+                log(f"subset {path}: {before:,} -> {len(data):,} bytes")
+            except Exception as e:
+                log(f"could not subset {path} ({e}); copied as is.")
+        elif ext == ".css":
+            data = _rewrite_css(path, data.decode("utf-8"), assets).encode("utf-8")
+        hashed = _hashed_name(path, data)
+        _write(dist_folder, hashed, data)
+        assets[path] = hashed
+
+    manifest = {
+        "version": _digest(json.dumps(assets, sort_keys=True).encode()),
+        "assets": {path: f"{DIST}/{hashed}" for path, hashed in assets.items()},
+    }
+    with open(os.path.join(dist_folder, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    log(f"Built {len(assets)} assets into {dist_folder} (version {manifest['version']}).")
+    return manifest
+
+
+def load_manifest(static_folder):
+    try:
+        with open(os.path.join(static_folder, DIST, MANIFEST)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"version": "dev", "assets": {}}
+
+
+def precache_urls():
+    return ["/"] + [url_for("static", filename=path) for path in PRECACHE]
+
+
+def init_app(app):
+    manifest = load_manifest(app.static_folder)
+    app.extensions["assets"] = manifest
+    hashed = manifest["assets"]
+
+    @app.url_defaults
+    def fingerprint_static(endpoint, values):
+        if endpoint == "static" and values.get("filename") in hashed:
+            values["filename"] = hashed[values["filename"]]
+
+    @app.before_request
+    def serve_fingerprinted():
+        if request.endpoint != "static":
+            return None
+        filename = request.view_args.get("filename", "")
+        if not filename.startswith(f"{DIST}/"):
+            return None
+
+        mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        encoding = None
+        for name, suffix in (("br", ".br"), ("gzip", ".gz")):
+            if name in request.accept_encodings and os.path.isfile(os.path.join(app.static_folder, filename + suffix)):
+                encoding = name
+                filename += suffix
+                break
+
+        response = send_from_directory(app.static_folder, filename, mimetype=mimetype)
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+        response.headers["Vary"] = "Accept-Encoding"
+        response.headers["Cache-Control"] = IMMUTABLE
+        return response
@@ -0,0 +1,61 @@
+"""Job queue throughput benchmark.
+
+    python benchmarks/bench_jobs.py --jobs 2000 --workers 4
+
+Uses a throwaway SQLite file unless SQLALCHEMY_DATABASE_URI is set.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--jobs", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    if not os.getenv("SQLALCHEMY_DATABASE_URI"):
+        path = os.path.join(tempfile.mkdtemp(), "jobs.db")
+        os.environ["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{path}"
+
+    from app import create_app
+    from models import db
+    from services import jobs
+
+    done = []
+    jobs.job("bench.noop")(lambda n: done.append(n))
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        start = time.perf_counter()
+        for n in range(args.jobs):
+            jobs.enqueue("bench.noop", {"n": n}, priority=n % 3)
+        enqueue_secs = time.perf_counter() - start
+
+    def drain(i):
+        with app.app_context():
+            jobs.run_pending(worker_id=f"bench-{i}")
+
+    threads = [threading.Thread(target=drain, args=(i,)) for i in range(args.workers)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    run_secs = time.perf_counter() - start
+
+    print(f"enqueue: {args.jobs / enqueue_secs:,.0f} jobs/s")
+    print(f"process: {len(done) / run_secs:,.0f} jobs/s with {args.workers} workers "
+          f"({len(done)}/{args.jobs} ran, {len(done) - len(set(done))} duplicates)")
+
+
+if __name__ == "__main__":
+    main()
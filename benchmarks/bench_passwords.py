@@ -0,0 +1,181 @@
+"""Login throughput and its effect on other traffic, inline vs executor hashing.
+
+    python benchmarks/bench_passwords.py --duration 10 --login-threads 16 --other-threads 4
+
+Runs the app on a seeded SQLite file: ``--login-threads`` clients POST
+/login in a loop while ``--other-threads`` clients fetch the home page. Each
+scenario reports logins/s, shed logins (503) and the latency of the other
+requests:
+
+- idle: no logins, the baseline for the home page
+- inline: PASSWORD_HASH_WORKERS=0, every login thread hashes on its own
+- workers=N: hashing on the bounded executor (``--workers``, repeatable)
+- auto (``--gunicorn`` only): the split gunicorn.conf.py derives by itself
+
+By default the app runs in-process, the way one threaded worker would. With
+``--gunicorn`` each scenario starts real workers from gunicorn.conf.py
+(``--web-concurrency`` of them) and the clients talk to them over HTTP, so
+the hashing bound is measured across processes, as in production.
+"""
+import argparse
+import contextlib
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+class HTTPClient:
+    """Just enough of the test client's interface, over a real socket."""
+
+    def __init__(self, url):
+        self.url = url
+        self.session = requests.Session()
+
+    def get(self, path):
+        return self.session.get(self.url + path, allow_redirects=False)
+
+    def post(self, path, data):
+        return self.session.post(self.url + path, data=data, allow_redirects=False)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextlib.contextmanager
+def gunicorn(env):
+    """Serve main:app with gunicorn.conf.py and ``env``; yields the base URL."""
+    url = f"http://127.0.0.1:{free_port()}"
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", os.path.join(ROOT, "gunicorn.conf.py"),
+         "--bind", url.removeprefix("http://"), "main:app"],
+        cwd=ROOT, env={**os.environ, **env}, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                requests.get(url + "/", timeout=5)
+                break
+            except requests.RequestException:
+                if server.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError("gunicorn did not start")
+                time.sleep(0.2)
+        yield url
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def run(make_client, duration, login_threads, other_threads, accounts):
+    from services.seed import EMAIL_TEMPLATE, PASSWORD
+
+    stop = threading.Event()
+    logins, shed, other = [0], [0], []
+    lock = threading.Lock()
+
+    def login_loop(n):
+        client = make_client()
+        while not stop.is_set():
+            email = EMAIL_TEMPLATE.format(n=n % accounts)
+            status = client.post("/login", data={"email": email, "password": PASSWORD}).status_code
+            with lock:
+                if status == 503:
+                    shed[0] += 1
+                else:
+                    logins[0] += 1
+
+    def other_loop():
+        client = make_client()
+        while not stop.is_set():
+            start = time.perf_counter()
+            client.get("/")
+            with lock:
+                other.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=login_loop, args=(i,)) for i in range(login_threads)]
+    threads += [threading.Thread(target=other_loop) for _ in range(other_threads)]
+    for t in threads:
+        t.start()
+    time.sleep(duration)
+    stop.set()
+    for t in threads:
+        t.join()
+    return logins[0] / duration, shed[0], [percentile(other, q) * 1000 for q in (0.5, 0.95, 0.99)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--login-threads", type=int, default=16)
+    parser.add_argument("--other-threads", type=int, default=4)
+    parser.add_argument("--workers", type=int, action="append", help="Executor sizes to try (default: 1).")
+    parser.add_argument("--max-queue", type=int, default=None,
+                        help="PASSWORD_HASH_MAX_QUEUE (default: the app's, or gunicorn.conf.py's).")
+    parser.add_argument("--method", default=None, help="PASSWORD_HASH_METHOD (default: the app's).")
+    parser.add_argument("--gunicorn", action="store_true", help="Run against real gunicorn workers.")
+    parser.add_argument("--web-concurrency", type=int, default=2, help="gunicorn workers (with --gunicorn).")
+    args = parser.parse_args()
+
+    os.environ["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    os.environ["RATELIMIT_ENABLED"] = "0"
+    if args.method:
+        os.environ["PASSWORD_HASH_METHOD"] = args.method
+    from app import create_app
+    from models import db
+    from services import seed
+    import passwords
+
+    app = create_app()
+    accounts = max(args.login_threads, 1)
+    with app.app_context():
+        db.create_all()
+        seed.seed(users=accounts, venues=0, flights=0, gifts_per_user=0, waiter_calls=0, log=lambda *a: None)
+    method = app.extensions["passwords"].method
+    where = f"{args.web_concurrency} gunicorn workers" if args.gunicorn else "in-process"
+    print(f"method {method}, {os.cpu_count()} CPUs, {where}, {args.login_threads} login + "
+          f"{args.other_threads} other threads, {args.duration:.0f}s each")
+
+    scenarios = [("idle", None, 0), ("inline", 0, args.login_threads)]
+    scenarios += [(f"workers={n}", n, args.login_threads) for n in (args.workers or [1])]
+    if args.gunicorn:
+        scenarios.append(("auto", None, args.login_threads))
+    for name, workers, login_threads in scenarios:
+        if args.gunicorn:
+            env = {"PASSWORD_HASH_METHOD": method, "WEB_CONCURRENCY": str(args.web_concurrency)}
+            if workers is not None:
+                env["PASSWORD_HASH_WORKERS"] = str(workers)
+            if args.max_queue is not None:
+                env["PASSWORD_HASH_MAX_QUEUE"] = str(args.max_queue)
+            with gunicorn(env) as url:
+                result = run(lambda: HTTPClient(url), args.duration, login_threads, args.other_threads, accounts)
+        else:
+            if workers is not None:
+                max_queue = passwords.MAX_QUEUE if args.max_queue is None else args.max_queue
+                app.extensions["passwords"] = passwords.Hasher(method, workers, max_queue, passwords.TIMEOUT)
+            result = run(app.test_client, args.duration, login_threads, args.other_threads, accounts)
+        rate, shed, (p50, p95, p99) = result
+        print(f"{name:11} {rate:7.1f} logins/s  {shed:5} shed   other requests "
+              f"p50 {p50:7.1f} ms  p95 {p95:7.1f} ms  p99 {p99:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
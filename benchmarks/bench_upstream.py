@@ -0,0 +1,96 @@
+"""Upstream call throughput under injected latency.
+
+    python benchmarks/bench_upstream.py --latency-ms 200 --threads 8 --pages 40
+
+Starts benchmarks/fake_upstream.py in-process and simulates a news page
+(three upstream calls) served by ``--threads`` worker threads, two ways:
+
+- blocking: one ``requests`` call after another, as the views used to do;
+- pooled: services.upstream.fetch_all, all three calls in flight at once
+  over kept-alive connections.
+
+A third run points a slow host at a small per-host limit to show calls
+being shed at their deadline instead of piling up.
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import requests  # noqa: E402
+
+from benchmarks import fake_upstream  # noqa: E402
+
+CALLS_PER_PAGE = 3
+
+
+def run_pages(threads, pages, render):
+    latencies = []
+    lock = threading.Lock()
+    remaining = iter(range(pages))
+
+    def worker():
+        while True:
+            with lock:
+                if next(remaining, None) is None:
+                    return
+            start = time.perf_counter()
+            render()
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return pages / elapsed, latencies[len(latencies) // 2] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--pages", type=int, default=40)
+    args = parser.parse_args()
+
+    # Enough slots on 127.0.0.1 for every thread's calls at once.
+    os.environ.setdefault("UPSTREAM_HOST_LIMIT", str(args.threads * CALLS_PER_PAGE))
+    os.environ.setdefault("UPSTREAM_HOST_LIMITS", "localhost=2")
+    from services import upstream
+
+    port = fake_upstream.start_in_thread(latency_ms=args.latency_ms)
+    url = f"http://127.0.0.1:{port}/v1/chat/completions"
+    body = {"messages": [{"role": "user", "content": "hello"}]}
+
+    def blocking_page():
+        for _ in range(CALLS_PER_PAGE):
+            requests.post(url, json=body, timeout=30).json()
+
+    def pooled_page():
+        for response in upstream.fetch_all([("POST", url, {"json": body})] * CALLS_PER_PAGE, deadline=30):
+            response.json()
+
+    for name, render in (("blocking", blocking_page), ("pooled", pooled_page)):
+        pages_per_s, p50 = run_pages(args.threads, args.pages, render)
+        print(f"{name:9} {pages_per_s:7.1f} pages/s  p50 {p50:7.1f} ms")
+
+    # "localhost" is limited to 2 concurrent calls; with a deadline of 1.5x the
+    # upstream latency most of a burst of 20 is shed quickly instead of queueing.
+    slow_url = f"http://localhost:{port}/v1/chat/completions"
+    start = time.perf_counter()
+    results = upstream.fetch_all([("POST", slow_url, {"json": body})] * 20,
+                                 deadline=args.latency_ms * 1.5 / 1000)
+    shed = sum(isinstance(r, upstream.UpstreamBusy) for r in results)
+    print(f"host limit: {20 - shed} served, {shed} shed in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Local stand-ins for OpenAI, NewsAPI and Google TTS with injected latency.
+
+    python benchmarks/fake_upstream.py --port 8999 --latency-ms 800 --jitter-ms 200
+    OPENAI_BASE_URL=http://127.0.0.1:8999/v1 NEWS_API_URL=http://127.0.0.1:8999/v2 gunicorn main:app
+
+Speaks just enough HTTP/1.1 (keep-alive, Content-Length bodies) for the app's
+clients:
+
+- POST .../chat/completions returns a canned completion;
+- GET .../top-headlines returns five articles;
+- GET .../translate_tts returns a silent mp3 frame.
+
+--error-rate makes that share of responses 503s.
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import threading
+from urllib.parse import urlsplit
+
+SILENT_MP3 = b"\xff\xfb\x90\x64" + bytes(413)
+
+
+def _respond(method, path, body):
+    if method == "POST" and path.endswith("/chat/completions"):
+        prompt = json.loads(body or b"{}").get("messages", [{}])[-1].get("content", "")
+        payload = {"choices": [{"index": 0, "message": {
+            "role": "assistant", "content": f"Fake upstream brief: {prompt[:80]}",
+        }}]}
+        return 200, "application/json", json.dumps(payload).encode()
+    if method == "GET" and path.endswith("/top-headlines"):
+        articles = [{"title": f"Headline {i}", "url": f"https://example.com/{i}"} for i in range(5)]
+        return 200, "application/json", json.dumps({"status": "ok", "articles": articles}).encode()
+    if method == "GET" and path.endswith("/translate_tts"):
+        return 200, "audio/mpeg", SILENT_MP3
+    return 404, "application/json", b'{"error": "not found"}'
+
+
+def make_handler(latency_ms, jitter_ms, error_rate, stats=None):
+    async def handle(reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+                delay = latency_ms + (random.uniform(-jitter_ms, jitter_ms) if jitter_ms else 0)
+                await asyncio.sleep(max(delay, 0) / 1000)
+                if error_rate and random.random() < error_rate:
+                    status, content_type, payload = 503, "application/json", b'{"error": "injected"}'
+                else:
+                    status, content_type, payload = _respond(method, urlsplit(target).path, body)
+                if stats is not None:
+                    stats["requests"] = stats.get("requests", 0) + 1
+
+                close = headers.get("connection", "").lower() == "close"
+                writer.write(
+                    f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                    f"Content-Type: {content_type}\r\nContent-Length: {len(payload)}\r\n"
+                    f"Connection: {'close' if close else 'keep-alive'}\r\n\r\n".encode() + payload
+                )
+                await writer.drain()
+                if close:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+    return handle
+
+
+def start_in_thread(host="127.0.0.1", port=0, latency_ms=200, jitter_ms=0, error_rate=0.0, stats=None):
+    """Run the server on a background loop; returns the bound port."""
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+    bound = {}
+
+    async def main():
+        server = await asyncio.start_server(
+            make_handler(latency_ms, jitter_ms, error_rate, stats), host, port, backlog=1024)
+        bound["port"] = server.sockets[0].getsockname()[1]
+        ready.set()
+        async with server:
+            await server.serve_forever()
+
+    threading.Thread(target=loop.run_until_complete, args=(main(),), daemon=True).start()
+    ready.wait()
+    return bound["port"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8999)
+    parser.add_argument("--latency-ms", type=float, default=500)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    async def serve():
+        server = await asyncio.start_server(
+            make_handler(args.latency_ms, args.jitter_ms, args.error_rate), args.host, args.port, backlog=1024)
+        print(f"fake upstream on http://{args.host}:{args.port} "
+              f"({args.latency_ms:.0f}±{args.jitter_ms:.0f} ms)", file=sys.stderr)
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
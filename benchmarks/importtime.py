@@ -0,0 +1,75 @@
+"""Cold-start benchmark: module import time and time to first request.
+
+    python benchmarks/importtime.py            # report and check targets
+    python benchmarks/importtime.py --top 15   # also list the slowest imports
+
+Numbers come from fresh interpreters (`python -X importtime`). The targets in
+benchmarks/importtime_targets.json are checked and a non-zero exit code is
+returned when one is exceeded.
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TARGETS = os.path.join(ROOT, "benchmarks", "importtime_targets.json")
+
+FIRST_REQUEST = """
+import time
+start = time.perf_counter()
+from main import app
+imported = time.perf_counter()
+app.test_client().get('/')
+done = time.perf_counter()
+print((imported - start) * 1000, (done - start) * 1000)
+"""
+
+LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def run(code, env):
+    return subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT, env=env,
+                          capture_output=True, text=True, check=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=0)
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault("SQLALCHEMY_DATABASE_URI", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}")
+
+    import_ms, first_ms, modules = [], [], {}
+    for _ in range(args.runs):
+        result = run(FIRST_REQUEST, env)
+        imported, done = map(float, result.stdout.split()[-2:])
+        import_ms.append(imported)
+        first_ms.append(done)
+        for self_us, cumulative_us, indent, name in LINE.findall(result.stderr):
+            modules[name] = int(cumulative_us) / 1000
+
+    measured = {"import_main_ms": min(import_ms), "first_request_ms": min(first_ms)}
+    for name, value in measured.items():
+        print(f"{name}: {value:.0f}")
+
+    if args.top:
+        print(f"\nslowest imports (cumulative ms):")
+        for name, ms in sorted(modules.items(), key=lambda item: -item[1])[:args.top]:
+            print(f"  {ms:8.1f}  {name}")
+
+    with open(TARGETS) as f:
+        targets = json.load(f)
+    failed = [name for name, limit in targets.items() if measured.get(name, 0) > limit]
+    for name in failed:
+        print(f"FAIL {name}: {measured[name]:.0f} ms > target {targets[name]} ms")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+"""End-to-end load driver for the main user flows.
+
+    flask --app main seed --users 10000
+    RATELIMIT_ENABLED=0 FAKE_INTEGRATIONS=1 gunicorn main:app
+    python benchmarks/loadtest.py --url http://127.0.0.1:8000 --users 20 --duration 60 --out before.json
+
+Each virtual user logs in as one of the seeded accounts and loops over a
+weighted mix of flows (dashboard, set_location, check_zone, matches,
+send_gift, flights, call_waiter, plus the occasional re-login). Redirects are
+not followed, so every sample times exactly one endpoint; 4xx/5xx and
+connection failures count as errors. The report is JSON with throughput and
+p50/p95/p99 latency per endpoint, tagged with the current commit so runs can
+be diffed between commits.
+
+Each virtual user sends its own X-Forwarded-For address, so with the rate
+limiter on (and TRUSTED_PROXY_HOPS=1) every user gets its own per-IP bucket
+instead of all of them sharing the driver's.
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from services.seed import EMAIL_TEMPLATE, PASSWORD, GIFT_TYPES, flight_spec, flight_weights, random_location  # noqa: E402
+
+FLOWS = {
+    "dashboard": 3,
+    "set_location": 4,
+    "check_zone": 6,
+    "matches": 1,
+    "send_gift": 1,
+    "flights": 1,
+    "call_waiter": 2,
+    "login": 0.2,
+}
+NEAR_ZONE_SHARE = 0.7
+
+
+class Recorder:
+    def __init__(self, warmup_until):
+        self.warmup_until = warmup_until
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.errors = Counter()
+        self.lock = threading.Lock()
+
+    def record(self, name, status, seconds):
+        if time.monotonic() < self.warmup_until:
+            return
+        with self.lock:
+            self.latencies[name].append(seconds * 1000)
+            self.statuses[name][str(status)] += 1
+            if status == "error" or status >= 400:
+                self.errors[name] += 1
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values) + 0.5) - 1))
+    return round(sorted_values[index], 2)
+
+
+class VirtualUser(threading.Thread):
+    def __init__(self, args, account, zones, recorder, stop_at, seed):
+        super().__init__(daemon=True)
+        self.args = args
+        self.email = EMAIL_TEMPLATE.format(n=account)
+        self.zones = zones
+        self.recorder = recorder
+        self.stop_at = stop_at
+        self.rng = random.Random(seed)
+        self.http = requests.Session()
+        self.http.headers["X-Forwarded-For"] = f"10.{account >> 16 & 255}.{account >> 8 & 255}.{account & 255}"
+        self.position = None
+        self.nearby = []
+        self.flight_weights = flight_weights(args.flights)
+
+    def call(self, name, method, path, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = self.http.request(method, self.args.url + path, allow_redirects=False,
+                                         timeout=self.args.timeout, **kwargs)
+            status = response.status_code
+        except requests.RequestException:
+            response, status = None, "error"
+        self.recorder.record(name, status, time.perf_counter() - start)
+        return response
+
+    def move(self):
+        if self.zones and self.rng.random() < NEAR_ZONE_SHARE:
+            zone = self.rng.choice(self.zones)
+            self.position = (zone["latitude"], zone["longitude"])
+        else:
+            self.position = random_location(self.rng)
+
+    def login(self):
+        self.call("login", "POST", "/login", data={"email": self.email, "password": PASSWORD})
+
+    def dashboard(self):
+        self.call("dashboard", "GET", "/dashboard")
+
+    def set_location(self):
+        self.move()
+        lat, lon = self.position
+        self.call("set_location", "POST", "/api/set_location", json={"lat": lat, "lon": lon})
+
+    def check_zone(self):
+        if self.position is None:
+            self.move()
+        lat, lon = self.position
+        response = self.call("check_zone", "POST", "/check_zone", json={"lat": lat, "lon": lon})
+        if response is not None and response.ok:
+            self.nearby = [z["zone_name"] for z in response.json().get("zones", [])]
+
+    def matches(self):
+        self.call("matches", "GET", "/matches")
+
+    def send_gift(self):
+        self.call("send_gift", "POST", "/send_gift", data={
+            "recipient_id": self.rng.randint(1, self.args.accounts),
+            "gift_type": self.rng.choice(GIFT_TYPES),
+            "message": "load test",
+        })
+
+    def flights(self):
+        spec = flight_spec(self.rng.choices(range(self.args.flights), weights=self.flight_weights)[0])
+        self.call("flights", "POST", "/flights", data={**spec, "seat_preference": "window"})
+
+    def call_waiter(self):
+        if self.nearby:
+            zone_name = self.rng.choice(self.nearby)
+        elif self.zones:
+            zone_name = self.rng.choice(self.zones)["name"]
+        else:
+            return
+        self.call("call_waiter", "POST", "/call_waiter", json={"zone_name": zone_name})
+
+    def run(self):
+        self.login()
+        self.set_location()
+        names = list(self.args.flows)
+        weights = [self.args.flows[name] for name in names]
+        while time.monotonic() < self.stop_at:
+            getattr(self, self.rng.choices(names, weights=weights)[0])()
+            if self.args.think:
+                time.sleep(self.rng.expovariate(1 / self.args.think))
+
+
+def fetch_zones(args):
+    http = requests.Session()
+    http.post(args.url + "/login", data={"email": EMAIL_TEMPLATE.format(n=0), "password": PASSWORD},
+              allow_redirects=False, timeout=args.timeout)
+    response = http.get(args.url + "/api/zones", timeout=args.timeout)
+    response.raise_for_status()
+    return [
+        {"name": z["name"], "latitude": z["latitude"], "longitude": z["longitude"]}
+        for z in response.json()
+    ]
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def report(args, recorder, elapsed):
+    endpoints = {}
+    total = 0
+    for name in sorted(recorder.latencies):
+        values = sorted(recorder.latencies[name])
+        total += len(values)
+        endpoints[name] = {
+            "requests": len(values),
+            "errors": recorder.errors[name],
+            "throughput_rps": round(len(values) / elapsed, 2),
+            "p50_ms": percentile(values, 50),
+            "p95_ms": percentile(values, 95),
+            "p99_ms": percentile(values, 99),
+            "max_ms": round(values[-1], 2),
+            "status": dict(recorder.statuses[name]),
+        }
+    return {
+        "commit": git_commit(),
+        "started_at": datetime.utcnow().isoformat() + "Z",
+        "config": {
+            "url": args.url, "users": args.users, "duration_s": args.duration, "warmup_s": args.warmup,
+            "accounts": args.accounts, "flights": args.flights, "think_s": args.think, "seed": args.seed,
+        },
+        "total": {
+            "requests": total,
+            "errors": sum(recorder.errors.values()),
+            "throughput_rps": round(total / elapsed, 2),
+        },
+        "endpoints": endpoints,
+    }
+
+
+def parse_flows(value):
+    flows = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        if name not in FLOWS:
+            raise argparse.ArgumentTypeError(f"unknown flow {name!r}")
+        flows[name] = float(weight or FLOWS[name])
+    return flows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--users", type=int, default=10, help="Concurrent virtual users.")
+    parser.add_argument("--duration", type=float, default=30, help="Measured seconds.")
+    parser.add_argument("--warmup", type=float, default=5, help="Seconds before measuring starts.")
+    parser.add_argument("--accounts", type=int, default=1000, help="Seeded accounts to log in as.")
+    parser.add_argument("--flights", type=int, default=200, help="Seeded flights (flask seed --flights).")
+    parser.add_argument("--think", type=float, default=0, help="Mean pause between requests, in seconds.")
+    parser.add_argument("--flows", type=parse_flows, default=dict(FLOWS),
+                        help="Flow weights, e.g. check_zone=5,matches=1 (default: all).")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="Write the JSON report here instead of stdout.")
+    args = parser.parse_args()
+    args.url = args.url.rstrip("/")
+
+    zones = fetch_zones(args)
+    start = time.monotonic()
+    recorder = Recorder(start + args.warmup)
+    stop_at = start + args.warmup + args.duration
+    rng = random.Random(args.seed)
+    accounts = rng.sample(range(args.accounts), min(args.users, args.accounts))
+    threads = [
+        VirtualUser(args, accounts[i % len(accounts)], zones, recorder, stop_at, args.seed * 1000 + i)
+        for i in range(args.users)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    result = json.dumps(report(args, recorder, max(time.monotonic() - start - args.warmup, 1e-9)), indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(result + "\n")
+    else:
+        print(result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""Microbenchmarks for the matching and zone kernels behind the hottest pages.
+
+    python benchmarks/microbench.py run                        # print timings
+    python benchmarks/microbench.py run --save                 # store as the baseline
+    python benchmarks/microbench.py compare --threshold 10     # fail on >10% regressions
+    python benchmarks/microbench.py compare --current new.json # compare two stored runs
+
+Each case is timed as the best of ``--repeat`` rounds, with enough calls per
+round to fill about ``--min-time`` seconds. Baselines are machine-specific:
+record them on the machine that runs the comparison.
+
+Inputs come from services.seed, so sizes and distributions match the seeded
+load-test data. match_users and check_zone_db run against a throwaway SQLite
+database per size, so they include the query and ORM load the views pay.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BASELINE = os.path.join(ROOT, "benchmarks", "microbench_baseline.json")
+USER_SIZES = (100, 1000, 10000)
+DB_USER_SIZES = (100, 1000)
+ZONE_SIZES = (10, 1000, 100000)
+SEED = 42
+
+
+def _users(n, rng):
+    from models import User
+    from services.seed import random_interests, random_location
+
+    users = []
+    for _ in range(n):
+        lat, lon = random_location(rng)
+        users.append(User(latitude=lat, longitude=lon, interests=json.dumps(random_interests(rng))))
+    return users
+
+
+def _zones(n, rng):
+    from models import Zone
+    from services.seed import INTERESTS, random_location
+
+    interests = list(INTERESTS)
+    zones = []
+    for i in range(n):
+        lat, lon = random_location(rng)
+        zones.append(Zone(name=f"Zone {i}", latitude=lat, longitude=lon,
+                          radius_meters=rng.choice([15, 30, 80]), interest=rng.choice(interests)))
+    return zones
+
+
+def _app():
+    """A fresh app on an empty SQLite file."""
+    os.environ["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    from app import create_app
+    from models import db
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def _match_users_case(n):
+    """match_users(user_id) against ``n`` seeded users in a fresh SQLite file."""
+    from services import seed
+    from services.matching import match_users
+
+    app = _app()
+    with app.app_context():
+        user_ids = seed.seed(users=n, venues=0, flights=0, gifts_per_user=0, waiter_calls=0,
+                             random_seed=SEED, log=lambda *a: None)
+    rng = random.Random(SEED)
+
+    def case():
+        with app.app_context():
+            match_users(rng.choice(user_ids))
+    return case
+
+
+def _check_zone_case(n):
+    """An uncoalesced /check_zone lookup, Zone.query.all() included, against ``n`` seeded zones."""
+    from models import Zone
+    from services import seed
+    from services.seed import INTERESTS
+    from zones import cell, zone_candidates, zones_at
+
+    app = _app()
+    with app.app_context():
+        seed.seed_zones(random.Random(SEED), max(n // 10, 1), min(n, 10), log=lambda *a: None)
+        points = [(z.latitude, z.longitude, z.interest) for z in Zone.query.all()]
+    rng = random.Random(SEED)
+    interests = list(INTERESTS)
+
+    def case():
+        lat, lon, interest = rng.choice(points)
+        with app.app_context():
+            candidates = zone_candidates(*cell(lat, lon), Zone.query.all())
+            zones_at(lat, lon, {interest, *rng.sample(interests, 2)}, candidates)
+    return case
+
+
+def cases(quick=False):
+    """(name, setup) pairs; setup returns the zero-argument callable to time."""
+    from services.matching import nearby_matches, parse_interests
+    from zones import haversine, zones_at
+
+    def haversine_case():
+        rng = random.Random(SEED)
+        points = [(rng.uniform(-60, 60), rng.uniform(-180, 180)) for _ in range(1001)]
+
+        def case():
+            for (lat1, lon1), (lat2, lon2) in zip(points, points[1:]):
+                haversine(lat1, lon1, lat2, lon2)
+        return case
+
+    def parse_case(n):
+        def setup():
+            rng = random.Random(SEED)
+            raw = [u.interests for u in _users(n, rng)]
+            return lambda: [parse_interests(r) for r in raw]
+        return setup
+
+    def nearby_case(n):
+        def setup():
+            rng = random.Random(SEED)
+            others = _users(n, rng)
+            me = others.pop()
+            return lambda: nearby_matches(me, others)
+        return setup
+
+    def zones_case(n):
+        def setup():
+            rng = random.Random(SEED)
+            zones = _zones(n, rng)
+            target = zones[0]
+            interests = {target.interest, "Music", "Travel"}
+            return lambda: zones_at(target.latitude, target.longitude, interests, zones)
+        return setup
+
+    user_sizes = USER_SIZES[:2] if quick else USER_SIZES
+    zone_sizes = ZONE_SIZES[:2] if quick else ZONE_SIZES
+    yield "haversine[x1000]", haversine_case
+    for n in user_sizes:
+        yield f"parse_interests[n={n}]", parse_case(n)
+    for n in user_sizes:
+        yield f"find_matches_loop[n={n}]", nearby_case(n)
+    for n in zone_sizes:
+        yield f"check_zone[zones={n}]", zones_case(n)
+    for n in zone_sizes:
+        yield f"check_zone_db[zones={n}]", lambda n=n: _check_zone_case(n)
+    for n in DB_USER_SIZES[:1] if quick else DB_USER_SIZES:
+        yield f"match_users[n={n}]", lambda n=n: _match_users_case(n)
+
+
+def measure(fn, repeat, min_time):
+    """Best seconds per call over ``repeat`` rounds of about ``min_time / repeat`` each."""
+    round_time = min_time / repeat
+    fn()
+    calls = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(calls):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= round_time / 4 or calls >= 1 << 20:
+            break
+        calls *= 2
+    calls = max(1, int(calls * round_time / max(elapsed, 1e-9)))
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(calls):
+            fn()
+        best = min(best, (time.perf_counter() - start) / calls)
+    return best
+
+
+def run(args):
+    results = {}
+    for name, setup in cases(args.quick):
+        if args.filter and args.filter not in name:
+            continue
+        seconds = measure(setup(), args.repeat, args.min_time)
+        results[name] = seconds * 1e6
+        print(f"{name:32} {seconds * 1e6:14,.1f} us", file=sys.stderr)
+    return {
+        "created_at": datetime.utcnow().isoformat() + "Z",
+        "python": platform.python_version(),
+        "machine": platform.node(),
+        "unit": "us_per_call",
+        "results": results,
+    }
+
+
+def _write(path, data):
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def compare(baseline, current, threshold):
+    """Print a table of changes; return the names that regressed past ``threshold``
+    percent or that the baseline has and the current run lacks."""
+    regressions = []
+    for name in sorted(set(baseline) | set(current)):
+        if name not in current:
+            print(f"{name:32} (missing)  REGRESSION")
+            regressions.append(name)
+            continue
+        if name not in baseline:
+            print(f"{name:32} (new)")
+            continue
+        change = (current[name] - baseline[name]) / baseline[name] * 100
+        regressed = change > threshold
+        if regressed:
+            regressions.append(name)
+        print(f"{name:32} {baseline[name]:12,.1f} -> {current[name]:12,.1f} us "
+              f"{change:+7.1f}%{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name in ("run", "compare"):
+        p = sub.add_parser(name)
+        p.add_argument("--repeat", type=int, default=5)
+        p.add_argument("--min-time", type=float, default=1.0, help="Seconds per case across all rounds.")
+        p.add_argument("--filter", help="Only cases whose name contains this string.")
+        p.add_argument("--quick", action="store_true", help="Skip the largest sizes.")
+        p.add_argument("--baseline", default=BASELINE)
+    sub.choices["run"].add_argument("--save", action="store_true", help="Write the results to --baseline.")
+    sub.choices["run"].add_argument("--out", help="Write the results to this file.")
+    sub.choices["compare"].add_argument("--current", help="Stored results to compare instead of running now.")
+    sub.choices["compare"].add_argument("--threshold", type=float, default=10.0,
+                                        help="Allowed slowdown in percent.")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        data = run(args)
+        for path in filter(None, (args.out, args.baseline if args.save else None)):
+            _write(path, data)
+            print(f"wrote {path}", file=sys.stderr)
+        if not args.out and not args.save:
+            print(json.dumps(data, indent=2))
+        return
+
+    try:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+    except FileNotFoundError:
+        sys.exit(f"No baseline at {args.baseline}; record one with 'run --save'.")
+    if args.current:
+        with open(args.current) as f:
+            current = json.load(f)["results"]
+    else:
+        current = run(args)["results"]
+    if args.filter:
+        baseline = {k: v for k, v in baseline.items() if args.filter in k}
+    if args.quick:
+        # Only the sizes --quick skips on purpose; a renamed or dropped case still fails.
+        skipped = {name for name, _ in cases()} - {name for name, _ in cases(quick=True)}
+        baseline = {k: v for k, v in baseline.items() if k not in skipped}
+    regressions = compare(baseline, current, args.threshold)
+    if regressions:
+        print(f"FAIL: {len(regressions)} case(s) missing or slower than the baseline by more "
+              f"than {args.threshold}%")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import os
+import time
+
+import click
+from flask import current_app
+
+import assets
+import images
+from models import db
+from services import bulk
+from services import flights as flights_service
+from services import schema
+from services import seed as seed_service
+
+
+def init_app(app):
+    @app.cli.command("init-db")
+    def init_db():
+        """Create any missing database tables."""
+        db.create_all()
+        click.echo("Database tables created.")
+
+    @app.cli.group("schema")
+    def schema_group():
+        """Upgrades for databases created from an older schema."""
+
+    @schema_group.command("migrate")
+    @click.option("--dry-run", is_flag=True, help="Report what would change without writing.")
+    def migrate_schema(dry_run):
+        """Add missing tables, columns and indexes, then backfill the new columns."""
+        columns, indexes = schema.migrate(dry_run=dry_run, log=click.echo)
+        verb = "Would add" if dry_run else "Added"
+        click.echo(f"{verb} {columns} columns and {indexes} indexes.")
+
+    @app.cli.group("assets")
+    def assets_group():
+        """Static asset pipeline."""
+
+    @assets_group.command("build")
+    @click.option("--subset-fonts/--no-subset-fonts", default=True, help="Subset icon fonts to used glyphs.")
+    @click.option("--clean", is_flag=True, help="Remove previously built assets first.")
+    def build_assets(subset_fonts, clean):
+        """Fingerprint, compress and subset files under static/."""
+        template_folder = os.path.join(current_app.root_path, current_app.template_folder)
+        assets.build(current_app.static_folder, template_folder,
+                     subset_fonts=subset_fonts, clean=clean, log=click.echo)
+
+    @app.cli.group("images")
+    def images_group():
+        """Image derivative cache."""
+
+    @images_group.command("build")
+    def build_images():
+        """Pre-render the PWA icon derivatives."""
+        count = images.build(log=click.echo)
+        click.echo(f"Rendered {count} icon derivatives.")
+
+    @app.cli.command("seed")
+    @click.option("--users", default=1000, show_default=True)
+    @click.option("--venues", default=50, show_default=True)
+    @click.option("--zones-per-venue", default=20, show_default=True)
+    @click.option("--flights", default=200, show_default=True)
+    @click.option("--bookings-per-user", default=1.5, show_default=True, help="Mean bookings per user.")
+    @click.option("--gifts-per-user", default=2.0, show_default=True)
+    @click.option("--waiter-calls", default=5000, show_default=True)
+    @click.option("--premium-share", default=0.2, show_default=True)
+    @click.option("--seed", "random_seed", default=42, show_default=True, help="Random seed.")
+    def seed(users, venues, zones_per_venue, flights, bookings_per_user, gifts_per_user,
+             waiter_calls, premium_share, random_seed):
+        """Bulk-generate synthetic users, zones, flights, gifts and waiter calls."""
+        db.create_all()
+        start = time.perf_counter()
+        seed_service.seed(users=users, venues=venues, zones_per_venue=zones_per_venue, flights=flights,
+                          bookings_per_user=bookings_per_user, gifts_per_user=gifts_per_user,
+                          waiter_calls=waiter_calls, premium_share=premium_share,
+                          random_seed=random_seed, log=click.echo)
+        click.echo(f"Done in {time.perf_counter() - start:.1f}s. "
+                   f"Log in as {seed_service.EMAIL_TEMPLATE.format(n=0)} / {seed_service.PASSWORD}.")
+
+    @app.cli.group("data")
+    def data_group():
+        """Bulk import and export of zones, flights and users."""
+
+    def log_err(message):
+        click.echo(message, err=True)
+
+    @data_group.command("import")
+    @click.argument("entity", type=click.Choice(sorted(bulk.ENTITIES)))
+    @click.argument("source", type=click.File("r", encoding="utf-8"))
+    @click.option("--format", "fmt", type=click.Choice(bulk.FORMATS), help="Defaults to the file extension.")
+    @click.option("--mode", type=click.Choice(["insert", "upsert"]), default="insert", show_default=True)
+    @click.option("--chunk-size", default=bulk.CHUNK_SIZE, show_default=True, help="Rows per transaction.")
+    @click.option("--max-errors", default=bulk.MAX_ERRORS, show_default=True)
+    @click.option("--dry-run", is_flag=True, help="Validate without writing.")
+    def import_data(entity, source, fmt, mode, chunk_size, max_errors, dry_run):
+        """Load ENTITY rows from a CSV or NDJSON file ("-" for stdin)."""
+        try:
+            written, rejected = bulk.import_rows(
+                entity, source, fmt=bulk.detect_format(source.name, fmt), mode=mode,
+                chunk_size=chunk_size, max_errors=max_errors, dry_run=dry_run, log=log_err,
+            )
+        except bulk.BulkError as e:
+            raise click.ClickException(str(e))
+        verb = "Validated" if dry_run else "Imported"
+        click.echo(f"{verb} {written:,} {entity}; {rejected:,} rows rejected.", err=True)
+
+    @data_group.command("export")
+    @click.argument("entity", type=click.Choice(sorted(bulk.ENTITIES)))
+    @click.argument("target", type=click.File("w", encoding="utf-8"), default="-")
+    @click.option("--format", "fmt", type=click.Choice(bulk.FORMATS), help="Defaults to the file extension.")
+    @click.option("--include-passwords", is_flag=True, help="Include password hashes (users only).")
+    def export_data(entity, target, fmt, include_passwords):
+        """Stream every ENTITY row to a CSV or NDJSON file (stdout by default)."""
+        fmt = bulk.detect_format(None if target.name == "<stdout>" else target.name, fmt)
+        bulk.export_rows(entity, target, fmt=fmt, include_passwords=include_passwords, log=log_err)
+
+    @app.cli.group("flights")
+    def flights_group():
+        """Flight schedule maintenance."""
+
+    @flights_group.command("migrate")
+    @click.option("--dry-run", is_flag=True, help="Report what would change without writing.")
+    def migrate_flights(dry_run):
+        """Canonicalize flights, merge duplicates onto one row and add the unique indexes."""
+        merged, moved, dropped, cleared = flights_service.migrate(dry_run=dry_run, log=click.echo)
+        verb = "Would merge" if dry_run else "Merged"
+        click.echo(f"{verb} {merged:,} duplicate flights ({moved:,} bookings moved, "
+                   f"{dropped:,} duplicate bookings dropped, {cleared:,} unparseable dates cleared).")
@@ -0,0 +1,91 @@
+"""Engine options and primary/replica routing for the SQLAlchemy session.
+
+Views decorated with ``@read_replica`` read from the ``replica`` bind (set by
+SQLALCHEMY_REPLICA_URI). Flushes, DML and ``FOR UPDATE`` always go to the
+primary, and a client that committed recently stays on the primary for
+DB_REPLICA_STICKY_SECONDS so it reads its own writes.
+"""
+import os
+import time
+
+from flask import current_app, g, has_request_context, request, session as web_session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+
+REPLICA = "replica"
+STICKY_KEY = "_db_primary_until"
+
+
+def engine_options(uri):
+    """SQLALCHEMY_ENGINE_OPTIONS from DB_POOL_* environment variables."""
+    if not uri or uri.startswith("sqlite"):
+        return {}
+    return {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", 5)),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", 10)),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", 30)),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", 1800)),
+        "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "1") == "1",
+    }
+
+
+def read_replica(view):
+    """Mark a read-only view as safe to serve from the replica."""
+    view.use_read_replica = True
+    return view
+
+
+def _wants_replica(clause):
+    if not has_request_context() or not g.get("use_replica"):
+        return False
+    if clause is not None and (getattr(clause, "is_dml", False)
+                               or getattr(clause, "_for_update_arg", None) is not None):
+        return False
+    return True
+
+
+class RoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and _wants_replica(clause):
+            replica = self._db.engines.get(REPLICA)
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _stick_to_primary(session):
+    if has_request_context() and REPLICA in session._db.engines:
+        web_session[STICKY_KEY] = time.time() + current_app.config["DB_REPLICA_STICKY_SECONDS"]
+        g.use_replica = False
+
+
+def pool_stats(db):
+    stats = {}
+    for name, engine in db.engines.items():
+        pool = engine.pool
+        entry = {"status": pool.status()}
+        if isinstance(pool, QueuePool):
+            entry.update(size=pool.size(), checked_out=pool.checkedout(), overflow=pool.overflow())
+        stats[name or "default"] = entry
+    return stats
+
+
+def init_app(app):
+    uri = app.config.get("SQLALCHEMY_DATABASE_URI")
+    app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", engine_options(uri))
+    app.config.setdefault("DB_REPLICA_STICKY_SECONDS", float(os.getenv("DB_REPLICA_STICKY_SECONDS", 5)))
+    replica_uri = os.getenv("SQLALCHEMY_REPLICA_URI")
+    if replica_uri:
+        app.config.setdefault("SQLALCHEMY_BINDS", {})[REPLICA] = {
+            "url": replica_uri, **engine_options(replica_uri),
+        }
+
+    @app.before_request
+    def choose_database():
+        view = app.view_functions.get(request.endpoint)
+        g.use_replica = (
+            getattr(view, "use_read_replica", False)
+            and web_session.get(STICKY_KEY, 0) < time.time()
+        )
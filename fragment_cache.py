@@ -0,0 +1,106 @@
+"""``{% cache key, ttl %}`` template fragment caching and the Jinja bytecode cache.
+
+    {% cache ["match", user.id, user.updated_at], 300 %} ... {% endcache %}
+
+The key is any expression (usually a list that includes model versions such
+as ``updated_at`` or ids); the template name is added automatically. ``ttl``
+is in seconds and defaults to FRAGMENT_CACHE_TTL. Rendered fragments live in
+a per-worker LRU of FRAGMENT_CACHE_MAX_ENTRIES entries. Caching is off in
+debug mode so template edits show up immediately.
+
+Compiled templates are written to TEMPLATE_BYTECODE_DIR, so a restarted
+worker loads bytecode instead of recompiling every template.
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+
+import metrics
+
+DEFAULT_TTL = 300
+MAX_ENTRIES = 10000
+
+
+class FragmentStore:
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class FragmentCacheExtension(Extension):
+    tags = {"cache"}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=FragmentStore(), fragment_cache_enabled=True,
+                           fragment_cache_ttl=DEFAULT_TTL)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [nodes.Const(parser.name), parser.parse_expression()]
+        if parser.stream.skip_if("comma"):
+            args.append(parser.parse_expression())
+        else:
+            args.append(nodes.Const(None))
+        body = parser.parse_statements(("name:endcache",), drop_needle=True)
+        return nodes.CallBlock(self.call_method("_render", args), [], [], body).set_lineno(lineno)
+
+    def _render(self, template_name, key, ttl, caller):
+        env = self.environment
+        if not env.fragment_cache_enabled:
+            return caller()
+        cache_key = json.dumps([template_name, key], default=str, separators=(",", ":"))
+        value = env.fragment_cache.get(cache_key)
+        metrics.record_cache("fragment", value is not None)
+        if value is None:
+            value = caller()
+            env.fragment_cache.set(cache_key, value, env.fragment_cache_ttl if ttl is None else ttl)
+        return value
+
+
+def init_app(app):
+    app.config.setdefault("FRAGMENT_CACHE_ENABLED", not app.debug)
+    app.config.setdefault("FRAGMENT_CACHE_TTL", DEFAULT_TTL)
+    app.config.setdefault("FRAGMENT_CACHE_MAX_ENTRIES", MAX_ENTRIES)
+    app.config.setdefault("TEMPLATE_BYTECODE_DIR", os.getenv(
+        "TEMPLATE_BYTECODE_DIR", os.path.join(app.instance_path, "jinja-bytecode")))
+
+    env = app.jinja_env
+    env.add_extension(FragmentCacheExtension)
+    env.fragment_cache = FragmentStore(app.config["FRAGMENT_CACHE_MAX_ENTRIES"])
+    env.fragment_cache_enabled = app.config["FRAGMENT_CACHE_ENABLED"]
+    env.fragment_cache_ttl = app.config["FRAGMENT_CACHE_TTL"]
+
+    bytecode_dir = app.config["TEMPLATE_BYTECODE_DIR"]
+    if bytecode_dir:
+        os.makedirs(bytecode_dir, exist_ok=True)
+        env.bytecode_cache = FileSystemBytecodeCache(bytecode_dir)
@@ -0,0 +1,45 @@
+import os
+import shutil
+import tempfile
+
+# Each worker writes its Prometheus samples here; /metrics merges them.
+multiproc_dir = os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "wingoo-metrics")
+)
+
+# Threaded workers: a request waiting on the password-hash pool (or on the
+# database) parks its thread, and the worker's other threads keep serving.
+# Set the process count with WEB_CONCURRENCY rather than -w so the hashing
+# split below sees it.
+worker_class = "gthread"
+workers = int(os.getenv("WEB_CONCURRENCY", 1))
+threads = int(os.getenv("GUNICORN_THREADS", 8))
+
+# passwords.py bounds hashing per process. Split half the host's cores between
+# the workers, so a login burst takes at most that many host-wide, and let at
+# most half of each worker's threads wait on a hash before logins are shed.
+os.environ.setdefault("PASSWORD_HASH_WORKERS", str(max(1, (os.cpu_count() or 2) // 2 // workers)))
+os.environ.setdefault("PASSWORD_HASH_MAX_QUEUE", str(max(0, threads // 2 - int(os.environ["PASSWORD_HASH_WORKERS"]))))
+
+
+def on_starting(server):
+    shutil.rmtree(multiproc_dir, ignore_errors=True)
+    os.makedirs(multiproc_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def post_fork(server, worker):
+    # With --preload the app (and its engines) is built in the master; drop the
+    # inherited pools so workers never share DB sockets with each other.
+    import sys
+    if "main" not in sys.modules:
+        return
+    from main import app
+    from models import db
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
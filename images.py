@@ -0,0 +1,250 @@
+"""Resized image derivatives served from an on-disk LRU cache.
+
+``/img/<path>?w=<width>`` returns ``static/<path>`` (or a root-level source
+listed in EXTRA_SOURCES) scaled down to the nearest allowed width, encoded as
+AVIF, WebP or PNG according to ``Accept`` (or an explicit ``fmt``).
+Derivatives are cached under IMAGE_CACHE_DIR. Each worker keeps a running
+total of the bytes it has seen written; once that passes
+IMAGE_CACHE_MAX_BYTES, one scan evicts the least recently used files down to
+LOW_WATER of the limit, so the directory is walked rarely rather than on
+every miss.
+``flask --app main images build`` pre-renders the PWA icon set.
+"""
+import hashlib
+import io
+import json
+import os
+import tempfile
+import threading
+
+from flask import abort, current_app, request, send_file, url_for
+from PIL import Image, features
+
+WIDTHS = (48, 72, 96, 128, 144, 152, 180, 192, 256, 384, 512, 1024)
+SOURCE_TYPES = (".png", ".jpg", ".jpeg", ".webp")
+EXTRA_SOURCES = {"generated-icon.png": "generated-icon.png"}
+MANIFEST_ICON = "app/icons/icon-512x512.png"
+ICON_SIZES = (72, 96, 128, 144, 152, 192, 384, 512)
+MAX_CACHE_BYTES = 100 * 1024 * 1024
+LOW_WATER = 0.9
+
+FORMATS = {
+    "avif": ("AVIF", "image/avif", {"quality": 60}),
+    "webp": ("WEBP", "image/webp", {"quality": 80, "method": 6}),
+    "png": ("PNG", "image/png", {"optimize": True}),
+}
+
+_evict_lock = threading.Lock()
+_cache_bytes = {}
+_cache_bytes_lock = threading.Lock()
+
+
+def _supported(fmt):
+    try:
+        return features.check(fmt)
+    except ValueError:
+        return False
+
+
+SUPPORTED = {fmt for fmt in FORMATS if fmt == "png" or _supported(fmt)}
+
+
+def source_path(path):
+    if path in EXTRA_SOURCES:
+        full = os.path.join(current_app.root_path, EXTRA_SOURCES[path])
+    else:
+        full = os.path.join(current_app.static_folder, path)
+        if not os.path.realpath(full).startswith(os.path.realpath(current_app.static_folder) + os.sep):
+            return None
+    if not full.lower().endswith(SOURCE_TYPES) or not os.path.isfile(full):
+        return None
+    return full
+
+
+def snap_width(width):
+    """The smallest allowed width that covers ``width``."""
+    for allowed in WIDTHS:
+        if allowed >= width:
+            return allowed
+    return WIDTHS[-1]
+
+
+def negotiate(accept, requested=None):
+    if requested in SUPPORTED:
+        return requested
+    for fmt in ("avif", "webp"):
+        if fmt in SUPPORTED and f"image/{fmt}" in accept:
+            return fmt
+    return "png"
+
+
+def render(source, width, fmt):
+    with Image.open(source) as img:
+        if img.width > width:
+            img = img.resize((width, round(img.height * width / img.width)), Image.LANCZOS)
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA")
+        pil_format, _, options = FORMATS[fmt]
+        out = io.BytesIO()
+        img.save(out, pil_format, **options)
+        return out.getvalue()
+
+
+def _cache_dir():
+    return current_app.config["IMAGE_CACHE_DIR"]
+
+
+def derivative(source, width, fmt):
+    """Path of the cached derivative, rendering it on a miss."""
+    stat = os.stat(source)
+    key = hashlib.sha256(f"{source}:{stat.st_mtime_ns}:{stat.st_size}:{width}:{fmt}".encode()).hexdigest()
+    cache_dir = _cache_dir()
+    path = os.path.join(cache_dir, f"{key[:2]}/{key}.{fmt}")
+    try:
+        os.utime(path)  # recency for LRU; atime is unreliable on noatime mounts
+        return path
+    except FileNotFoundError:
+        pass
+
+    data = render(source, width, fmt)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".part")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    _added(cache_dir, len(data), current_app.config["IMAGE_CACHE_MAX_BYTES"], keep=path)
+    return path
+
+
+def _added(cache_dir, size, max_bytes, keep):
+    """Count a new derivative and evict once the running total passes ``max_bytes``."""
+    with _cache_bytes_lock:
+        if cache_dir not in _cache_bytes:
+            # First write in this worker: start from what is on disk.
+            _cache_bytes[cache_dir] = _disk_usage(cache_dir)
+        else:
+            _cache_bytes[cache_dir] += size
+        if _cache_bytes[cache_dir] <= max_bytes:
+            return
+    remaining = evict(cache_dir, int(max_bytes * LOW_WATER), keep=keep)
+    if remaining is not None:
+        with _cache_bytes_lock:
+            _cache_bytes[cache_dir] = remaining
+
+
+def _disk_usage(cache_dir):
+    total = 0
+    for dirpath, _, filenames in os.walk(cache_dir):
+        for filename in filenames:
+            try:
+                total += os.stat(os.path.join(dirpath, filename)).st_size
+            except FileNotFoundError:
+                pass
+    return total
+
+
+def evict(cache_dir, max_bytes, keep=None):
+    """Delete least recently used derivatives until the cache fits.
+
+    Returns the bytes left, or None if another thread is already evicting.
+    """
+    if not _evict_lock.acquire(blocking=False):
+        return None
+    try:
+        entries = []
+        total = 0
+        for dirpath, _, filenames in os.walk(cache_dir):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                total += stat.st_size
+                if path != keep:
+                    entries.append((stat.st_mtime, stat.st_size, path))
+        for _, size, path in sorted(entries):
+            if total <= max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        return total
+    finally:
+        _evict_lock.release()
+
+
+def image_url(path, width, fmt=None):
+    """URL of the smallest derivative of ``path`` at least ``width`` pixels wide."""
+    source = source_path(path)
+    values = {"filename": path, "w": snap_width(width)}
+    if fmt:
+        values["fmt"] = fmt
+    if source:
+        values["v"] = int(os.stat(source).st_mtime)
+    return url_for("image", **values)
+
+
+def manifest_icons():
+    icons = []
+    for size in ICON_SIZES:
+        for fmt in ("webp", "png"):
+            if fmt not in SUPPORTED:
+                continue
+            icons.append({
+                "src": image_url(MANIFEST_ICON, size, fmt),
+                "sizes": f"{size}x{size}",
+                "type": FORMATS[fmt][1],
+                "purpose": "any maskable",
+            })
+    return icons
+
+
+def web_manifest():
+    with open(os.path.join(current_app.static_folder, "_manifest.json")) as f:
+        manifest = json.load(f)
+    manifest["icons"] = manifest_icons()
+    return manifest
+
+
+def serve(filename):
+    source = source_path(filename)
+    if source is None:
+        abort(404)
+    width = snap_width(request.args.get("w", WIDTHS[-1], type=int))
+    fmt = negotiate(request.headers.get("Accept", ""), request.args.get("fmt"))
+    immutable = "v" in request.args
+    for attempt in range(2):
+        try:
+            response = send_file(os.path.abspath(derivative(source, width, fmt)), mimetype=FORMATS[fmt][1],
+                                 conditional=True, max_age=31536000 if immutable else 86400)
+            break
+        except FileNotFoundError:
+            # Evicted between derivative() and send_file(); render it again.
+            if attempt:
+                raise
+    response.vary.add("Accept")
+    response.cache_control.public = True
+    response.cache_control.immutable = immutable
+    return response
+
+
+def build(sizes=ICON_SIZES, log=print):
+    """Pre-render the manifest icon set in every supported format."""
+    source = source_path(MANIFEST_ICON)
+    count = 0
+    for size in sizes:
+        for fmt in SUPPORTED:
+            path = derivative(source, snap_width(size), fmt)
+            log(f"{MANIFEST_ICON} {size}px {fmt}: {os.path.getsize(path):,} bytes")
+            count += 1
+    return count
+
+
+def init_app(app):
+    app.config.setdefault("IMAGE_CACHE_DIR", os.path.join(app.instance_path, "image-cache"))
+    app.config.setdefault("IMAGE_CACHE_MAX_BYTES", MAX_CACHE_BYTES)
+    app.add_url_rule("/img/<path:filename>", "image", serve)
+    app.jinja_env.globals["image_url"] = image_url
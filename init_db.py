@@ -1,3 +1,7 @@
-from models import Base, engine
+from app import create_app
+from models import db
 
-Base.metadata.create_all(bind=engine)
+app = create_app()
+
+with app.app_context():
+    db.create_all()
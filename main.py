@@ -3,10 +3,8 @@ from models import db
 
 app = create_app()
 
-with app.app_context():
-    db.create_all() 
-
 if __name__ == '__main__':
+    # Local development convenience; deployments run `flask --app main init-db`.
+    with app.app_context():
+        db.create_all()
     app.run(debug=True)
-
-
@@ -0,0 +1,178 @@
+import os
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from flask import Response, abort, g, has_request_context, request, before_render_template, template_rendered
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess,
+)
+from sqlalchemy import event
+
+import query_stats
+
+# With PROMETHEUS_MULTIPROC_DIR set (see gunicorn.conf.py) every worker writes
+# its samples to that directory and /metrics aggregates all of them.
+REQUEST_SECONDS = Histogram(
+    "wingoo_request_seconds", "Request latency by endpoint", ["endpoint", "method"],
+)
+REQUEST_ERRORS = Counter(
+    "wingoo_request_errors_total", "Requests that ended in a 5xx", ["endpoint"],
+)
+POOL_CHECKOUT_SECONDS = Histogram(
+    "wingoo_db_pool_checkout_seconds", "Time spent waiting for a pooled DB connection", ["engine"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30),
+)
+POOL_CHECKED_OUT = Gauge(
+    "wingoo_db_pool_checked_out", "Connections currently checked out of the pool", ["engine"],
+    multiprocess_mode="livesum",
+)
+EXTERNAL_SECONDS = Histogram(
+    "wingoo_external_call_seconds", "Latency of calls to external services", ["service"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+EXTERNAL_ERRORS = Counter(
+    "wingoo_external_call_errors_total", "Failed calls to external services", ["service"],
+)
+CACHE_REQUESTS = Counter(
+    "wingoo_cache_requests_total", "Cache lookups by result", ["cache", "result"],
+)
+SHED_REQUESTS = Counter(
+    "wingoo_shed_requests_total", "Requests rejected by rate limiting or load shedding", ["endpoint", "reason"],
+)
+PASSWORD_HASH_QUEUE_SECONDS = Histogram(
+    "wingoo_password_hash_queue_seconds", "Time password hashing jobs waited for an executor thread",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+PASSWORD_HASH_SECONDS = Histogram(
+    "wingoo_password_hash_seconds", "Time spent hashing or verifying a password", ["op"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+PASSWORD_HASH_PENDING = Gauge(
+    "wingoo_password_hash_pending", "Password hashing jobs queued or running", multiprocess_mode="livesum",
+)
+
+
+def _timings():
+    if not has_request_context():
+        return None
+    if "server_timing" not in g:
+        g.server_timing = defaultdict(float)
+    return g.server_timing
+
+
+def add_timing(span, seconds):
+    """Add ``seconds`` to the ``span`` entry of this request's Server-Timing header."""
+    timings = _timings()
+    if timings is not None:
+        timings[span] += seconds
+
+
+@contextmanager
+def span(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_timing(name, time.perf_counter() - start)
+
+
+@contextmanager
+def external_call(service, span_name=None):
+    """Time a call to ``service`` (e.g. "openai") and count its failures."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        EXTERNAL_ERRORS.labels(service).inc()
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        EXTERNAL_SECONDS.labels(service).observe(elapsed)
+        add_timing(span_name or service, elapsed)
+
+
+def record_cache(cache, hit):
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def _instrument_pool(name, engine):
+    pool = engine.pool
+    if getattr(pool, "_wingoo_timed", False):
+        return
+    connect = pool.connect
+
+    def timed_connect():
+        start = time.perf_counter()
+        try:
+            return connect()
+        finally:
+            POOL_CHECKOUT_SECONDS.labels(name).observe(time.perf_counter() - start)
+
+    pool.connect = timed_connect
+    pool._wingoo_timed = True
+
+
+def instrument_engine(name, engine):
+    _instrument_pool(name, engine)
+    checked_out = POOL_CHECKED_OUT.labels(name)
+    event.listen(engine, "checkout", lambda *args: checked_out.inc())
+    event.listen(engine, "checkin", lambda *args: checked_out.dec())
+    # dispose() swaps in a fresh pool, which needs wrapping again.
+    event.listen(engine, "engine_disposed", lambda conn: _instrument_pool(name, engine))
+
+
+def init_app(app, db):
+    app.config.setdefault("METRICS_TOKEN", os.getenv("METRICS_TOKEN"))
+
+    with app.app_context():
+        for name, engine in db.engines.items():
+            instrument_engine(name or "default", engine)
+
+    @before_render_template.connect_via(app)
+    def start_render(sender, template, context, **extra):
+        g.render_started = time.perf_counter()
+
+    @template_rendered.connect_via(app)
+    def finish_render(sender, template, context, **extra):
+        started = g.pop("render_started", None)
+        if started is not None:
+            add_timing("render", time.perf_counter() - started)
+
+    @app.before_request
+    def start_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        started = g.get("request_started")
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        endpoint = request.endpoint or "unknown"
+        REQUEST_SECONDS.labels(endpoint, request.method).observe(elapsed)
+        if response.status_code >= 500:
+            REQUEST_ERRORS.labels(endpoint).inc()
+
+        timings = dict(_timings())
+        stats = query_stats.current()
+        if stats is not None and stats.count:
+            timings["db"] = stats.seconds
+        timings["total"] = elapsed
+        response.headers["Server-Timing"] = ", ".join(
+            f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items()
+        )
+        return response
+
+    def metrics_endpoint():
+        token = app.config["METRICS_TOKEN"]
+        if token and request.headers.get("Authorization") != f"Bearer {token}":
+            abort(401)
+        if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+        else:
+            registry = REGISTRY
+        return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
+
+    app.add_url_rule("/metrics", "metrics", metrics_endpoint)
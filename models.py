@@ -1,8 +1,9 @@
 from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
+from db_routing import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 
 # ------------------- USERS -------------------
 class User(db.Model, UserMixin):
@@ -23,6 +24,13 @@ class User(db.Model, UserMixin):
     flight_count = db.Column(db.Integer, default=0)
     news_count = db.Column(db.Integer, default=0)
     last_reset = db.Column(db.DateTime, default=datetime.utcnow)
+    # Bumped on every write; part of template fragment cache keys.
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Denormalized gift counters, maintained by services.gifts in the same
+    # transaction as the gift writes.
+    sent_gifts_total = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    received_gifts_total = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    unredeemed_gifts = db.Column(db.Integer, nullable=False, default=0, server_default="0")
 
     gifts_sent = db.relationship("Gift", back_populates="sender", foreign_keys="Gift.sender_id")
     gifts_received = db.relationship("Gift", back_populates="recipient", foreign_keys="Gift.recipient_id")
@@ -33,8 +41,8 @@ class Gift(db.Model):
     __tablename__ = "gifts"
 
     id = db.Column(db.Integer, primary_key=True)
-    sender_id = db.Column(db.Integer, db.ForeignKey("users.id"))
-    recipient_id = db.Column(db.Integer, db.ForeignKey("users.id"))
+    sender_id = db.Column(db.Integer, db.ForeignKey("users.id"), index=True)
+    recipient_id = db.Column(db.Integer, db.ForeignKey("users.id"), index=True)
     gift_type = db.Column(db.String(100))
     message = db.Column(db.Text, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -48,18 +56,25 @@ class Gift(db.Model):
 # ------------------- FLIGHTS -------------------
 class Flight(db.Model):
     __tablename__ = "flights"
+    # Codes are stored canonicalized (services.flights) so one flight is one row.
+    __table_args__ = (
+        db.Index("uq_flights_number_date_route", "flight_number", "date", "departure", "arrival", unique=True),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     flight_number = db.Column(db.String(50), nullable=False)
     departure = db.Column(db.String(100))
     arrival = db.Column(db.String(100))
-    date = db.Column(db.String(50))
+    date = db.Column(db.Date)
 
     bookings = db.relationship("FlightBooking", back_populates="flight")
 
 # ------------------- FLIGHT BOOKINGS -------------------
 class FlightBooking(db.Model):
     __tablename__ = "flight_bookings"
+    __table_args__ = (
+        db.Index("uq_flight_bookings_flight_user", "flight_id", "user_id", unique=True),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"))
@@ -97,6 +112,9 @@ class WaiterCall(db.Model):
 
 class Subscription(db.Model):
     __tablename__ = "subscriptions"
+    __table_args__ = (
+        db.Index("ix_subscriptions_active_end_date", "is_active", "end_date"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
@@ -107,3 +125,25 @@ class Subscription(db.Model):
     user = db.relationship("User", back_populates="subscription", uselist=False)
 
 
+
+# ------------------- BACKGROUND JOBS -------------------
+class Job(db.Model):
+    __tablename__ = "jobs"
+    __table_args__ = (
+        db.Index("ix_jobs_status_run_at", "status", "run_at"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.Text)
+    priority = db.Column(db.Integer, nullable=False, default=0)
+    idempotency_key = db.Column(db.String(200), unique=True, nullable=True)
+    status = db.Column(db.String(20), nullable=False, default="queued")
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_until = db.Column(db.DateTime, nullable=True)
+    locked_by = db.Column(db.String(100), nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
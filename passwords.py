@@ -0,0 +1,169 @@
+"""Password hashing on a bounded executor, with transparent hash upgrades.
+
+scrypt and pbkdf2 are slow on purpose. Run inline, a burst of logins puts
+one hash per request thread on the CPU at once and every other request in
+the worker waits behind them. Here hashes run on PASSWORD_HASH_WORKERS
+dedicated threads per process (the hash functions release the GIL), so a
+burst only ever takes that many cores. Up to PASSWORD_HASH_MAX_QUEUE further
+jobs wait their turn. Beyond that, or after PASSWORD_HASH_TIMEOUT seconds,
+the request is shed with ``503``. PASSWORD_HASH_WORKERS=0 hashes inline.
+
+The bound only means something when a process serves several requests at
+once; gunicorn.conf.py runs threaded workers and sizes both settings from
+the worker and thread counts so the host-wide total stays at half the cores.
+
+PASSWORD_HASH_METHOD takes werkzeug's method syntax ("scrypt:32768:8:1",
+"pbkdf2:sha256:1000000"). ``verify`` also returns a fresh hash whenever the
+stored one was made with different parameters, so the login view can
+upgrade it while it has the plaintext.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from flask import current_app, flash, jsonify, redirect, request, url_for
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+import metrics
+
+DEFAULT_METHOD = "scrypt:32768:8:1"
+MAX_QUEUE = 32
+TIMEOUT = 10
+
+
+class PasswordBusy(Exception):
+    """The hashing executor is saturated; retry shortly."""
+
+
+def canonical_method(method):
+    """``method`` with werkzeug's defaults filled in, as it appears in hashes."""
+    name, *args = method.split(":")
+    if name == "scrypt" and not args:
+        args = ["32768", "8", "1"]
+    elif name == "pbkdf2":
+        args += ["sha256", str(DEFAULT_PBKDF2_ITERATIONS)][len(args):]
+    return ":".join([name, *args])
+
+
+def needs_rehash(stored, method):
+    return stored.split("$", 1)[0] != method
+
+
+def _hash(password, method):
+    start = time.perf_counter()
+    value = generate_password_hash(password, method=method)
+    metrics.PASSWORD_HASH_SECONDS.labels("hash").observe(time.perf_counter() - start)
+    return value
+
+
+def _verify(stored, password, method):
+    start = time.perf_counter()
+    ok = check_password_hash(stored, password)
+    metrics.PASSWORD_HASH_SECONDS.labels("verify").observe(time.perf_counter() - start)
+    if ok and needs_rehash(stored, method):
+        return True, _hash(password, method)
+    return ok, None
+
+
+class Hasher:
+    def __init__(self, method, workers, max_queue, timeout):
+        self.method = canonical_method(method)
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.pending = 0
+        self.lock = threading.Lock()
+        self.pid = None
+        self.executor = None
+
+    def _executor(self):
+        # A forked worker must not reuse the parent's (dead) threads.
+        if self.pid != os.getpid():
+            self.pid = os.getpid()
+            self.executor = ThreadPoolExecutor(self.workers, thread_name_prefix="password-hash")
+        return self.executor
+
+    def _release(self):
+        with self.lock:
+            self.pending -= 1
+        metrics.PASSWORD_HASH_PENDING.dec()
+
+    def run(self, fn, *args):
+        if not self.workers:
+            return fn(*args)
+        with self.lock:
+            if self.pending >= self.workers + self.max_queue:
+                raise PasswordBusy()
+            self.pending += 1
+            executor = self._executor()
+        metrics.PASSWORD_HASH_PENDING.inc()
+        submitted = time.perf_counter()
+
+        def job():
+            metrics.PASSWORD_HASH_QUEUE_SECONDS.observe(time.perf_counter() - submitted)
+            try:
+                return fn(*args)
+            finally:
+                self._release()
+
+        future = executor.submit(job)
+        try:
+            return future.result(self.timeout)
+        except TimeoutError:
+            if future.cancel():
+                self._release()
+            raise PasswordBusy()
+        finally:
+            metrics.add_timing("hash", time.perf_counter() - submitted)
+
+
+def _hasher():
+    return current_app.extensions["passwords"]
+
+
+def hash_password(password):
+    hasher = _hasher()
+    return hasher.run(_hash, password, hasher.method)
+
+
+def verify(stored, password):
+    """Check ``password``; returns (matches, upgraded hash or None)."""
+    if not stored:
+        return False, None
+    hasher = _hasher()
+    return hasher.run(_verify, stored, password, hasher.method)
+
+
+def current_method():
+    return _hasher().method
+
+
+def init_app(app):
+    app.config.setdefault("PASSWORD_HASH_METHOD", os.getenv("PASSWORD_HASH_METHOD", DEFAULT_METHOD))
+    app.config.setdefault("PASSWORD_HASH_WORKERS", int(os.getenv(
+        "PASSWORD_HASH_WORKERS", max(1, (os.cpu_count() or 2) // 2))))
+    app.config.setdefault("PASSWORD_HASH_MAX_QUEUE", int(os.getenv("PASSWORD_HASH_MAX_QUEUE", MAX_QUEUE)))
+    app.config.setdefault("PASSWORD_HASH_TIMEOUT", float(os.getenv("PASSWORD_HASH_TIMEOUT", TIMEOUT)))
+
+    app.extensions["passwords"] = Hasher(
+        app.config["PASSWORD_HASH_METHOD"], app.config["PASSWORD_HASH_WORKERS"],
+        app.config["PASSWORD_HASH_MAX_QUEUE"], app.config["PASSWORD_HASH_TIMEOUT"],
+    )
+
+    @app.errorhandler(PasswordBusy)
+    def shed(error):
+        metrics.SHED_REQUESTS.labels(request.endpoint or "unknown", "password_hash").inc()
+        message = "Server busy, try again shortly."
+        if request.is_json:
+            response = jsonify({'status': 'error', 'message': message})
+            response.status_code = 503
+        else:
+            # Browsers do not follow Location on a 503, but they do honour Refresh.
+            flash(message, "warning")
+            referrer = request.referrer or ""
+            target = referrer if referrer.startswith(request.host_url) else url_for("routes.home")
+            response = redirect(target, 503)
+            response.headers["Refresh"] = f"0; url={target}"
+        response.headers["Retry-After"] = "1"
+        return response
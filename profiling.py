@@ -0,0 +1,221 @@
+"""Admin-only, on-demand profiling for a live worker.
+
+Profiles cover the worker process that serves the admin request. While no
+session is active the request hooks do a single ``None`` check.
+"""
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from functools import wraps
+
+from flask import Blueprint, Response, abort, current_app, jsonify, request
+from flask_login import current_user
+
+from db_routing import pool_stats
+
+SAMPLE_INTERVAL = 0.01
+MIN_SECONDS = 1
+MAX_SECONDS = 300
+
+bp = Blueprint('profiling', __name__, url_prefix='/admin/profile')
+
+_session = None
+_last_result = None
+_snapshots = []
+_lock = threading.Lock()
+
+
+def admin_required(fn):
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        admins = current_app.config["ADMIN_EMAILS"]
+        if not current_user.is_authenticated or current_user.email not in admins:
+            abort(403)
+        return fn(*args, **kwargs)
+    return wrapper
+
+
+class Sampler(threading.Thread):
+    """Samples Python stacks of other threads into collapsed-stack counts,
+    the input format of flamegraph.pl and speedscope."""
+
+    def __init__(self, interval=SAMPLE_INTERVAL, seconds=MAX_SECONDS, endpoint=None, request_count=None):
+        super().__init__(name="profiler", daemon=True)
+        self.interval = interval
+        # Always bounded: a forgotten session must not sample forever.
+        self.deadline = time.monotonic() + min(max(seconds, MIN_SECONDS), MAX_SECONDS)
+        self.endpoint = endpoint
+        self.requests_left = request_count
+        self.threads = set() if endpoint else None
+        self.stacks = Counter()
+        self.samples = 0
+        self.stopped = threading.Event()
+
+    def run(self):
+        own = threading.get_ident()
+        while not self.stopped.wait(self.interval):
+            if time.monotonic() >= self.deadline:
+                break
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own or (self.threads is not None and thread_id not in self.threads):
+                    continue
+                self.stacks[collapse(frame)] += 1
+                self.samples += 1
+        self.stopped.set()
+        _finish(self)
+
+    def stop(self):
+        self.stopped.set()
+
+
+def collapse(frame):
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(stack))
+
+
+def _finish(sampler):
+    global _session, _last_result
+    with _lock:
+        if _session is sampler:
+            _session = None
+        _last_result = sampler
+
+
+def init_app(app):
+    app.config.setdefault("ADMIN_EMAILS", {
+        email.strip() for email in os.getenv("ADMIN_EMAILS", "").split(",") if email.strip()
+    })
+
+    @app.before_request
+    def track_profiled_request():
+        session = _session
+        if session is not None and session.threads is not None and request.endpoint == session.endpoint:
+            session.threads.add(threading.get_ident())
+
+    @app.teardown_request
+    def untrack_profiled_request(exc):
+        session = _session
+        if session is None or session.threads is None:
+            return
+        thread_id = threading.get_ident()
+        if thread_id in session.threads:
+            session.threads.discard(thread_id)
+            session.requests_left -= 1
+            if session.requests_left <= 0:
+                session.stop()
+
+    app.register_blueprint(bp)
+
+
+@bp.route('/cpu/start', methods=['POST'])
+@admin_required
+def cpu_start():
+    """Start sampling for ``seconds`` or for the next ``requests`` to ``endpoint``."""
+    global _session
+    seconds = request.args.get('seconds', 30, type=float)
+    if not seconds > 0:
+        return jsonify({'status': 'error', 'message': 'seconds must be positive'}), 400
+    seconds = min(max(seconds, MIN_SECONDS), MAX_SECONDS)
+    endpoint = request.args.get('endpoint')
+    request_count = request.args.get('requests', 1, type=int)
+    interval = max(request.args.get('interval', SAMPLE_INTERVAL, type=float), 0.001)
+
+    with _lock:
+        if _session is not None:
+            return jsonify({'status': 'error', 'message': 'A profile is already running'}), 409
+        if endpoint:
+            # Still capped by MAX_SECONDS in case the endpoint is never hit.
+            _session = Sampler(interval, seconds=MAX_SECONDS, endpoint=endpoint, request_count=request_count)
+        else:
+            _session = Sampler(interval, seconds=seconds)
+        _session.start()
+
+    return jsonify({'status': 'started', 'pid': os.getpid()})
+
+
+@bp.route('/cpu/stop', methods=['POST'])
+@admin_required
+def cpu_stop():
+    session = _session
+    if session is not None:
+        session.stop()
+        session.join()
+    return jsonify({'status': 'stopped'})
+
+
+@bp.route('/cpu/result')
+@admin_required
+def cpu_result():
+    """Collapsed stacks ("frame;frame;frame count" per line)."""
+    if _session is not None:
+        return jsonify({'status': 'running', 'samples': _session.samples}), 202
+    if _last_result is None:
+        abort(404)
+    body = "\n".join(f"{stack} {count}" for stack, count in _last_result.stacks.most_common())
+    return Response(body + "\n", mimetype="text/plain")
+
+
+@bp.route('/db/pool')
+@admin_required
+def db_pool():
+    from models import db
+    return jsonify(pool_stats(db))
+
+
+@bp.route('/memory/start', methods=['POST'])
+@admin_required
+def memory_start():
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(request.args.get('frames', 10, type=int))
+    return jsonify({'status': 'tracing', 'pid': os.getpid()})
+
+
+@bp.route('/memory/snapshot', methods=['POST'])
+@admin_required
+def memory_snapshot():
+    if not tracemalloc.is_tracing():
+        return jsonify({'status': 'error', 'message': 'tracemalloc is not running'}), 409
+    snapshot = tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    ])
+    with _lock:
+        _snapshots.append(snapshot)
+        del _snapshots[:-2]
+    current, peak = tracemalloc.get_traced_memory()
+    return jsonify({'status': 'ok', 'snapshots': len(_snapshots), 'current_bytes': current, 'peak_bytes': peak})
+
+
+@bp.route('/memory/diff')
+@admin_required
+def memory_diff():
+    """Top allocation growth between the last two snapshots."""
+    if len(_snapshots) < 2:
+        return jsonify({'status': 'error', 'message': 'Take two snapshots first'}), 409
+    key = request.args.get('group', 'lineno')
+    if key not in ('lineno', 'filename', 'traceback'):
+        abort(400)
+    limit = request.args.get('limit', 25, type=int)
+    stats = _snapshots[1].compare_to(_snapshots[0], key)[:limit]
+    lines = []
+    for stat in stats:
+        lines.append(str(stat))
+        if key == 'traceback':
+            lines.extend(f"    {line}" for line in stat.traceback.format())
+    return Response("\n".join(lines) + "\n", mimetype="text/plain")
+
+
+@bp.route('/memory/stop', methods=['POST'])
+@admin_required
+def memory_stop():
+    tracemalloc.stop()
+    with _lock:
+        _snapshots.clear()
+    return jsonify({'status': 'stopped'})
@@ -0,0 +1,140 @@
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+N_PLUS_ONE_THRESHOLD = 5
+
+_local = threading.local()
+
+_LITERALS = [
+    (re.compile(r"'(?:[^']|'')*'"), "?"),
+    (re.compile(r"%\(\w+\)s|%s|:\w+|\$\d+"), "?"),
+    (re.compile(r"\b\d+(?:\.\d+)?\b"), "?"),
+    (re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)"), "(?)"),
+    (re.compile(r"\s+"), " "),
+]
+
+
+def fingerprint(statement):
+    """Normalize a SQL statement so queries differing only in literals match."""
+    for pattern, replacement in _LITERALS:
+        statement = pattern.sub(replacement, statement)
+    return statement.strip()
+
+
+class QueryStats:
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.fingerprints = Counter()
+
+    def record(self, statement, seconds):
+        self.count += 1
+        self.seconds += seconds
+        self.fingerprints[fingerprint(statement)] += 1
+
+    def repeated(self, threshold=N_PLUS_ONE_THRESHOLD):
+        """Fingerprints issued at least ``threshold`` times (likely N+1 loops)."""
+        return [(fp, n) for fp, n in self.fingerprints.most_common() if n >= threshold]
+
+    def summary(self, threshold=N_PLUS_ONE_THRESHOLD):
+        return f"queries={self.count}; db_ms={self.seconds * 1000:.1f}; n_plus_one={len(self.repeated(threshold))}"
+
+
+def _active_recorders():
+    recorders = list(getattr(_local, "budgets", ()))
+    if has_request_context() and "query_stats" in g:
+        recorders.append(g.query_stats)
+    return recorders
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    for recorder in _active_recorders():
+        recorder.record(statement, elapsed)
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(context):
+    # after_cursor_execute never runs for a failed statement; without this pop
+    # the pooled connection would time its next query from this one's start.
+    starts = context.connection.info.get("query_start") if context.connection is not None else None
+    if starts:
+        elapsed = time.perf_counter() - starts.pop()
+        for recorder in _active_recorders():
+            recorder.record(context.statement or "", elapsed)
+
+
+def current():
+    """The QueryStats of the current request, or None outside a request."""
+    return g.get("query_stats") if has_request_context() else None
+
+
+def init_app(app):
+    app.config.setdefault("SQL_N_PLUS_ONE_THRESHOLD", N_PLUS_ONE_THRESHOLD)
+    app.config.setdefault("SQL_STATS_HEADER", app.debug)
+
+    @app.before_request
+    def start_query_stats():
+        g.query_stats = QueryStats()
+
+    @app.after_request
+    def report_query_stats(response):
+        stats = g.get("query_stats")
+        if stats is None:
+            return response
+
+        threshold = app.config["SQL_N_PLUS_ONE_THRESHOLD"]
+        summary = stats.summary(threshold)
+        if app.config["SQL_STATS_HEADER"]:
+            response.headers["X-DB-Stats"] = summary
+
+        repeated = stats.repeated(threshold)
+        if repeated:
+            logging.warning("Possible N+1 on %s (%s): %s", request.endpoint, summary,
+                            "; ".join(f"{n}x {fp[:200]}" for fp, n in repeated))
+        else:
+            logging.debug("SQL on %s: %s", request.endpoint, summary)
+        return response
+
+
+@contextmanager
+def query_budget(max_queries, n_plus_one_threshold=None):
+    """Fail with AssertionError if the block issues more than ``max_queries``.
+
+    Intended for tests::
+
+        with query_budget(3):
+            client.get("/matches")
+
+    With ``n_plus_one_threshold`` set, repeated fingerprints also fail.
+    """
+    stats = QueryStats()
+    budgets = _local.__dict__.setdefault("budgets", [])
+    budgets.append(stats)
+    try:
+        yield stats
+    finally:
+        budgets.remove(stats)
+
+    problems = []
+    if stats.count > max_queries:
+        problems.append(f"{stats.count} queries issued, budget was {max_queries}")
+    if n_plus_one_threshold:
+        problems.extend(f"{n}x {fp}" for fp, n in stats.repeated(n_plus_one_threshold))
+    if problems:
+        detail = "\n".join(f"  {n}x {fp}" for fp, n in stats.fingerprints.most_common())
+        raise AssertionError("; ".join(problems) + "\n" + detail)
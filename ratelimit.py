@@ -0,0 +1,213 @@
+"""Per-endpoint token buckets and early load shedding.
+
+RATELIMITS maps an endpoint to ``{"user": (rate, burst), "ip": (rate, burst)}``
+where ``rate`` is tokens refilled per second and ``burst`` the bucket size.
+Checks run in ``before_request`` using only the session cookie and the
+client address, so a rejected request never touches the database.
+
+Backends (RATELIMIT_BACKEND):
+
+- ``memory``: buckets live in the worker process; limits apply per worker.
+- ``sqlite``: buckets live in a local SQLite file (RATELIMIT_STORAGE_PATH)
+  shared by every worker on the host.
+
+Limited endpoints are also shed with ``503`` while the worker is saturated:
+more than RATELIMIT_MAX_INFLIGHT requests in progress, or a request that
+waited longer than RATELIMIT_MAX_QUEUE_SECONDS in front of the app according
+to the proxy's ``X-Request-Start`` header. Both checks are off when unset.
+"""
+import logging
+import math
+import os
+import random
+import sqlite3
+import threading
+import time
+
+from flask import jsonify, request, session
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LIMITS = {
+    "routes.check_zone": {"user": (1, 10), "ip": (5, 50)},
+    "routes.set_location": {"user": (0.5, 5), "ip": (5, 50)},
+    "routes.update_location": {"user": (0.5, 5), "ip": (5, 50)},
+    "routes.call_waiter": {"user": (0.1, 3), "ip": (1, 10)},
+}
+PRUNE_AFTER = 3600
+
+
+def refill(tokens, updated, rate, burst, now):
+    """Take one token from a bucket; returns (tokens left, retry after seconds or 0)."""
+    if tokens is None:
+        tokens = burst
+    else:
+        tokens = min(burst, tokens + (now - updated) * rate)
+    if tokens >= 1:
+        return tokens - 1, 0
+    return tokens, (1 - tokens) / rate
+
+
+class MemoryBackend:
+    def __init__(self, max_keys=100000):
+        self.buckets = {}
+        self.max_keys = max_keys
+        self.lock = threading.Lock()
+
+    def take(self, key, rate, burst, now):
+        with self.lock:
+            tokens, updated = self.buckets.get(key, (None, now))
+            tokens, retry_after = refill(tokens, updated, rate, burst, now)
+            self.buckets[key] = (tokens, now)
+            if len(self.buckets) > self.max_keys:
+                self._prune(now)
+            return retry_after
+
+    def _prune(self, now):
+        for key, (_, updated) in list(self.buckets.items()):
+            if now - updated > PRUNE_AFTER:
+                del self.buckets[key]
+        if len(self.buckets) > self.max_keys:
+            # Idle buckets refill to full anyway, so the oldest are safe to drop.
+            for key, _ in sorted(self.buckets.items(), key=lambda item: item[1][1])[:len(self.buckets) // 2]:
+                del self.buckets[key]
+
+
+class SQLiteBackend:
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None or self.local.pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=1, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL, updated REAL)"
+            )
+            self.local.conn, self.local.pid = conn, os.getpid()
+        return conn
+
+    def take(self, key, rate, burst, now):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens, retry_after = refill(*(row or (None, now)), rate, burst, now)
+            conn.execute(
+                "INSERT INTO buckets (key, tokens, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                (key, tokens, now),
+            )
+            if random.random() < 0.001:
+                conn.execute("DELETE FROM buckets WHERE updated < ?", (now - PRUNE_AFTER,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return retry_after
+
+
+def make_backend(app):
+    name = app.config["RATELIMIT_BACKEND"]
+    if name == "memory":
+        return MemoryBackend()
+    if name == "sqlite":
+        return SQLiteBackend(app.config["RATELIMIT_STORAGE_PATH"])
+    raise ValueError(f"Unknown RATELIMIT_BACKEND {name!r}")
+
+
+def queue_seconds(header, now):
+    """Time since the proxy received the request, from ``X-Request-Start``.
+
+    Accepts ``t=<seconds>`` or ``<seconds|milliseconds|microseconds>``.
+    """
+    if not header:
+        return None
+    try:
+        value = float(header.split("=", 1)[-1])
+    except ValueError:
+        return None
+    while value > now * 100:  # ms or us since the epoch
+        value /= 1000
+    return max(0.0, now - value)
+
+
+def _too_many(message, retry_after, status):
+    response = jsonify({'status': 'error', 'message': message})
+    response.status_code = status
+    response.headers["Retry-After"] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+class _Inflight:
+    def __init__(self):
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def add(self, n):
+        with self.lock:
+            self.count += n
+            return self.count
+
+
+def init_app(app):
+    app.config.setdefault("RATELIMIT_ENABLED", os.getenv("RATELIMIT_ENABLED", "1") == "1")
+    app.config.setdefault("RATELIMIT_BACKEND", os.getenv("RATELIMIT_BACKEND", "memory"))
+    app.config.setdefault("RATELIMIT_STORAGE_PATH", os.getenv(
+        "RATELIMIT_STORAGE_PATH", os.path.join(app.instance_path, "ratelimit.db")))
+    app.config.setdefault("RATELIMIT_MAX_INFLIGHT", int(os.getenv("RATELIMIT_MAX_INFLIGHT", 0)))
+    app.config.setdefault("RATELIMIT_MAX_QUEUE_SECONDS", float(os.getenv("RATELIMIT_MAX_QUEUE_SECONDS", 0)))
+    app.config.setdefault("RATELIMITS", DEFAULT_LIMITS)
+    if not app.config["RATELIMIT_ENABLED"]:
+        return
+
+    backend = make_backend(app)
+    inflight = _Inflight()
+
+    @app.before_request
+    def limit_request():
+        request.counted_inflight = True
+        current = inflight.add(1)
+        limits = app.config["RATELIMITS"].get(request.endpoint)
+        if not limits:
+            return None
+        now = time.time()
+
+        max_inflight = app.config["RATELIMIT_MAX_INFLIGHT"]
+        if max_inflight and current > max_inflight:
+            metrics.SHED_REQUESTS.labels(request.endpoint, "inflight").inc()
+            return _too_many("Server busy, try again shortly.", 1, 503)
+        max_queue = app.config["RATELIMIT_MAX_QUEUE_SECONDS"]
+        waited = queue_seconds(request.headers.get("X-Request-Start"), now) if max_queue else None
+        if waited is not None and waited > max_queue:
+            metrics.SHED_REQUESTS.labels(request.endpoint, "queue").inc()
+            return _too_many("Server busy, try again shortly.", 1, 503)
+
+        keys = []
+        user_id = session.get("_user_id")
+        if user_id and "user" in limits:
+            keys.append(("user", f"{request.endpoint}:u:{user_id}", *limits["user"]))
+        if "ip" in limits:
+            keys.append(("ip", f"{request.endpoint}:ip:{request.remote_addr}", *limits["ip"]))
+        for scope, key, rate, burst in keys:
+            try:
+                retry_after = backend.take(key, rate, burst, now)
+            except sqlite3.Error:
+                # A busy or broken store must not take the endpoint down with it.
+                logger.warning("rate limit store unavailable", exc_info=True)
+                return None
+            if retry_after:
+                metrics.SHED_REQUESTS.labels(request.endpoint, f"rate_{scope}").inc()
+                return _too_many("Too many requests, slow down.", retry_after, 429)
+        return None
+
+    @app.teardown_request
+    def release_inflight(exc):
+        if getattr(request, "counted_inflight", False):
+            inflight.add(-1)
@@ -1,27 +1,23 @@
-from flask import Blueprint, render_template, request, redirect, url_for, session, jsonify, flash, send_from_directory
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask import Blueprint, current_app, render_template, request, redirect, url_for, session, jsonify, flash, abort
 from flask_login import current_user, login_required, login_user, logout_user
-from services.matching import match_users
-from models import db, User, Zone, WaiterCall, Gift, Flight, FlightBooking, Subscription
-from zones import haversine
+from services.matching import interest_mask, match_candidates, match_users, nearby_matches, parse_interests
+from services import gifts as gift_service
+from services import news as news_service
+from services import audio as audio_service
+from services import flights as flights_service
+from models import db, User, Zone, WaiterCall, Gift, Subscription
+from zones import cell, zone_candidates, zones_at
+from db_routing import read_replica
+import assets
+import images
+import singleflight
+import passwords
+from sqlalchemy.orm import joinedload
 from datetime import datetime, timedelta
 import json, os
+from types import SimpleNamespace
 from werkzeug.utils import secure_filename
-from gtts import gTTS
-from pathlib import Path
-from openai import OpenAI
-import openai
-from dotenv import load_dotenv
-import stripe
 
-
-stripe.api_key = os.getenv("STRIPE_SECRET_KEY")
-load_dotenv()
-openai.api_key = os.getenv("OPENAI_API_KEY")
-
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
-UPLOAD_FOLDER = os.path.join("static", "audio")
 ALLOWED_EXTENSIONS = {'mp3'}
 
 bp = Blueprint('routes', __name__)
@@ -32,11 +28,18 @@ def home():
 
 @bp.route('/_manifest.json')
 def manifest():
-    return send_from_directory('static', '_manifest.json', mimetype='application/manifest+json')
+    return current_app.response_class(json.dumps(images.web_manifest()), mimetype='application/manifest+json')
 
 @bp.route('/_service-worker.js')
 def service_worker():
-    return send_from_directory('static', '_service-worker.js', mimetype='application/javascript')
+    body = render_template(
+        '_service-worker.js',
+        version=current_app.extensions['assets']['version'],
+        precache=assets.precache_urls(),
+    )
+    response = current_app.response_class(body, mimetype='application/javascript')
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 
 def reset_limits_if_needed(user):
@@ -82,7 +85,7 @@ def register():
         return render_template("index.html", active_tab="register")
 
     uid = email.split("@")[0] + "_uid"
-    hashed_pw = generate_password_hash(password)
+    hashed_pw = passwords.hash_password(password)
     new_user = User(uid=uid, email=email, display_name=name, password=hashed_pw)
 
     lat = request.form.get("lat")
@@ -106,7 +109,11 @@ def login():
         password = request.form["password"]
 
         user = User.query.filter_by(email=email).first()
-        if user and check_password_hash(user.password, password):
+        valid, upgraded = passwords.verify(user.password, password) if user else (False, None)
+        if valid:
+            if upgraded:
+                user.password = upgraded
+                db.session.commit()
             login_user(user) 
             flash("Login successful!", "success")
             return redirect(url_for('routes.dashboard')) 
@@ -200,16 +207,16 @@ def check_zone():
             return jsonify({"zones": []})
 
         user_interests = set(json.loads(current_user.interests or "[]"))
-        matches = []
-
-        zones = Zone.query.all()
-        for zone in zones:
-            distance = haversine(lat, lon, zone.latitude, zone.longitude)
-            if distance <= zone.radius_meters and zone.interest in user_interests:
-                matches.append({
-                    "zone_name": zone.name,
-                    "interest": zone.interest
-                })
+        lat, lon = float(lat), float(lon)
+        # Users in the same ~110 m cell share one scan for the zones that could
+        # cover it; the exact position and interests are checked per request.
+        cell_lat, cell_lon = cell(lat, lon)
+        candidates = singleflight.do(
+            "check_zone", f"{cell_lat}:{cell_lon}",
+            lambda: zone_candidates(cell_lat, cell_lon, Zone.query.all()),
+            workers=False,
+        )
+        matches = zones_at(lat, lon, user_interests, candidates)
 
         return jsonify({"zones": matches})
     except Exception as e:
@@ -247,43 +254,33 @@ def send_gift():
     gift_type = request.form.get('gift_type')
     message = request.form.get('message', '')
 
-    if not recipient_id or not gift_type:
-        flash("Recipient and gift type are required.", "danger")
+    try:
+        fee_cents = gift_service.send_gift(current_user.id, recipient_id, gift_type, message)
+    except gift_service.GiftError as e:
+        flash(str(e), "danger")
         return redirect(url_for('routes.find_matches'))
 
-    reset_limits_if_needed(current_user)
-
-    if current_user.is_premium:
-        fee_cents = 0
-    else:
-        if current_user.gift_count >= 5:
-            fee_cents = 50  # 0.50€
-            payment_simulated = True 
-
-            if not payment_simulated:
-                flash("Simulated payment failed.", "danger")
-                return redirect(url_for('routes.find_matches'))
-        else:
-            fee_cents = 0
-
-    gift = Gift(
-        sender_id=current_user.id,
-        recipient_id=recipient_id,
-        gift_type=gift_type,
-        message=message,
-        fee_cents=fee_cents
-    )
-    db.session.add(gift)
-
-    if not current_user.is_premium:
-        current_user.gift_count += 1
-
-    db.session.commit()
-
     flash(f"Gift sent successfully!{' (Payment simulated)' if fee_cents else ''}", "success")
     return redirect(url_for('routes.sent_gifts'))
 
+@bp.route('/api/gifts/bulk', methods=['POST'])
+@login_required
+def send_gifts_bulk():
+    data = request.get_json(silent=True) or {}
+    try:
+        fees = gift_service.send_gifts(
+            current_user.id,
+            data.get('recipient_ids', []),
+            data.get('gift_type'),
+            data.get('message', '')
+        )
+    except gift_service.GiftError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+
+    return jsonify({'status': 'success', 'sent': len(fees), 'fee_cents': sum(fees)})
+
 @bp.route('/my_gifts', methods=['GET'])
+@read_replica
 def my_gifts():
     if 'user_id' not in session:
         return redirect(url_for('routes.login'))
@@ -301,77 +298,89 @@ def send_gift_form():
         gift_type = request.form['gift_type']
         message = request.form.get('message', '')
 
-        gift = Gift(
-            sender_id=current_user.id,
-            recipient_id=recipient_id,
-            gift_type=gift_type,
-            message=message
-        )
-        db.session.add(gift)
-        db.session.commit()
+        try:
+            fee_cents = gift_service.send_gift(current_user.id, recipient_id, gift_type, message)
+        except gift_service.GiftError as e:
+            flash(str(e), "danger")
+            return redirect(url_for('routes.send_gift_form'))
 
-        flash("Gift sent successfully!", "success")
+        flash(f"Gift sent successfully!{' (Payment simulated)' if fee_cents else ''}", "success")
         return redirect(url_for('routes.sent_gifts'))
 
     users = User.query.all()
     return render_template('send_gift_form.html', users=users)
 
 @bp.route('/received_gifts')
+@read_replica
 @login_required
 def received_gifts():
-    gifts = Gift.query.filter_by(recipient_id=current_user.id).order_by(Gift.created_at.desc()).all()
+    # Run by the template only when its fragment cache misses.
+    gifts = (Gift.query.filter_by(recipient_id=current_user.id)
+             .options(joinedload(Gift.sender)).order_by(Gift.created_at.desc()))
     return render_template("received_gifts.html", gifts=gifts)
 
+@bp.route('/gifts/<int:gift_id>/redeem', methods=['POST'])
+@login_required
+def redeem_gift(gift_id):
+    if gift_service.redeem_gift(gift_id, current_user.id):
+        flash("Gift redeemed!", "success")
+    else:
+        flash("This gift cannot be redeemed.", "danger")
+    return redirect(url_for('routes.received_gifts'))
+
+@bp.route('/api/gifts/inbox')
+@login_required
+def gift_inbox():
+    after_id = request.args.get('after', 0, type=int)
+    known_total = request.args.get('total', type=int)
+    # Holding the request is only safe on threaded/async workers; on sync
+    # workers GIFT_INBOX_MAX_WAIT stays 0 and clients poll with backoff.
+    max_wait = current_app.config['GIFT_INBOX_MAX_WAIT']
+    wait = min(max(request.args.get('wait', max_wait, type=int), 0), max_wait)
+
+    gifts, total = gift_service.wait_for_gifts(current_user.id, after_id, known_total, timeout=wait)
+    return jsonify({
+        'wait': wait,
+        'gifts': gifts,
+        'total': total,
+        'last_id': gifts[-1]['id'] if gifts else after_id,
+    })
+
 @bp.route('/sent_gifts')
+@read_replica
 @login_required
 def sent_gifts():
-    gifts = Gift.query.filter_by(sender_id=current_user.id).order_by(Gift.created_at.desc()).all()
+    # Run by the template only when its fragment cache misses.
+    gifts = (Gift.query.filter_by(sender_id=current_user.id)
+             .options(joinedload(Gift.recipient)).order_by(Gift.created_at.desc()))
     return render_template("sent_gifts.html", gifts=gifts)
 
 @bp.route('/matches')
+@read_replica
 @login_required
 def find_matches():
     if not current_user.latitude or not current_user.longitude:
         flash("Please update your location to find matches.", "warning")
         return redirect(url_for('routes.dashboard'))
-    try:
-        current_user_interests = set(json.loads(current_user.interests))
-    except (TypeError, json.JSONDecodeError):
-        current_user_interests = set()
-
-    all_users = User.query.filter(User.id != current_user.id).all()
-    matches = []
-    
-    matching_radius_km = 50 
-
-    for other_user in all_users:
-        if other_user.latitude and other_user.longitude and other_user.interests:
-            distance = haversine(
-                current_user.latitude, current_user.longitude,
-                other_user.latitude, other_user.longitude
-            ) / 1000  
-
-            if distance <= matching_radius_km:
-                try:
-                    other_user_interests = set(json.loads(other_user.interests))
-                    common_interests = current_user_interests.intersection(other_user_interests)
-
-                    if common_interests:
-                        match_data = {
-                            "user": other_user,
-                            "distance_km": round(distance, 2),
-                            "common_interests": list(common_interests)
-                        }
-                        matches.append(match_data)
-                except (TypeError, json.JSONDecodeError):
-                    continue
-    
-    sorted_matches = sorted(matches, key=lambda x: x['distance_km'])
+    matching_radius_km = 50
+    user_interests = parse_interests(current_user.interests)
+    # Users in the same ~100 m cell with the same interests share one scan;
+    # exact distances are still computed per user below. Candidates are
+    # profiles, so they are shared within the worker only, never on disk.
+    lat, lon = round(current_user.latitude, 3), round(current_user.longitude, 3)
+    candidates = singleflight.do(
+        "matches", f"{lat}:{lon}:{interest_mask(user_interests)}",
+        lambda: match_candidates(lat, lon, user_interests, matching_radius_km + 1),
+        workers=False,
+    )
+    others = [SimpleNamespace(**c) for c in candidates if c["id"] != current_user.id]
+    sorted_matches = nearby_matches(current_user, others, radius_km=matching_radius_km)
 
     return render_template("matches.html", matches=sorted_matches)
 
 
 @bp.route('/api/match', methods=['GET'])
+@read_replica
 @login_required
 def get_matches():
     matches = match_users(current_user.id)
@@ -426,16 +435,13 @@ def edit_interests():
 @bp.route('/send_gift_to/<int:recipient_id>', methods=['POST'])
 @login_required
 def send_gift_to(recipient_id):
-    gift = Gift(
-        sender_id=current_user.id,
-        recipient_id=recipient_id,
-        gift_type="default", 
-        message="Enjoy your gift!"
-    )
-    db.session.add(gift)
-    db.session.commit()
+    try:
+        fee_cents = gift_service.send_gift(current_user.id, recipient_id, "default", "Enjoy your gift!")
+    except gift_service.GiftError as e:
+        flash(str(e), "danger")
+        return redirect(url_for('routes.find_matches'))
 
-    flash("Gift sent successfully!", "success")
+    flash(f"Gift sent successfully!{' (Payment simulated)' if fee_cents else ''}", "success")
     return redirect(url_for('routes.find_matches'))
 
 @bp.route('/news')
@@ -453,40 +459,19 @@ def news():
     except Exception:
         interests = []
 
-    # make sure the audio folder exists
-    audio_dir = Path("static/audio")
-    audio_dir.mkdir(parents=True, exist_ok=True)
-
     news_items = []
     topics = interests[:3] or ["Technology"]  # fallback topic if none selected
 
+    bucket = news_service.current_bucket()
     for interest in topics:
-        prompt = (
-            f"Write a concise, upbeat news brief (3–4 sentences) about recent updates in {interest.lower()}."
-            " Keep it non-technical, suitable for a general audience."
-        )
-
         try:
-            # OpenAI v1 syntax
-            rsp = client.chat.completions.create(
-                model="gpt-3.5-turbo",  # or 'gpt-4o-mini' if enabled on your key
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=180,
-                temperature=0.7,
-                timeout=30,
+            # Everyone asking for this interest in this hour shares one brief.
+            brief = singleflight.do(
+                "news", f"{interest}:{bucket}",
+                lambda: news_service.generate_brief(interest, bucket),
+                ttl=news_service.BRIEF_SECONDS, timeout=45,
             )
-            summary = rsp.choices[0].message.content.strip()
-
-            # TTS to mp3
-            filename = f"{interest.lower()}_{int(datetime.utcnow().timestamp())}.mp3"
-            filepath = audio_dir / filename
-            gTTS(summary).save(filepath.as_posix())
-
-            news_items.append({
-                "title": f"{interest} Highlights",
-                "summary": summary,
-                "audio_url": f"/static/audio/{filename}",
-            })
+            news_items.append({"title": f"{interest} Highlights", **brief})
 
         except Exception as e:
             # Friendly fallback if quota/model/network issues
@@ -511,18 +496,28 @@ def news():
 @login_required
 def upload_audio():
     if request.method == 'POST':
-        interest = request.form.get('interest')
-        file = request.files.get('file')
+        # Oversized bodies are rejected with 413 before anything is read. The
+        # body is parsed as it streams in rather than through request.files,
+        # which would spool the whole upload to a temp file first.
+        request.max_content_length = audio_service.MAX_UPLOAD_BYTES + 64 * 1024
+        boundary = request.mimetype_params.get('boundary')
+        if request.mimetype != 'multipart/form-data' or not boundary:
+            abort(400)
+        try:
+            fields, filename, digest = audio_service.receive_upload(request.stream, boundary.encode())
+        except audio_service.AudioTooLarge as e:
+            flash(str(e), "danger")
+            return redirect(request.url)
+        except ValueError:
+            abort(400)
+        interest = fields.get('interest')
 
-        if not interest or not file:
+        if not interest or not filename:
             flash("Interest and audio file are required.", "danger")
             return redirect(request.url)
 
-        filename = secure_filename(f"{interest.lower()}_news.mp3")
-
-        if file.filename.endswith('.mp3'):
-            save_path = os.path.join(UPLOAD_FOLDER, filename)
-            file.save(save_path)
+        if digest is not None:
+            audio_service.publish(digest, secure_filename(f"{interest.lower()}_news.mp3"))
             flash(f"Audio for {interest} uploaded!", "success")
             return redirect(url_for('routes.news'))
 
@@ -532,6 +527,10 @@ def upload_audio():
     interests = json.loads(current_user.interests or "[]")
     return render_template("upload_audio.html", interests=interests)
 
+@bp.route('/audio/<path:filename>')
+def audio(filename):
+    return audio_service.serve(filename)
+
 @bp.route('/flights', methods=['GET', 'POST'])
 @login_required
 def flights():
@@ -549,60 +548,32 @@ def flights():
         date = request.form.get("date")
         seat_preference = request.form.get("seat_preference")
 
-        flight = Flight.query.filter_by(
-            flight_number=flight_number,
-            departure=departure,
-            arrival=arrival,
-            date=date
-        ).first()
-
-        if not flight:
-            flight = Flight(
-                flight_number=flight_number,
-                departure=departure,
-                arrival=arrival,
-                date=date
-            )
-            db.session.add(flight)
-            db.session.commit()
+        try:
+            flight = flights_service.find_or_create(flight_number, departure, arrival, date)
+        except flights_service.FlightError as e:
+            flash(str(e), "danger")
+            return render_template("flights.html", matches=matches)
 
-        existing_booking = FlightBooking.query.filter_by(
-            user_id=current_user.id,
-            flight_id=flight.id
-        ).first()
-
-        if not existing_booking:
-            booking = FlightBooking(
-                user_id=current_user.id,
-                flight_id=flight.id,
-                seat_preference=seat_preference
-            )
-            db.session.add(booking)
-            db.session.commit()
+        if flights_service.book(current_user.id, flight.id, seat_preference) and not current_user.is_premium:
+            current_user.flight_count += 1
+        db.session.commit()
 
-            if not current_user.is_premium:
-                current_user.flight_count += 1
-                db.session.commit()
+        current_interests = set(json.loads(current_user.interests or "[]"))
+        for user in flights_service.companions(flight.id, current_user.id):
+            try:
+                shared = list(set(json.loads(user.interests)) & current_interests)
+            except:
+                shared = []
 
-        all_bookings = FlightBooking.query.filter_by(flight_id=flight.id).all()
-        for booking in all_bookings:
-            if booking.user_id != current_user.id:
-                user = User.query.get(booking.user_id)
-                try:
-                    user_interests = set(json.loads(user.interests))
-                    current_interests = set(json.loads(current_user.interests or "[]"))
-                    shared = list(user_interests & current_interests)
-                except:
-                    shared = []
-
-                matches.append({
-                    "display_name": user.display_name,
-                    "shared_interests": shared
-                })
+            matches.append({
+                "display_name": user.display_name,
+                "shared_interests": shared
+            })
 
     return render_template("flights.html", matches=matches)
 
 @bp.route("/api/zones")
+@read_replica
 @login_required
 def api_zones():
     zones = Zone.query.all()
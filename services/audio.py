@@ -0,0 +1,192 @@
+import hashlib
+import os
+import tempfile
+import threading
+
+from flask import current_app, request, send_file
+from werkzeug.exceptions import NotFound, RequestEntityTooLarge
+from werkzeug.sansio.multipart import Data, Epilogue, Field, File, MultipartDecoder, NeedData
+from werkzeug.security import safe_join
+
+AUDIO_DIR = os.path.join("static", "audio")
+BLOB_DIR = "blobs"
+CHUNK_SIZE = 64 * 1024
+MAX_UPLOAD_BYTES = 20 * 1024 * 1024
+MAX_FIELD_BYTES = 1024
+MAX_PARTS = 16
+BLOB_MAX_AGE = 31536000
+NAMED_MAX_AGE = 60
+
+_etags = {}
+_etags_lock = threading.Lock()
+
+
+class AudioTooLarge(Exception):
+    pass
+
+
+def _blob_path(digest):
+    return os.path.join(AUDIO_DIR, BLOB_DIR, f"{digest}.mp3")
+
+
+def store_upload(stream, max_bytes=MAX_UPLOAD_BYTES):
+    """Copy ``stream`` to a content-addressed blob in chunks, hashing as it goes.
+
+    Returns the SHA-256 hex digest. Identical uploads share one blob.
+    """
+    blob_dir = os.path.join(AUDIO_DIR, BLOB_DIR)
+    os.makedirs(blob_dir, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=blob_dir, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise AudioTooLarge(f"Audio files are limited to {max_bytes // (1024 * 1024)} MB.")
+                digest.update(chunk)
+                out.write(chunk)
+        hexdigest = digest.hexdigest()
+        if os.path.exists(_blob_path(hexdigest)):
+            os.remove(tmp_path)
+        else:
+            os.replace(tmp_path, _blob_path(hexdigest))
+        return hexdigest
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _events(decoder, stream):
+    """Multipart events, reading ``stream`` only as the decoder needs more."""
+    while True:
+        event = decoder.next_event()
+        if isinstance(event, NeedData):
+            decoder.receive_data(stream.read(CHUNK_SIZE) or None)
+        elif isinstance(event, Epilogue):
+            return
+        elif isinstance(event, (Field, File, Data)):
+            yield event
+
+
+def _part_data(events):
+    for event in events:
+        if not isinstance(event, Data):
+            raise ValueError("multipart part ended without its data")
+        if event.data:
+            yield event.data
+        if not event.more_data:
+            return
+
+
+class _PartReader:
+    """File-like view of one file part, for store_upload."""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def read(self, size=-1):
+        return next(self.chunks, b"")
+
+
+def receive_upload(stream, boundary, max_bytes=MAX_UPLOAD_BYTES):
+    """Parse a multipart/form-data body as it arrives.
+
+    MP3 file parts go through ``store_upload`` chunk by chunk, so the body is
+    written to disk once and the size cap applies while it is still being
+    received. Returns (fields, filename, digest): the first file part's
+    filename, and its blob digest or None if it was not an MP3. Raises
+    ValueError on a malformed body.
+    """
+    decoder = MultipartDecoder(boundary, max_parts=MAX_PARTS)
+    events = _events(decoder, stream)
+    fields, filename, digest = {}, None, None
+    for event in events:
+        chunks = _part_data(events)
+        if isinstance(event, Field):
+            value = b""
+            for chunk in chunks:
+                value += chunk
+                if len(value) > MAX_FIELD_BYTES:
+                    raise RequestEntityTooLarge()
+            fields[event.name] = value.decode("utf-8", "replace")
+        elif filename is None and event.filename:
+            filename = event.filename
+            if filename.endswith(".mp3"):
+                digest = store_upload(_PartReader(chunks), max_bytes)
+        for _ in chunks:  # skip what was not stored
+            pass
+    return fields, filename, digest
+
+
+def publish(digest, filename):
+    """Atomically point ``static/audio/<filename>`` at a stored blob.
+
+    Concurrent publishes of the same name never leave a partial file; the
+    last rename wins.
+    """
+    target = os.path.join(AUDIO_DIR, filename)
+    tmp_path = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.link(_blob_path(digest), tmp_path)
+    except OSError:
+        with open(_blob_path(digest), "rb") as src, open(tmp_path, "wb") as dst:
+            while chunk := src.read(CHUNK_SIZE):
+                dst.write(chunk)
+    os.replace(tmp_path, target)
+    if os.path.exists(tmp_path):
+        # rename() is a no-op when both names are already links to the same blob.
+        os.remove(tmp_path)
+    with _etags_lock:
+        _etags.pop(target, None)
+    return target
+
+
+def _etag(path, stat):
+    """Content hash of ``path``, cached by inode/size/mtime."""
+    if os.path.dirname(path).endswith(BLOB_DIR):
+        return os.path.splitext(os.path.basename(path))[0]
+    key = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+    with _etags_lock:
+        cached = _etags.get(path)
+    if cached and cached[0] == key:
+        return cached[1]
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            digest.update(chunk)
+    with _etags_lock:
+        _etags[path] = (key, digest.hexdigest())
+    return digest.hexdigest()
+
+
+def serve(filename):
+    """Serve an audio file with byte ranges, a strong ETag and optional
+    X-Sendfile (USE_X_SENDFILE) or X-Accel-Redirect (AUDIO_X_ACCEL_PREFIX)."""
+    path = safe_join(AUDIO_DIR, filename)
+    if path is None or not path.endswith(".mp3") or not os.path.isfile(path):
+        raise NotFound()
+    stat = os.stat(path)
+    etag = _etag(path, stat)
+    max_age = BLOB_MAX_AGE if filename.startswith(f"{BLOB_DIR}/") else NAMED_MAX_AGE
+
+    accel_prefix = current_app.config.get("AUDIO_X_ACCEL_PREFIX")
+    if accel_prefix:
+        response = current_app.response_class(mimetype="audio/mpeg")
+        response.headers["X-Accel-Redirect"] = accel_prefix.rstrip("/") + "/" + filename
+        response.set_etag(etag)
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+        return response.make_conditional(request)
+
+    response = send_file(os.path.abspath(path), mimetype="audio/mpeg", conditional=True,
+                         etag=etag, max_age=max_age, last_modified=stat.st_mtime)
+    response.headers["Accept-Ranges"] = "bytes"
+    if max_age == BLOB_MAX_AGE:
+        response.cache_control.immutable = True
+    return response
@@ -0,0 +1,361 @@
+"""Streaming bulk import and export of zones, flights and users.
+
+Input is read row by row from CSV or NDJSON, validated, and written in
+chunks, one transaction per chunk, so memory stays flat however large the
+file is. Plain inserts use COPY on PostgreSQL and executemany elsewhere;
+upserts use the dialect's native conflict clause (ON CONFLICT /
+ON DUPLICATE KEY UPDATE) on the entity's unique key.
+"""
+import csv
+import hashlib
+import io
+import json
+import time
+from datetime import date, datetime
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import SQLAlchemyError
+
+from models import db, Flight, User, Zone
+from services import flights
+
+CHUNK_SIZE = 5000
+MAX_ERRORS = 100
+FORMATS = ("csv", "ndjson")
+
+
+class BulkError(Exception):
+    pass
+
+
+class RowError(ValueError):
+    pass
+
+
+def _text(max_length):
+    def parse(value):
+        value = str(value).strip()
+        if len(value) > max_length:
+            raise RowError(f"longer than {max_length} characters")
+        return value
+    return parse
+
+
+def _number(low=None, high=None):
+    def parse(value):
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            raise RowError(f"{value!r} is not a number")
+        if (low is not None and number < low) or (high is not None and number > high):
+            raise RowError(f"{number} is outside [{low}, {high}]")
+        return number
+    return parse
+
+
+def _positive(value):
+    number = _number()(value)
+    if number <= 0:
+        raise RowError(f"{number} must be positive")
+    return number
+
+
+def _flight_date(value):
+    day = flights.parse_date(value)
+    if day is None:
+        raise RowError(f"{value!r} is not a date")
+    return day
+
+
+def _canonical(canonicalize, max_length):
+    text = _text(max_length)
+
+    def parse(value):
+        value = canonicalize(text(value))
+        if not value:
+            raise RowError("is empty once canonicalized")
+        return value
+    return parse
+
+
+def _datetime(value):
+    try:
+        return datetime.fromisoformat(str(value).strip().rstrip("Z"))
+    except ValueError:
+        raise RowError(f"{value!r} is not an ISO 8601 timestamp")
+
+
+def _boolean(value):
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in ("1", "true", "yes", "y"):
+        return True
+    if text in ("0", "false", "no", "n"):
+        return False
+    raise RowError(f"{value!r} is not a boolean")
+
+
+def _interests(value):
+    if isinstance(value, str):
+        value = value.strip()
+        if value.startswith("["):
+            try:
+                value = json.loads(value)
+            except json.JSONDecodeError as e:
+                raise RowError(f"invalid JSON list: {e.msg}")
+        else:
+            value = [v.strip() for v in value.split(";") if v.strip()]
+    if not isinstance(value, list) or not all(isinstance(v, str) for v in value):
+        raise RowError("interests must be a list of strings")
+    return json.dumps(value)
+
+
+def _password_hash(value):
+    # Only hashes are accepted; plaintext would need a slow hash per row.
+    if not str(value).startswith(("scrypt:", "pbkdf2:")):
+        raise RowError("password must be a werkzeug password hash")
+    return str(value)
+
+
+class Field:
+    def __init__(self, name, parse, required=False, default=None, export=True):
+        self.name = name
+        self.parse = parse
+        self.required = required
+        self.default = default
+        self.export = export
+
+
+class Entity:
+    def __init__(self, model, fields, key=None, derive=None):
+        self.model = model
+        self.fields = fields
+        self.key = key
+        self.derive = derive
+
+    @property
+    def table(self):
+        return self.model.__table__
+
+
+def _user_defaults(row):
+    if not row.get("uid"):
+        # The local part alone collides (alice@a.com, alice@b.com) and a
+        # collision fails the whole chunk; the email hash keeps it unique.
+        email = row["email"]
+        row["uid"] = f"{email.split('@')[0][:80]}_{hashlib.sha256(email.encode()).hexdigest()[:12]}"
+    return row
+
+
+ENTITIES = {
+    "zones": Entity(Zone, [
+        Field("name", _text(100), required=True),
+        Field("latitude", _number(-90, 90), required=True),
+        Field("longitude", _number(-180, 180), required=True),
+        Field("radius_meters", _positive, required=True),
+        Field("interest", _text(50)),
+    ]),
+    "flights": Entity(Flight, [
+        Field("flight_number", _canonical(flights.canonical_flight_number, 50), required=True),
+        Field("departure", _canonical(flights.canonical_airport, 100), required=True),
+        Field("arrival", _canonical(flights.canonical_airport, 100), required=True),
+        Field("date", _flight_date, required=True),
+    ], key=("flight_number", "date", "departure", "arrival")),
+    "users": Entity(User, [
+        Field("email", _text(120), required=True),
+        Field("uid", _text(100)),
+        Field("display_name", _text(100)),
+        Field("password", _password_hash, export=False),
+        Field("latitude", _number(-90, 90)),
+        Field("longitude", _number(-180, 180)),
+        Field("interests", _interests),
+        Field("is_premium", _boolean, default=False),
+        Field("profile_complete", _boolean, default=False),
+        Field("created_at", _datetime, default=datetime.utcnow),
+    ], key=("email",), derive=_user_defaults),
+}
+
+
+def detect_format(filename, fmt=None):
+    if fmt:
+        return fmt
+    if filename and filename.endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    return "csv"
+
+
+def read_rows(stream, fmt):
+    """Yield (line number, dict) pairs without loading the whole input."""
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_num, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_num, RowError(f"invalid JSON: {e.msg}")
+            continue
+        yield line_num, row if isinstance(row, dict) else RowError("expected a JSON object")
+
+
+def validate(entity, raw):
+    if isinstance(raw, RowError):
+        raise raw
+    row = {}
+    for field in entity.fields:
+        value = raw.get(field.name)
+        if value is None or value == "":
+            if field.required:
+                raise RowError(f"{field.name} is required")
+            value = field.default() if callable(field.default) else field.default
+        else:
+            try:
+                value = field.parse(value)
+            except RowError as e:
+                raise RowError(f"{field.name}: {e}")
+        row[field.name] = value
+    return entity.derive(row) if entity.derive else row
+
+
+def _python_defaults(entity, rows):
+    """Fill in the Python-side column defaults that ``insert()`` would apply.
+
+    COPY only sees the columns it is given, and a column whose default lives
+    in the model rather than the schema would otherwise be loaded as NULL.
+    """
+    missing = [
+        c for c in entity.table.columns
+        if c.name not in rows[0] and c.server_default is None
+        and c.default is not None and (c.default.is_scalar or c.default.is_callable)
+    ]
+    for row in rows:
+        for column in missing:
+            default = column.default
+            row[column.name] = default.arg(None) if default.is_callable else default.arg
+    return rows
+
+
+def _copy(entity, rows):
+    """PostgreSQL COPY FROM STDIN for a chunk of plain inserts."""
+    rows = _python_defaults(entity, rows)
+    columns = list(rows[0])
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        # COPY's CSV format reads an unquoted empty field as NULL.
+        writer.writerow(["" if row[c] is None else row[c] for c in columns])
+    buffer.seek(0)
+    cursor = db.session.connection().connection.driver_connection.cursor()
+    cursor.copy_expert(
+        f"COPY {entity.table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer
+    )
+
+
+def _upsert_statement(entity, dialect):
+    # A key-only entity (flights) still needs something to "update" on conflict.
+    updates = [f.name for f in entity.fields if f.name not in entity.key] or list(entity.key[:1])
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif dialect in ("mysql", "mariadb"):
+        from sqlalchemy.dialects.mysql import insert as dialect_insert
+        stmt = dialect_insert(entity.table)
+        return stmt.on_duplicate_key_update({name: stmt.inserted[name] for name in updates})
+    else:
+        raise BulkError(f"upsert is not supported on {dialect}")
+    stmt = dialect_insert(entity.table)
+    return stmt.on_conflict_do_update(index_elements=list(entity.key),
+                                      set_={name: stmt.excluded[name] for name in updates})
+
+
+def _write_chunk(entity, rows, mode, dialect):
+    try:
+        if mode == "upsert":
+            db.session.execute(_upsert_statement(entity, dialect), rows)
+        elif dialect == "postgresql":
+            _copy(entity, rows)
+        else:
+            db.session.execute(insert(entity.table), rows)
+        db.session.commit()
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        raise BulkError(f"chunk rejected by the database: {e.__class__.__name__}: {getattr(e, 'orig', e)}")
+
+
+def import_rows(name, stream, fmt="csv", mode="insert", chunk_size=CHUNK_SIZE,
+                max_errors=MAX_ERRORS, dry_run=False, log=print):
+    """Validate and load ``stream``; returns (rows written, rows rejected)."""
+    entity = ENTITIES[name]
+    if mode == "upsert" and not entity.key:
+        raise BulkError(f"{name} has no unique key to upsert on; use --mode insert")
+    dialect = db.engine.dialect.name
+    written = rejected = 0
+    chunk = []
+    start = time.perf_counter()
+
+    def flush():
+        nonlocal written
+        if chunk and not dry_run:
+            _write_chunk(entity, chunk, mode, dialect)
+        written += len(chunk)
+        chunk.clear()
+        elapsed = time.perf_counter() - start
+        log(f"{written:,} rows, {rejected:,} rejected ({written / max(elapsed, 1e-9):,.0f} rows/s)")
+
+    for line_num, raw in read_rows(stream, fmt):
+        try:
+            chunk.append(validate(entity, raw))
+        except RowError as e:
+            rejected += 1
+            log(f"line {line_num}: {e}")
+            if rejected > max_errors:
+                raise BulkError(f"more than {max_errors} invalid rows; stopped after {written:,} rows")
+            continue
+        if len(chunk) >= chunk_size:
+            flush()
+    flush()
+    return written, rejected
+
+
+def _jsonable(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def export_rows(name, stream, fmt="csv", include_passwords=False, chunk_size=CHUNK_SIZE, log=print):
+    """Stream every row of ``name`` to ``stream``; returns the row count."""
+    entity = ENTITIES[name]
+    fields = [f for f in entity.fields if f.export or include_passwords]
+    columns = [getattr(entity.model, f.name) for f in fields]
+    result = db.session.execute(
+        select(*columns).order_by(entity.model.id).execution_options(yield_per=chunk_size)
+    )
+    writer = csv.writer(stream) if fmt == "csv" else None
+    if writer:
+        writer.writerow([f.name for f in fields])
+    count = 0
+    start = time.perf_counter()
+    for row in result:
+        if writer:
+            writer.writerow([_jsonable(v) for v in row])
+        else:
+            record = {f.name: _jsonable(v) for f, v in zip(fields, row)}
+            if "interests" in record and record["interests"]:
+                try:
+                    record["interests"] = json.loads(record["interests"])
+                except json.JSONDecodeError:
+                    pass
+            stream.write(json.dumps(record) + "\n")
+        count += 1
+        if count % chunk_size == 0:
+            log(f"{count:,} rows ({count / (time.perf_counter() - start):,.0f} rows/s)")
+    result.close()
+    log(f"{count:,} rows exported in {time.perf_counter() - start:.1f}s")
+    return count
@@ -0,0 +1,207 @@
+"""Canonical flight identity, booking and the legacy-row migration.
+
+A flight is identified by (flight number, date, departure, arrival), stored
+canonicalized so that "af 0123", "AF-123" and "AF123" are the same row and
+the lookup is a single seek on uq_flights_number_date_route.
+
+- flight numbers: upper case, separators dropped, leading zeros of the
+  numeric part removed ("AF0123" -> "AF123")
+- airports: upper case with collapsed whitespace; "Paris (CDG)" -> "CDG"
+- dates: ISO first, then common day-first formats ("05/03/2025" is 5 March)
+"""
+import re
+from datetime import date, datetime
+
+from sqlalchemy import String, cast, inspect, select, text
+from sqlalchemy.exc import IntegrityError
+
+from models import db, Flight, FlightBooking, User
+
+DATE_FORMATS = ("%Y/%m/%d", "%d/%m/%Y", "%d.%m.%Y", "%d-%m-%Y", "%Y%m%d",
+                "%d %b %Y", "%d %B %Y", "%b %d %Y", "%B %d %Y")
+BATCH_SIZE = 500
+
+_FLIGHT_NUMBER = re.compile(r"^([A-Z0-9]{2}[A-Z]?)0*(\d{1,4})([A-Z]?)$")
+_AIRPORT_CODE = re.compile(r"\(([A-Z]{3,4})\)$")
+
+
+class FlightError(Exception):
+    pass
+
+
+def canonical_flight_number(value):
+    number = re.sub(r"[^A-Z0-9]", "", (value or "").upper())
+    match = _FLIGHT_NUMBER.match(number)
+    return "".join(match.groups()) if match else number
+
+
+def canonical_airport(value):
+    airport = " ".join((value or "").upper().split())
+    match = _AIRPORT_CODE.search(airport)
+    return match.group(1) if match else airport
+
+
+def parse_date(value):
+    """A ``date`` from a form or legacy string, or None if it is not one."""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    value = " ".join(str(value or "").replace(",", " ").split())
+    try:
+        return date.fromisoformat(value[:10])
+    except ValueError:
+        pass
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def normalize(flight_number, departure, arrival, date):
+    """Canonical column values for a flight; raises FlightError if incomplete."""
+    values = {
+        "flight_number": canonical_flight_number(flight_number),
+        "departure": canonical_airport(departure),
+        "arrival": canonical_airport(arrival),
+        "date": parse_date(date),
+    }
+    if values["date"] is None:
+        raise FlightError("Please enter a valid flight date.")
+    if not all(values.values()):
+        raise FlightError("Flight number, departure and arrival are required.")
+    return values
+
+
+def find_or_create(flight_number, departure, arrival, day):
+    values = normalize(flight_number, departure, arrival, day)
+    flight = Flight.query.filter_by(**values).first()
+    if flight:
+        return flight
+    try:
+        with db.session.begin_nested():
+            flight = Flight(**values)
+            db.session.add(flight)
+    except IntegrityError:
+        # Another request created it between our lookup and insert.
+        flight = Flight.query.filter_by(**values).one()
+    return flight
+
+
+def book(user_id, flight_id, seat_preference=None):
+    """Book ``user_id`` on the flight; returns False if already booked."""
+    if FlightBooking.query.filter_by(flight_id=flight_id, user_id=user_id).first():
+        return False
+    try:
+        with db.session.begin_nested():
+            db.session.add(FlightBooking(user_id=user_id, flight_id=flight_id,
+                                         seat_preference=seat_preference))
+    except IntegrityError:
+        return False
+    return True
+
+
+def companions(flight_id, user_id):
+    """Everyone else booked on the flight, in one query."""
+    return (
+        User.query.join(FlightBooking, FlightBooking.user_id == User.id)
+        .filter(FlightBooking.flight_id == flight_id, User.id != user_id)
+        .order_by(FlightBooking.id)
+        .all()
+    )
+
+
+def _batches(items):
+    items = list(items)
+    for start in range(0, len(items), BATCH_SIZE):
+        yield items[start:start + BATCH_SIZE]
+
+
+def _date_column_type():
+    for column in inspect(db.engine).get_columns("flights"):
+        if column["name"] == "date":
+            return str(column["type"]).upper()
+    return ""
+
+
+def migrate(dry_run=False, log=print):
+    """Canonicalize legacy flights, merge duplicates and add the unique indexes.
+
+    Bookings on merged flights move to the surviving (lowest id) flight; a
+    user left with two bookings on one flight keeps the older. Dates that
+    cannot be parsed are cleared and never merged. Returns (flights merged,
+    bookings moved, bookings dropped, dates cleared).
+    """
+    table = Flight.__table__
+    rows = db.session.execute(
+        select(table.c.id, table.c.flight_number, table.c.departure, table.c.arrival,
+               cast(table.c.date, String)).order_by(table.c.id)
+    ).all()
+
+    survivors, merged, updates, cleared = {}, {}, [], 0
+    for flight_id, number, departure, arrival, raw_date in rows:
+        day = parse_date(raw_date) if raw_date else None
+        if raw_date and day is None:
+            cleared += 1
+            log(f"flight {flight_id}: cannot parse date {raw_date!r}; cleared")
+        values = {
+            "id": flight_id,
+            "flight_number": canonical_flight_number(number),
+            "departure": canonical_airport(departure),
+            "arrival": canonical_airport(arrival),
+            "date": day.isoformat() if day else None,
+        }
+        key = (values["flight_number"], values["date"], values["departure"], values["arrival"])
+        if day is not None and key in survivors:
+            merged[flight_id] = survivors[key]
+            continue
+        survivors.setdefault(key, flight_id)
+        if (values["flight_number"], values["departure"], values["arrival"], values["date"]) != \
+                (number, departure, arrival, raw_date):
+            updates.append(values)
+
+    moved = 0
+    kept, dropped = set(), []
+    bookings = db.session.execute(
+        select(FlightBooking.id, FlightBooking.user_id, FlightBooking.flight_id).order_by(FlightBooking.id)
+    )
+    for booking_id, user_id, flight_id in bookings:
+        if flight_id in merged:
+            moved += 1
+            flight_id = merged[flight_id]
+        if (flight_id, user_id) in kept:
+            dropped.append(booking_id)
+        else:
+            kept.add((flight_id, user_id))
+
+    log(f"{len(rows):,} flights: {len(merged):,} duplicates to merge, {len(updates):,} to canonicalize; "
+        f"{moved:,} bookings to move, {len(dropped):,} duplicate bookings to drop")
+    if dry_run:
+        return len(merged), moved, len(dropped), cleared
+
+    for batch in _batches(dropped):
+        db.session.execute(FlightBooking.__table__.delete().where(FlightBooking.id.in_(batch)))
+    if merged:
+        db.session.execute(text("UPDATE flight_bookings SET flight_id = :survivor WHERE flight_id = :duplicate"),
+                           [{"survivor": s, "duplicate": d} for d, s in merged.items()])
+    for batch in _batches(merged):
+        db.session.execute(table.delete().where(table.c.id.in_(batch)))
+    if updates:
+        db.session.execute(text("UPDATE flights SET flight_number = :flight_number, departure = :departure, "
+                                "arrival = :arrival, date = :date WHERE id = :id"), updates)
+    db.session.commit()
+
+    # SQLite keeps Date columns as ISO text, so only the servers need a type change.
+    dialect = db.engine.dialect.name
+    column_type = _date_column_type()
+    if dialect == "postgresql" and column_type != "DATE":
+        db.session.execute(text("ALTER TABLE flights ALTER COLUMN date TYPE DATE USING date::date"))
+    elif dialect in ("mysql", "mariadb") and column_type != "DATE":
+        db.session.execute(text("ALTER TABLE flights MODIFY date DATE NULL"))
+    for index in list(table.indexes) + list(FlightBooking.__table__.indexes):
+        index.create(db.session.connection(), checkfirst=True)
+    db.session.commit()
+    log("flights.date is a DATE column; unique flight and booking indexes are in place")
+    return len(merged), moved, len(dropped), cleared
@@ -0,0 +1,198 @@
+import secrets
+import time
+from datetime import datetime
+
+from sqlalchemy import insert
+
+from models import db, User, Gift
+from services import jobs
+
+FREE_GIFTS_PER_MONTH = 5
+GIFT_FEE_CENTS = 50  # 0.50€
+MAX_BATCH_SIZE = 1000
+TOKEN_BATCH_SIZE = 500
+REDEEM_URL = "https://wingoo.app/redeem/{token}"
+
+
+class GiftError(Exception):
+    pass
+
+
+def send_gifts(sender_id, recipient_ids, gift_type, message=""):
+    """Send the same gift to many recipients in a single transaction.
+
+    Returns the list of fees (in cents) charged per gift, in recipient order.
+    """
+    if not isinstance(recipient_ids, (list, tuple)):
+        raise GiftError("Recipients must be a list of user ids.")
+    try:
+        recipient_ids = list(dict.fromkeys(int(r) for r in recipient_ids))
+    except (TypeError, ValueError):
+        raise GiftError("Invalid recipient id.")
+    if not recipient_ids or not gift_type:
+        raise GiftError("Recipient and gift type are required.")
+    if len(recipient_ids) > MAX_BATCH_SIZE:
+        raise GiftError(f"At most {MAX_BATCH_SIZE} recipients per batch.")
+    if sender_id in recipient_ids:
+        raise GiftError("You cannot send a gift to yourself.")
+
+    try:
+        found = {
+            row.id for row in
+            db.session.query(User.id).filter(User.id.in_(recipient_ids))
+        }
+        missing = [r for r in recipient_ids if r not in found]
+        if missing:
+            raise GiftError(f"Unknown recipient(s): {', '.join(map(str, missing))}")
+
+        # Lock the sender row so concurrent batches see each other's quota usage.
+        sender = (
+            User.query.filter_by(id=sender_id)
+            .with_for_update()
+            .populate_existing()
+            .one()
+        )
+        _reset_monthly_quota(sender)
+
+        if sender.is_premium:
+            fees = [0] * len(recipient_ids)
+        else:
+            free_left = max(FREE_GIFTS_PER_MONTH - (sender.gift_count or 0), 0)
+            fees = [0 if i < free_left else GIFT_FEE_CENTS for i in range(len(recipient_ids))]
+            sender.gift_count = (sender.gift_count or 0) + len(recipient_ids)
+        sender.sent_gifts_total = (sender.sent_gifts_total or 0) + len(recipient_ids)
+
+        db.session.execute(insert(Gift), [
+            {
+                "sender_id": sender_id,
+                "recipient_id": recipient_id,
+                "gift_type": gift_type,
+                "message": message,
+                "fee_cents": fee,
+            }
+            for recipient_id, fee in zip(recipient_ids, fees)
+        ])
+        # Recipients are de-duplicated above, so each one gains exactly one gift.
+        User.query.filter(User.id.in_(recipient_ids)).update({
+            User.received_gifts_total: User.received_gifts_total + 1,
+            User.unredeemed_gifts: User.unredeemed_gifts + 1,
+        }, synchronize_session=False)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    schedule_token_issue()
+    return fees
+
+
+def send_gift(sender_id, recipient_id, gift_type, message=""):
+    return send_gifts(sender_id, [recipient_id], gift_type, message)[0]
+
+
+def redeem_gift(gift_id, recipient_id):
+    """Mark a received gift as redeemed. Returns False if it was not redeemable."""
+    updated = Gift.query.filter_by(
+        id=gift_id, recipient_id=recipient_id, redeemed=False
+    ).update({Gift.redeemed: True}, synchronize_session=False)
+    if updated:
+        User.query.filter(User.id == recipient_id, User.unredeemed_gifts > 0).update({
+            User.unredeemed_gifts: User.unredeemed_gifts - 1,
+        }, synchronize_session=False)
+    db.session.commit()
+    return bool(updated)
+
+
+def received_total(user_id):
+    return db.session.query(User.received_gifts_total).filter_by(id=user_id).scalar() or 0
+
+
+def received_since(user_id, after_id, limit=50):
+    """Summaries of the newest ``limit`` gifts received by ``user_id`` with an
+    id above ``after_id``, oldest first."""
+    rows = (
+        db.session.query(Gift.id, Gift.gift_type, Gift.message, Gift.created_at, User.display_name)
+        .join(User, User.id == Gift.sender_id)
+        .filter(Gift.recipient_id == user_id, Gift.id > after_id)
+        .order_by(Gift.id.desc())
+        .limit(limit)
+        .all()
+    )
+    rows.reverse()
+    return [
+        {
+            "id": row.id,
+            "gift_type": row.gift_type,
+            "message": row.message,
+            "sender": row.display_name,
+            "created_at": row.created_at.isoformat() if row.created_at else None,
+        }
+        for row in rows
+    ]
+
+
+def wait_for_gifts(user_id, after_id, known_total=None, timeout=0, interval=1.0):
+    """New gifts, waiting up to ``timeout`` seconds for one to arrive.
+
+    While waiting, only the recipient's ``received_gifts_total`` column is
+    read; the gifts table is queried once the counter moves. ``timeout=0``
+    is a plain poll.
+    """
+    deadline = time.monotonic() + timeout
+    if known_total is None:
+        gifts = received_since(user_id, after_id)
+        if gifts:
+            return gifts, received_total(user_id)
+        known_total = received_total(user_id)
+
+    while True:
+        # End the read transaction so the next poll sees fresh commits.
+        db.session.rollback()
+        total = received_total(user_id)
+        if total != known_total:
+            new = min(max(total - known_total, 1), 50)
+            return received_since(user_id, after_id, limit=new), total
+        if time.monotonic() >= deadline:
+            return [], total
+        time.sleep(interval)
+
+
+def _reset_monthly_quota(user):
+    # Same rule as routes.reset_limits_if_needed, minus the commit: the
+    # caller holds the sender row lock until the batch is committed.
+    now = datetime.utcnow()
+    if user.last_reset is None or user.last_reset.month != now.month:
+        user.gift_count = 0
+        user.flight_count = 0
+        user.news_count = 0
+        user.last_reset = now
+
+
+def issue_pending_tokens(batch_size=TOKEN_BATCH_SIZE):
+    """Assign redemption tokens to gifts that do not have one yet."""
+    issued = 0
+    while True:
+        gift_ids = [
+            row.id for row in
+            db.session.query(Gift.id).filter(Gift.qr_code.is_(None)).limit(batch_size)
+        ]
+        if not gift_ids:
+            return issued
+        db.session.bulk_update_mappings(Gift, [
+            {"id": gift_id, "qr_code": REDEEM_URL.format(token=secrets.token_urlsafe(16))}
+            for gift_id in gift_ids
+        ])
+        db.session.commit()
+        issued += len(gift_ids)
+
+
+@jobs.job("gifts.issue_tokens")
+def issue_tokens_job():
+    issue_pending_tokens()
+
+
+def schedule_token_issue():
+    # A queued job issues tokens for every gift still without one, so sends
+    # made before it runs need no job of their own.
+    if not jobs.is_queued("gifts.issue_tokens"):
+        jobs.enqueue("gifts.issue_tokens", priority=10)
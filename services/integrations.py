@@ -0,0 +1,66 @@
+"""Clients for third-party services.
+
+HTTP APIs (OpenAI, NewsAPI) go through services.upstream, which pools
+connections and bounds every call with a per-host limit and a deadline.
+OPENAI_BASE_URL and NEWS_API_URL can point at benchmarks/fake_upstream.py to
+measure behaviour under injected upstream latency. SDKs are imported on
+first use so worker start-up does not pay for integrations a request never
+touches. With FAKE_INTEGRATIONS=1, OpenAI and gTTS are replaced by
+in-process stand-ins that answer after FAKE_INTEGRATIONS_LATENCY_MS, for load
+tests that must not hit (or pay for) the real services.
+"""
+import os
+import time
+from functools import lru_cache
+
+from services import upstream
+
+# One silent MPEG-1 Layer III frame (128 kbps, 44.1 kHz).
+SILENT_MP3 = b"\xff\xfb\x90\x64" + bytes(413)
+
+
+def fake_integrations():
+    return os.getenv("FAKE_INTEGRATIONS") == "1"
+
+
+def _fake_latency():
+    time.sleep(float(os.getenv("FAKE_INTEGRATIONS_LATENCY_MS", 0)) / 1000)
+
+
+class FakeTTS:
+    def __init__(self, text):
+        self.text = text
+
+    def save(self, path):
+        _fake_latency()
+        with open(path, "wb") as f:
+            f.write(SILENT_MP3)
+
+
+def chat_completion(messages, deadline=30, **params):
+    """Text of the first choice of an OpenAI chat completion."""
+    if fake_integrations():
+        _fake_latency()
+        return f"Synthetic brief for load testing: {messages[-1]['content'][:80]}"
+    base_url = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1").rstrip("/")
+    response = upstream.fetch(
+        "POST", f"{base_url}/chat/completions", deadline=deadline,
+        headers={"Authorization": f"Bearer {os.getenv('OPENAI_API_KEY', '')}"},
+        json={"messages": messages, **params},
+    )
+    response.raise_for_status()
+    return response.json()["choices"][0]["message"]["content"]
+
+
+@lru_cache(maxsize=None)
+def stripe_api():
+    import stripe
+    stripe.api_key = os.getenv("STRIPE_SECRET_KEY")
+    return stripe
+
+
+def text_to_speech(text):
+    if fake_integrations():
+        return FakeTTS(text)
+    from gtts import gTTS
+    return gTTS(text)
@@ -0,0 +1,203 @@
+import json
+import logging
+import os
+import random
+import socket
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, or_
+from sqlalchemy.exc import IntegrityError
+
+from models import db, Job
+
+VISIBILITY_TIMEOUT = 300  # seconds a claimed job stays invisible to other workers
+BACKOFF_BASE = 5  # seconds before the first retry, doubled on every attempt
+BACKOFF_MAX = 3600
+IDLE_SLEEP = 1.0
+CLAIM_BATCH = 10
+# Finished (done or failed) jobs are deleted this long after they finish.
+RETENTION_DAYS = float(os.getenv("JOB_RETENTION_DAYS", 7))
+PURGE_INTERVAL = 3600
+PURGE_BATCH_SIZE = 1000
+
+HANDLERS = {}
+
+
+class UnknownJob(Exception):
+    pass
+
+
+def job(name):
+    """Register ``fn(**payload)`` as the handler for jobs called ``name``."""
+    def decorator(fn):
+        HANDLERS[name] = fn
+        return fn
+    return decorator
+
+
+def enqueue(name, payload=None, priority=0, idempotency_key=None, delay=0, max_attempts=5):
+    """Queue a job and commit. Higher ``priority`` runs first.
+
+    If a job with the same ``idempotency_key`` already exists it is returned
+    instead of queueing a duplicate.
+    """
+    if idempotency_key:
+        existing = Job.query.filter_by(idempotency_key=idempotency_key).first()
+        if existing:
+            return existing
+
+    new_job = Job(
+        name=name,
+        payload=json.dumps(payload or {}),
+        priority=priority,
+        idempotency_key=idempotency_key,
+        max_attempts=max_attempts,
+        run_at=datetime.utcnow() + timedelta(seconds=delay),
+    )
+    db.session.add(new_job)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        if not idempotency_key:
+            raise
+        return Job.query.filter_by(idempotency_key=idempotency_key).one()
+    return new_job
+
+
+def is_queued(name):
+    """Whether a ``name`` job is waiting to run (not yet claimed)."""
+    return db.session.query(Job.id).filter_by(name=name, status="queued").first() is not None
+
+
+def claim(worker_id, visibility_timeout=VISIBILITY_TIMEOUT):
+    """Claim the next runnable job, or return None.
+
+    Runnable jobs are queued ones that are due, plus running ones whose
+    visibility timeout expired (their worker died). Claiming is a
+    conditional UPDATE, so concurrent workers never get the same job.
+    """
+    now = datetime.utcnow()
+    runnable = or_(
+        and_(Job.status == "queued", Job.run_at <= now),
+        and_(Job.status == "running", Job.locked_until < now),
+    )
+    candidates = [
+        row.id for row in
+        db.session.query(Job.id)
+        .filter(runnable)
+        .order_by(Job.priority.desc(), Job.run_at, Job.id)
+        .limit(CLAIM_BATCH)
+    ]
+    for job_id in candidates:
+        claimed = Job.query.filter(Job.id == job_id, runnable).update({
+            Job.status: "running",
+            Job.locked_by: worker_id,
+            Job.locked_until: now + timedelta(seconds=visibility_timeout),
+            Job.attempts: Job.attempts + 1,
+        }, synchronize_session=False)
+        db.session.commit()
+        if claimed:
+            return db.session.get(Job, job_id, populate_existing=True)
+    return None
+
+
+def backoff(attempts):
+    delay = min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def _finish(claimed, **values):
+    # Only the worker still holding the job may record its outcome.
+    Job.query.filter_by(id=claimed.id, locked_by=claimed.locked_by, status="running").update(
+        values, synchronize_session=False
+    )
+    db.session.commit()
+
+
+def run_job(claimed):
+    handler = HANDLERS.get(claimed.name)
+    try:
+        if claimed.attempts > claimed.max_attempts:
+            raise RuntimeError("visibility timeout expired on the final attempt")
+        if handler is None:
+            raise UnknownJob(claimed.name)
+        handler(**json.loads(claimed.payload or "{}"))
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Job {claimed.id} ({claimed.name}) failed: {e}")
+        if isinstance(e, UnknownJob) or claimed.attempts >= claimed.max_attempts:
+            _finish(claimed, status="failed", last_error=str(e),
+                    finished_at=datetime.utcnow(), locked_until=None)
+        else:
+            _finish(claimed, status="queued", last_error=str(e), locked_until=None,
+                    run_at=datetime.utcnow() + timedelta(seconds=backoff(claimed.attempts)))
+        return False
+
+    _finish(claimed, status="done", finished_at=datetime.utcnow(), locked_until=None)
+    return True
+
+
+def run_pending(worker_id=None, limit=None):
+    """Run due jobs until the queue is empty or ``limit`` jobs ran."""
+    worker_id = worker_id or default_worker_id()
+    ran = 0
+    while limit is None or ran < limit:
+        claimed = claim(worker_id)
+        if claimed is None:
+            break
+        run_job(claimed)
+        ran += 1
+    return ran
+
+
+def work(worker_id=None, idle_sleep=IDLE_SLEEP, should_stop=lambda: False):
+    worker_id = worker_id or default_worker_id()
+    logging.info(f"Job worker {worker_id} started")
+    while not should_stop():
+        if not run_pending(worker_id, limit=100):
+            time.sleep(idle_sleep)
+
+
+def purge_finished(older_than=None, batch_size=PURGE_BATCH_SIZE):
+    """Delete done and failed jobs that finished before ``older_than``.
+
+    Deletes in batches so the jobs table is never locked for long. Returns
+    the number of jobs deleted.
+    """
+    older_than = older_than or datetime.utcnow() - timedelta(days=RETENTION_DAYS)
+    purged = 0
+    while True:
+        job_ids = [
+            row.id for row in
+            db.session.query(Job.id)
+            .filter(Job.status.in_(("done", "failed")), Job.finished_at < older_than)
+            .limit(batch_size)
+        ]
+        if not job_ids:
+            return purged
+        Job.query.filter(Job.id.in_(job_ids)).delete(synchronize_session=False)
+        db.session.commit()
+        purged += len(job_ids)
+
+
+@job("jobs.purge")
+def purge():
+    try:
+        purged = purge_finished()
+        if purged:
+            logging.info(f"Purged {purged} finished jobs")
+    finally:
+        schedule_purge()
+
+
+def schedule_purge():
+    # One purge per interval bucket, however many workers try to schedule it.
+    bucket = int(time.time() // PURGE_INTERVAL) + 1
+    enqueue("jobs.purge", delay=bucket * PURGE_INTERVAL - time.time(),
+            idempotency_key=f"jobs.purge:{bucket}")
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
@@ -1,5 +1,66 @@
+import json
+
 from models import User
 from geopy.distance import geodesic
+from zones import haversine
+
+
+ALL_INTERESTS = (
+    "Music", "Cinema", "Ecology", "Technology", "Sports", "Travel",
+    "Food", "Art", "Literature", "Photography", "Gaming", "Fashion",
+    "Science", "History", "Fitness", "Cooking", "Dancing", "Reading",
+)
+
+
+def interest_mask(interests):
+    """Stable key for a set of interests: a bitmask over ALL_INTERESTS plus any others."""
+    mask = sum(1 << i for i, name in enumerate(ALL_INTERESTS) if name in interests)
+    extra = sorted(set(interests) - set(ALL_INTERESTS))
+    return f"{mask:x}" + "".join(f"+{name}" for name in extra)
+
+
+def match_candidates(lat, lon, interests, radius_km):
+    """Users within ``radius_km`` of a point sharing one of ``interests``, as plain dicts."""
+    rows = User.query.with_entities(
+        User.id, User.display_name, User.latitude, User.longitude, User.interests, User.updated_at
+    ).all()
+    return [
+        {"id": id, "display_name": display_name, "latitude": latitude,
+         "longitude": longitude, "interests": raw,
+         "updated_at": updated_at.isoformat() if updated_at else None}
+        for id, display_name, latitude, longitude, raw, updated_at in rows
+        if latitude and longitude and raw
+        and haversine(lat, lon, latitude, longitude) / 1000 <= radius_km
+        and interests & parse_interests(raw)
+    ]
+
+
+def parse_interests(raw):
+    """Set of interests from the JSON list stored on ``User.interests``."""
+    try:
+        return set(json.loads(raw))
+    except (TypeError, json.JSONDecodeError):
+        return set()
+
+
+def nearby_matches(user, others, radius_km=50):
+    """Users within ``radius_km`` of ``user`` sharing an interest, nearest first."""
+    user_interests = parse_interests(user.interests)
+    matches = []
+    for other in others:
+        if not (other.latitude and other.longitude and other.interests):
+            continue
+        distance = haversine(user.latitude, user.longitude, other.latitude, other.longitude) / 1000
+        if distance > radius_km:
+            continue
+        common_interests = user_interests.intersection(parse_interests(other.interests))
+        if common_interests:
+            matches.append({
+                "user": other,
+                "distance_km": round(distance, 2),
+                "common_interests": list(common_interests)
+            })
+    return sorted(matches, key=lambda x: x['distance_km'])
 
 def match_users(user_id, max_distance_km=50):
     current_user = User.query.get(user_id)
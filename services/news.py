@@ -0,0 +1,50 @@
+import time
+from pathlib import Path
+
+from flask import url_for
+
+import metrics
+from services import integrations, jobs
+
+AUDIO_DIR = Path("static/audio")
+BRIEF_SECONDS = 3600
+
+
+@jobs.job("news.synthesize")
+def synthesize(text, filename):
+    """Render a news brief to ``static/audio/<filename>`` with gTTS."""
+    AUDIO_DIR.mkdir(parents=True, exist_ok=True)
+    partial = AUDIO_DIR / f"{filename}.part"
+    with metrics.external_call("gtts", "tts"):
+        integrations.text_to_speech(text).save(partial.as_posix())
+    partial.replace(AUDIO_DIR / filename)
+
+
+def queue_synthesis(text, filename):
+    jobs.enqueue("news.synthesize", {"text": text, "filename": filename},
+                 priority=5, idempotency_key=f"news.synthesize:{filename}")
+    return url_for("routes.audio", filename=filename)
+
+
+def current_bucket():
+    return int(time.time() // BRIEF_SECONDS)
+
+
+def generate_brief(interest, bucket):
+    """Summary and audio URL of the ``interest`` brief for one time bucket."""
+    prompt = (
+        f"Write a concise, upbeat news brief (3–4 sentences) about recent updates in {interest.lower()}."
+        " Keep it non-technical, suitable for a general audience."
+    )
+    with metrics.external_call("openai", "llm"):
+        summary = integrations.chat_completion(
+            [{"role": "user", "content": prompt}],
+            deadline=30,
+            model="gpt-3.5-turbo",  # or 'gpt-4o-mini' if enabled on your key
+            max_tokens=180,
+            temperature=0.7,
+        ).strip()
+
+    # TTS to mp3 runs on the job worker; the file appears shortly after
+    filename = f"{interest.lower()}_{bucket}.mp3"
+    return {"summary": summary, "audio_url": queue_synthesis(summary, filename)}
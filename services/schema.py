@@ -0,0 +1,104 @@
+"""Bring a database created from an older schema up to the current models.
+
+``db.create_all()`` creates missing tables but never alters existing ones.
+``migrate`` also adds the columns and indexes that later changes introduced
+to existing tables, then backfills the new columns. Every step checks the
+live schema first, so the command is safe to re-run.
+
+Flights have their own data migration: ``flask flights migrate``.
+"""
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateColumn
+
+from models import db, Gift, Subscription, User
+
+# (model, column) pairs added to tables that already existed.
+COLUMNS = [
+    (User, "sent_gifts_total"),
+    (User, "received_gifts_total"),
+    (User, "unredeemed_gifts"),
+    (User, "updated_at"),
+]
+
+# Index names on tables that already existed.
+INDEXES = [
+    (Gift, "ix_gifts_sender_id"),
+    (Gift, "ix_gifts_recipient_id"),
+    (Subscription, "ix_subscriptions_active_end_date"),
+]
+
+
+def backfill_gift_counters(log):
+    """Recount the denormalized gift counters from the gifts table."""
+    # Plain SQL so the recount does not trip User.updated_at's onupdate.
+    result = db.session.execute(text(
+        "UPDATE users SET "
+        "sent_gifts_total = (SELECT COUNT(*) FROM gifts WHERE gifts.sender_id = users.id), "
+        "received_gifts_total = (SELECT COUNT(*) FROM gifts WHERE gifts.recipient_id = users.id), "
+        "unredeemed_gifts = (SELECT COUNT(*) FROM gifts WHERE gifts.recipient_id = users.id "
+        "AND (gifts.redeemed IS NULL OR gifts.redeemed = :redeemed))"
+    ), {"redeemed": False})
+    log(f"gift counters recounted for {result.rowcount:,} users")
+
+
+def backfill_updated_at(log):
+    """Start rows that predate the column at their creation time."""
+    result = db.session.execute(text(
+        "UPDATE users SET updated_at = COALESCE(created_at, CURRENT_TIMESTAMP) WHERE updated_at IS NULL"
+    ))
+    log(f"updated_at set for {result.rowcount:,} users")
+
+
+BACKFILLS = [backfill_gift_counters, backfill_updated_at]
+
+
+def _missing_columns():
+    inspector = inspect(db.engine)
+    existing = {}
+    for model, name in COLUMNS:
+        table = model.__table__.name
+        if table not in existing:
+            existing[table] = {c["name"] for c in inspector.get_columns(table)}
+        if name not in existing[table]:
+            yield model.__table__.c[name]
+
+
+def _missing_indexes():
+    inspector = inspect(db.engine)
+    for model, name in INDEXES:
+        if name not in {i["name"] for i in inspector.get_indexes(model.__table__.name)}:
+            yield next(i for i in model.__table__.indexes if i.name == name)
+
+
+def migrate(dry_run=False, log=print):
+    """Create missing tables, columns and indexes and run the backfills.
+
+    Returns (columns added, indexes created).
+    """
+    tables = set(inspect(db.engine).get_table_names())
+    new_tables = [t.name for t in db.metadata.sorted_tables if t.name not in tables]
+    columns = list(_missing_columns()) if tables else []
+    indexes = list(_missing_indexes()) if tables else []
+    log(f"tables to create: {', '.join(new_tables) or 'none'}")
+    log(f"columns to add: {', '.join(f'{c.table.name}.{c.name}' for c in columns) or 'none'}")
+    log(f"indexes to create: {', '.join(i.name for i in indexes) or 'none'}")
+    if dry_run:
+        return len(columns), len(indexes)
+
+    db.create_all()
+    dialect = db.engine.dialect
+    for column in columns:
+        spec = CreateColumn(column).compile(dialect=dialect)
+        db.session.execute(text(f"ALTER TABLE {column.table.name} ADD COLUMN {spec}"))
+        log(f"added {column.table.name}.{column.name}")
+    db.session.commit()
+
+    for backfill in BACKFILLS:
+        backfill(log)
+        db.session.commit()
+
+    for index in indexes:
+        index.create(db.session.connection(), checkfirst=True)
+        log(f"created index {index.name}")
+    db.session.commit()
+    return len(columns), len(indexes)
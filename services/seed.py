@@ -0,0 +1,263 @@
+"""Synthetic data at production-like scale for local load testing.
+
+Users cluster around a handful of cities with a skewed interest
+distribution, venues carry dense zone grids, a few popular flights collect
+hundreds of bookings and gifts/waiter calls are spread over the last month.
+Everything is bulk-inserted in chunks and is reproducible for a given seed.
+"""
+import json
+import math
+import random
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import func, insert, select, update
+from werkzeug.security import generate_password_hash
+
+import passwords
+from models import db, User, Gift, Flight, FlightBooking, Zone, WaiterCall, Subscription
+from services import flights as flights_service
+
+PASSWORD = "password"
+EMAIL_TEMPLATE = "seed{n}@example.com"
+CHUNK_SIZE = 1000
+FLIGHT_EPOCH = date(2026, 1, 1)
+
+# (name, latitude, longitude, relative population)
+CITIES = [
+    ("Paris", 48.8566, 2.3522, 10),
+    ("London", 51.5074, -0.1278, 9),
+    ("New York", 40.7128, -74.0060, 9),
+    ("Madrid", 40.4168, -3.7038, 5),
+    ("Berlin", 52.5200, 13.4050, 5),
+    ("Lisbon", 38.7223, -9.1393, 3),
+    ("Tunis", 36.8065, 10.1815, 3),
+    ("Dubai", 25.2048, 55.2708, 4),
+    ("Montreal", 45.5019, -73.5674, 2),
+]
+CITY_SPREAD_KM = 6
+OUTLIER_SHARE = 0.1
+
+# Relative popularity; a few interests dominate, as they do in practice.
+INTERESTS = {
+    "Music": 30, "Travel": 24, "Food": 22, "Technology": 18, "Sports": 16,
+    "Cinema": 14, "Fitness": 12, "Photography": 9, "Art": 8, "Gaming": 8,
+    "Cooking": 7, "Reading": 6, "Fashion": 5, "Dancing": 5, "Science": 4,
+    "Literature": 3, "History": 3, "Ecology": 2,
+}
+GIFT_TYPES = ["Coffee", "Drink", "Dessert", "Flowers", "Snack"]
+SEAT_PREFERENCES = ["window", "aisle", "middle"]
+
+
+def _weighted_sample(rng, weights, k):
+    """``k`` distinct keys of ``weights`` drawn without replacement."""
+    # Efraimidis-Spirakis: the k largest u ** (1 / w) are a weighted sample.
+    keyed = sorted(weights, key=lambda item: rng.random() ** (1 / weights[item]), reverse=True)
+    return keyed[:k]
+
+
+def _jitter(rng, lat, lon, km):
+    lat += rng.gauss(0, km / 111.0)
+    lon += rng.gauss(0, km / (111.0 * max(math.cos(math.radians(lat)), 0.01)))
+    return round(lat, 6), round(lon, 6)
+
+
+def random_location(rng):
+    if rng.random() < OUTLIER_SHARE:
+        return round(rng.uniform(-45, 65), 6), round(rng.uniform(-180, 180), 6)
+    _, lat, lon, _ = rng.choices(CITIES, weights=[c[3] for c in CITIES])[0]
+    return _jitter(rng, lat, lon, CITY_SPREAD_KM)
+
+
+def random_interests(rng):
+    return _weighted_sample(rng, INTERESTS, rng.randint(2, 6))
+
+
+def flight_spec(i):
+    """Form fields of the i-th seeded flight, shared with the load driver."""
+    departure = CITIES[i % len(CITIES)][0]
+    arrival = CITIES[(i * 7 + 3) % len(CITIES)][0]
+    if arrival == departure:
+        arrival = CITIES[(i + 1) % len(CITIES)][0]
+    return {
+        "flight_number": f"WG{i:04d}",
+        "departure": departure,
+        "arrival": arrival,
+        "date": (FLIGHT_EPOCH + timedelta(days=i % 60)).isoformat(),
+    }
+
+
+def _flight_key(values):
+    return values["flight_number"], values["date"], values["departure"], values["arrival"]
+
+
+def _flight_ids(specs):
+    rows = db.session.execute(
+        select(Flight.id, Flight.flight_number, Flight.date, Flight.departure, Flight.arrival)
+        .where(Flight.flight_number.in_({s["flight_number"] for s in specs}))
+    )
+    return {_flight_key(row._mapping): row.id for row in rows}
+
+
+def flight_weights(count, skew=1.1):
+    """Zipf-like popularity: flight 0 is the busiest."""
+    return [1 / (rank + 1) ** skew for rank in range(count)]
+
+
+def _insert_chunks(model, rows, log):
+    total = 0
+    for start in range(0, len(rows), CHUNK_SIZE):
+        chunk = rows[start:start + CHUNK_SIZE]
+        db.session.execute(insert(model), chunk)
+        total += len(chunk)
+    db.session.commit()
+    log(f"  {model.__tablename__}: {total:,} rows")
+
+
+def seed_users(rng, count, premium_share, now, log):
+    first = db.session.scalar(
+        select(func.count()).select_from(User).where(User.email.like(EMAIL_TEMPLATE.format(n="%")))
+    )
+    # One hash for everyone: hashing per user would dominate seeding time.
+    password = generate_password_hash(PASSWORD, method=passwords.current_method())
+    users, premium = [], []
+    for n in range(first, first + count):
+        lat, lon = random_location(rng)
+        is_premium = rng.random() < premium_share
+        users.append({
+            "uid": f"seed-{n}",
+            "email": EMAIL_TEMPLATE.format(n=n),
+            "display_name": f"Seed User {n}",
+            "password": password,
+            "latitude": lat,
+            "longitude": lon,
+            "interests": json.dumps(random_interests(rng)),
+            "profile_complete": True,
+            "is_premium": is_premium,
+            "created_at": now - timedelta(days=rng.randint(0, 365)),
+            "last_reset": now,
+        })
+        if is_premium:
+            premium.append(f"seed-{n}")
+    _insert_chunks(User, users, log)
+
+    ids = dict(db.session.execute(
+        select(User.uid, User.id).where(User.uid.in_([u["uid"] for u in users]))
+    ).all())
+    subscriptions = [
+        {"user_id": ids[uid], "start_date": now, "end_date": now + timedelta(days=30), "is_active": True}
+        for uid in premium
+    ]
+    if subscriptions:
+        _insert_chunks(Subscription, subscriptions, log)
+    return [ids[u["uid"]] for u in users]
+
+
+def seed_zones(rng, venues, zones_per_venue, log):
+    first = db.session.scalar(select(func.count()).select_from(Zone))
+    rows = []
+    for v in range(venues):
+        _, lat, lon, _ = rng.choices(CITIES, weights=[c[3] for c in CITIES])[0]
+        venue_lat, venue_lon = _jitter(rng, lat, lon, CITY_SPREAD_KM / 2)
+        for z in range(zones_per_venue):
+            zone_lat, zone_lon = _jitter(rng, venue_lat, venue_lon, 0.05)
+            rows.append({
+                "name": f"Venue {first // max(zones_per_venue, 1) + v} Zone {z}",
+                "latitude": zone_lat,
+                "longitude": zone_lon,
+                "radius_meters": rng.choice([15, 20, 30, 50, 80]),
+                "interest": _weighted_sample(rng, INTERESTS, 1)[0],
+            })
+    _insert_chunks(Zone, rows, log)
+    return [row[0] for row in db.session.execute(select(Zone.id).order_by(Zone.id.desc()).limit(len(rows)))]
+
+
+def seed_flights(rng, user_ids, flights, bookings_per_user, log):
+    specs = [flights_service.normalize(**flight_spec(i)) for i in range(flights)]
+    existing = _flight_ids(specs)
+    new = [s for s in specs if _flight_key(s) not in existing]
+    if new:
+        _insert_chunks(Flight, new, log)
+        existing.update(_flight_ids(new))
+    flight_ids = [existing[_flight_key(s)] for s in specs]
+
+    weights = flight_weights(flights)
+    rows = []
+    for user_id in user_ids:
+        count = min(int(rng.expovariate(1 / bookings_per_user)), flights) if bookings_per_user else 0
+        if not count:
+            continue
+        for flight_id in {flight_ids[i] for i in rng.choices(range(flights), weights=weights, k=count)}:
+            rows.append({
+                "user_id": user_id,
+                "flight_id": flight_id,
+                "seat_preference": rng.choice(SEAT_PREFERENCES),
+            })
+    if rows:
+        _insert_chunks(FlightBooking, rows, log)
+
+
+def seed_gifts(rng, user_ids, gifts_per_user, now, log):
+    count = int(len(user_ids) * gifts_per_user)
+    if count == 0 or len(user_ids) < 2:
+        return
+    sent, received, unredeemed = {}, {}, {}
+    rows = []
+    for _ in range(count):
+        sender, recipient = rng.sample(user_ids, 2)
+        redeemed = rng.random() < 0.4
+        rows.append({
+            "sender_id": sender,
+            "recipient_id": recipient,
+            "gift_type": rng.choice(GIFT_TYPES),
+            "message": "",
+            "created_at": now - timedelta(minutes=rng.randint(0, 30 * 24 * 60)),
+            "fee_cents": 0,
+            "redeemed": redeemed,
+        })
+        sent[sender] = sent.get(sender, 0) + 1
+        received[recipient] = received.get(recipient, 0) + 1
+        if not redeemed:
+            unredeemed[recipient] = unredeemed.get(recipient, 0) + 1
+    _insert_chunks(Gift, rows, log)
+
+    # Keep the denormalised counters in step with the rows just written.
+    counters = [
+        {
+            "id": user_id,
+            "sent_gifts_total": sent.get(user_id, 0),
+            "received_gifts_total": received.get(user_id, 0),
+            "unredeemed_gifts": unredeemed.get(user_id, 0),
+        }
+        for user_id in user_ids
+    ]
+    for start in range(0, len(counters), CHUNK_SIZE):
+        db.session.execute(update(User), counters[start:start + CHUNK_SIZE])
+    db.session.commit()
+
+
+def seed_waiter_calls(rng, user_ids, zone_ids, calls, now, log):
+    if not calls or not user_ids or not zone_ids:
+        return
+    rows = [
+        {
+            "user_id": rng.choice(user_ids),
+            "zone_id": rng.choice(zone_ids),
+            "timestamp": now - timedelta(minutes=rng.randint(0, 30 * 24 * 60)),
+        }
+        for _ in range(calls)
+    ]
+    _insert_chunks(WaiterCall, rows, log)
+
+
+def seed(users=1000, venues=50, zones_per_venue=20, flights=200, bookings_per_user=1.5,
+         gifts_per_user=2.0, waiter_calls=5000, premium_share=0.2, random_seed=42, log=print):
+    """Generate a full data set; safe to run repeatedly (users and zones accumulate)."""
+    rng = random.Random(random_seed)
+    now = datetime.utcnow()
+    log(f"Seeding {users:,} users, {venues * zones_per_venue:,} zones and {flights:,} flights")
+    user_ids = seed_users(rng, users, premium_share, now, log)
+    zone_ids = seed_zones(rng, venues, zones_per_venue, log)
+    seed_flights(rng, user_ids, flights, bookings_per_user, log)
+    seed_gifts(rng, user_ids, gifts_per_user, now, log)
+    seed_waiter_calls(rng, user_ids, zone_ids, waiter_calls, now, log)
+    return user_ids
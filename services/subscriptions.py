@@ -0,0 +1,67 @@
+import logging
+import time
+from datetime import datetime
+
+from models import db, User, Subscription
+from services import jobs
+
+SWEEP_INTERVAL = 300  # seconds between expiry sweeps
+SWEEP_BATCH_SIZE = 500
+
+
+def expire_due_subscriptions(now=None, batch_size=SWEEP_BATCH_SIZE):
+    """Deactivate subscriptions past their end_date and drop premium status.
+
+    Each batch is an indexed range scan on (is_active, end_date) followed by
+    two UPDATEs in one transaction; users who still have an active
+    subscription keep premium. Returns the number of expired subscriptions.
+    """
+    now = now or datetime.utcnow()
+    expired = 0
+    while True:
+        rows = (
+            db.session.query(Subscription.id, Subscription.user_id)
+            .filter(Subscription.is_active.is_(True), Subscription.end_date <= now)
+            .order_by(Subscription.end_date)
+            .limit(batch_size)
+            .all()
+        )
+        if not rows:
+            return expired
+
+        # Both UPDATEs re-check the state, so a renewal committed since the
+        # SELECT keeps its subscription and premium status.
+        Subscription.query.filter(
+            Subscription.id.in_([r.id for r in rows]),
+            Subscription.is_active.is_(True), Subscription.end_date <= now,
+        ).update({Subscription.is_active: False}, synchronize_session=False)
+        still_active = (
+            db.session.query(Subscription.id)
+            .filter(Subscription.user_id == User.id, Subscription.is_active.is_(True))
+            .exists()
+        )
+        User.query.filter(User.id.in_([r.user_id for r in rows]), ~still_active).update(
+            {User.is_premium: False}, synchronize_session=False
+        )
+        db.session.commit()
+        expired += len(rows)
+        if len(rows) < batch_size:
+            return expired
+
+
+@jobs.job("subscriptions.expire")
+def sweep():
+    # Reschedule even when this sweep fails, or sweeping stops until restart.
+    try:
+        expired = expire_due_subscriptions()
+        if expired:
+            logging.info(f"Expired {expired} subscriptions")
+    finally:
+        schedule_sweep()
+
+
+def schedule_sweep():
+    # One sweep per interval bucket, however many workers try to schedule it.
+    bucket = int(time.time() // SWEEP_INTERVAL) + 1
+    jobs.enqueue("subscriptions.expire", delay=bucket * SWEEP_INTERVAL - time.time(),
+                 idempotency_key=f"subscriptions.expire:{bucket}")
@@ -0,0 +1,138 @@
+"""Pooled async HTTP for calls to external services.
+
+Requests run on one event loop per process, in a daemon thread, through a
+shared ``httpx.AsyncClient`` that keeps connections alive between calls.
+Each host has a concurrency limit (UPSTREAM_HOST_LIMIT, overridden per host
+by UPSTREAM_HOST_LIMITS="api.openai.com=20,newsapi.org=5") and every call has
+a deadline covering both the wait for a slot and the request itself, so a
+slow upstream costs a bounded amount of time instead of a whole worker.
+
+From sync views use ``fetch`` (one call) or ``fetch_all`` (several calls
+concurrently). Async code, including ``async def`` Flask views, can
+``await request(...)`` from any event loop.
+"""
+import asyncio
+import os
+import threading
+from urllib.parse import urlsplit
+
+DEFAULT_DEADLINE = 10.0
+
+
+class UpstreamError(Exception):
+    pass
+
+
+class UpstreamBusy(UpstreamError):
+    """No slot for the host became free before the deadline."""
+
+
+class UpstreamTimeout(UpstreamError):
+    """The upstream did not answer before the deadline."""
+
+
+def _host_limits():
+    limits = {}
+    for item in os.getenv("UPSTREAM_HOST_LIMITS", "").split(","):
+        host, _, limit = item.partition("=")
+        if host.strip() and limit.strip():
+            limits[host.strip()] = int(limit)
+    return limits
+
+
+class _Runtime:
+    def __init__(self):
+        self.pid = os.getpid()
+        self.default_limit = int(os.getenv("UPSTREAM_HOST_LIMIT", 10))
+        self.host_limits = _host_limits()
+        self.semaphores = {}
+        self.client = None
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="upstream-io", daemon=True)
+        self.thread.start()
+
+    def semaphore(self, host):
+        # Only touched from the loop thread.
+        if host not in self.semaphores:
+            self.semaphores[host] = asyncio.Semaphore(self.host_limits.get(host, self.default_limit))
+        return self.semaphores[host]
+
+    def http(self):
+        if self.client is None:
+            import httpx
+
+            self.client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=int(os.getenv("UPSTREAM_MAX_CONNECTIONS", 100)),
+                    max_keepalive_connections=int(os.getenv("UPSTREAM_MAX_KEEPALIVE", 20)),
+                ),
+                timeout=httpx.Timeout(None, connect=float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", 5))),
+            )
+        return self.client
+
+
+_runtime = None
+_runtime_lock = threading.Lock()
+
+
+def runtime():
+    """This process's loop and client; a forked worker gets its own."""
+    global _runtime
+    with _runtime_lock:
+        if _runtime is None or _runtime.pid != os.getpid():
+            _runtime = _Runtime()
+        return _runtime
+
+
+async def _request(rt, method, url, deadline, **kwargs):
+    import httpx
+
+    loop = asyncio.get_running_loop()
+    expires = loop.time() + deadline
+    semaphore = rt.semaphore(urlsplit(url).hostname)
+    try:
+        await asyncio.wait_for(semaphore.acquire(), deadline)
+    except asyncio.TimeoutError:
+        raise UpstreamBusy(f"{method} {url}: no free slot within {deadline:.1f}s")
+    try:
+        return await asyncio.wait_for(rt.http().request(method, url, **kwargs), max(expires - loop.time(), 0))
+    except asyncio.TimeoutError:
+        raise UpstreamTimeout(f"{method} {url}: no answer within {deadline:.1f}s")
+    except httpx.HTTPError as e:
+        raise UpstreamError(f"{method} {url}: {e}") from e
+    finally:
+        semaphore.release()
+
+
+async def request(method, url, *, deadline=DEFAULT_DEADLINE, **kwargs):
+    """Awaitable from any event loop; returns an ``httpx.Response``."""
+    rt = runtime()
+    future = asyncio.run_coroutine_threadsafe(_request(rt, method, url, deadline, **kwargs), rt.loop)
+    return await asyncio.wrap_future(future)
+
+
+def fetch(method, url, *, deadline=DEFAULT_DEADLINE, **kwargs):
+    """Blocking call for sync code; returns an ``httpx.Response``."""
+    rt = runtime()
+    future = asyncio.run_coroutine_threadsafe(_request(rt, method, url, deadline, **kwargs), rt.loop)
+    return future.result()
+
+
+def fetch_all(calls, *, deadline=DEFAULT_DEADLINE):
+    """Run ``(method, url, kwargs)`` calls concurrently.
+
+    Returns one ``httpx.Response`` or ``UpstreamError`` per call, in order.
+    """
+    rt = runtime()
+
+    async def gather():
+        return await asyncio.gather(
+            *(_request(rt, method, url, deadline, **kwargs) for method, url, kwargs in calls),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run_coroutine_threadsafe(gather(), rt.loop).result()
+    for result in results:
+        if isinstance(result, BaseException) and not isinstance(result, UpstreamError):
+            raise result
+    return results
@@ -0,0 +1,156 @@
+"""Coalesce concurrent identical computations.
+
+``do(name, key, fn)`` runs ``fn`` once per in-flight ``(name, key)``: other
+threads in the worker wait for the leader and share its result (or its
+exception). Across workers on the same host the leader also holds a file
+lock under SINGLEFLIGHT_DIR and leaves its result there as JSON, so a worker
+that was waiting on the lock picks up the answer instead of recomputing it.
+Results written within the last ``ttl`` seconds are reused as well.
+
+Results must be JSON-serialisable to be shared across workers; anything
+else is still shared between threads. Pass ``workers=False`` to share only
+within the process, for results that must not be written to disk (anything
+holding user data) or keys too fine-grained to be worth a file each.
+"""
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+from flask import current_app
+
+import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows: coalesce within the process only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+LOCK_TIMEOUT = 10
+PRUNE_AFTER = 24 * 3600
+
+_calls = {}
+_calls_lock = threading.Lock()
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def do(name, key, fn, ttl=0, timeout=LOCK_TIMEOUT, workers=True):
+    flight = f"{name}:{key}"
+    with _calls_lock:
+        call = _calls.get(flight)
+        leader = call is None
+        if leader:
+            call = _calls[flight] = _Call()
+
+    if not leader:
+        if not call.done.wait(timeout):
+            return fn()
+        metrics.record_cache(f"singleflight_{name}", True)
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    try:
+        if workers:
+            call.result, shared = _across_workers(flight, fn, ttl, timeout)
+        else:
+            call.result, shared = fn(), False
+        metrics.record_cache(f"singleflight_{name}", shared)
+        return call.result
+    except BaseException as e:
+        call.error = e
+        raise
+    finally:
+        with _calls_lock:
+            del _calls[flight]
+        call.done.set()
+
+
+def _read(path, not_before):
+    try:
+        with open(path) as f:
+            stored = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    return stored if stored["written_at"] >= not_before else None
+
+
+def _write(path, value):
+    try:
+        data = json.dumps({"written_at": time.time(), "value": value})
+    except TypeError:
+        return
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _acquire(lock_file, timeout):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+
+
+def _prune(directory):
+    cutoff = time.time() - PRUNE_AFTER
+    for entry in os.scandir(directory):
+        try:
+            if entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+        except FileNotFoundError:
+            pass
+
+
+def _across_workers(flight, fn, ttl, timeout):
+    """(result, whether it came from another worker)."""
+    directory = current_app.config["SINGLEFLIGHT_DIR"]
+    if not directory or fcntl is None:
+        return fn(), False
+
+    digest = hashlib.sha256(flight.encode()).hexdigest()
+    result_path = os.path.join(directory, f"{digest}.json")
+    started = time.time()
+    stored = _read(result_path, started - ttl)
+    if stored is not None:
+        return stored["value"], True
+
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, f"{digest}.lock"), "a") as lock_file:
+        if not _acquire(lock_file, timeout):
+            logger.warning("singleflight lock for %s timed out; computing anyway", flight)
+            return fn(), False
+        try:
+            # Written while we waited means we waited on that computation.
+            stored = _read(result_path, started - ttl)
+            if stored is not None:
+                return stored["value"], True
+            value = fn()
+            _write(result_path, value)
+            if random.random() < 0.01:
+                _prune(directory)
+            return value, False
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def init_app(app):
+    app.config.setdefault("SINGLEFLIGHT_DIR", os.getenv(
+        "SINGLEFLIGHT_DIR", os.path.join(app.instance_path, "singleflight")))
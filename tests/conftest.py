@@ -0,0 +1,77 @@
+import itertools
+import os
+import tempfile
+
+import pytest
+from flask.testing import FlaskClient
+
+_tmp = tempfile.mkdtemp(prefix="wingoo-tests-")
+os.environ.update({
+    "SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.join(_tmp, 'test.db')}",
+    "RATELIMIT_ENABLED": "0",
+    "SINGLEFLIGHT_DIR": os.path.join(_tmp, "singleflight"),
+    "TEMPLATE_BYTECODE_DIR": "",
+    "PASSWORD_HASH_WORKERS": "0",
+    "PASSWORD_HASH_METHOD": "pbkdf2:sha256:1000",
+})
+
+from app import create_app  # noqa: E402
+from models import db, User  # noqa: E402
+
+
+class Client(FlaskClient):
+    """Runs each request in its own app context, as in production.
+
+    Otherwise requests reuse the test's context and share ``g`` (and the
+    logged-in user Flask-Login caches there) and the database session.
+    """
+    def open(self, *args, **kwargs):
+        with self.application.app_context():
+            return super().open(*args, **kwargs)
+
+
+@pytest.fixture(scope="session")
+def app():
+    app = create_app()
+    app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    app.test_client_class = Client
+    return app
+
+
+@pytest.fixture
+def database(app):
+    app.jinja_env.fragment_cache.clear()
+    with app.app_context():
+        db.create_all()
+        yield db
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app, database):
+    return app.test_client()
+
+
+@pytest.fixture
+def make_user(database):
+    counter = itertools.count()
+
+    def make(**values):
+        n = next(counter)
+        values.setdefault("uid", f"user{n}_uid")
+        values.setdefault("email", f"user{n}@example.com")
+        values.setdefault("display_name", f"User {n}")
+        user = User(**values)
+        db.session.add(user)
+        db.session.commit()
+        return user
+    return make
+
+
+@pytest.fixture
+def login(client):
+    def login(user):
+        with client.session_transaction() as session:
+            session["_user_id"] = str(user.id)
+    return login
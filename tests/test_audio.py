@@ -0,0 +1,97 @@
+import hashlib
+import io
+
+import pytest
+from werkzeug.datastructures import FileStorage
+from werkzeug.test import encode_multipart
+
+from services import audio
+
+MP3 = b"ID3" + bytes(range(256)) * 1000
+
+
+@pytest.fixture(autouse=True)
+def audio_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(audio, "AUDIO_DIR", str(tmp_path))
+    return tmp_path
+
+
+class CountingStream(io.BytesIO):
+    def __init__(self, data):
+        super().__init__(data)
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        chunk = super().read(size)
+        self.bytes_read += len(chunk)
+        return chunk
+
+
+def _body(filename="news.mp3", content=MP3, interest="Music"):
+    boundary, body = encode_multipart({"interest": interest, "file": FileStorage(io.BytesIO(content), filename)})
+    return boundary.encode(), body
+
+
+def test_receive_upload_stores_the_file_part(audio_dir):
+    boundary, body = _body()
+
+    fields, filename, digest = audio.receive_upload(io.BytesIO(body), boundary)
+
+    assert fields == {"interest": "Music"}
+    assert filename == "news.mp3"
+    assert digest == hashlib.sha256(MP3).hexdigest()
+    with open(audio_dir / audio.BLOB_DIR / f"{digest}.mp3", "rb") as f:
+        assert f.read() == MP3
+
+
+def test_receive_upload_skips_non_mp3_files(audio_dir):
+    boundary, body = _body(filename="notes.txt")
+
+    fields, filename, digest = audio.receive_upload(io.BytesIO(body), boundary)
+
+    assert (fields, filename, digest) == ({"interest": "Music"}, "notes.txt", None)
+    assert not list(audio_dir.rglob("*.mp3"))
+
+
+def test_size_cap_applies_while_the_body_streams_in():
+    boundary, body = _body()
+    stream = CountingStream(body)
+
+    with pytest.raises(audio.AudioTooLarge):
+        audio.receive_upload(stream, boundary, max_bytes=1000)
+
+    assert stream.bytes_read < len(body) // 2
+
+
+def test_truncated_body_is_rejected():
+    boundary, body = _body()
+
+    with pytest.raises(ValueError):
+        audio.receive_upload(io.BytesIO(body[:len(body) // 2]), boundary)
+
+
+def test_upload_audio_publishes_the_file(audio_dir, client, make_user, login):
+    login(make_user())
+
+    response = client.post("/upload_audio", content_type="multipart/form-data",
+                           data={"interest": "Music", "file": (io.BytesIO(MP3), "news.mp3")})
+
+    assert response.status_code == 302 and response.headers["Location"].endswith("/news")
+    with open(audio_dir / "music_news.mp3", "rb") as f:
+        assert f.read() == MP3
+
+
+def test_upload_audio_refuses_oversized_bodies_up_front(client, make_user, login, monkeypatch):
+    monkeypatch.setattr(audio, "MAX_UPLOAD_BYTES", 1000)
+    login(make_user())
+
+    response = client.post("/upload_audio", content_type="multipart/form-data",
+                           data={"interest": "Music", "file": (io.BytesIO(MP3 * 2), "news.mp3")})
+
+    assert response.status_code == 413
+
+
+def test_upload_audio_rejects_non_multipart_bodies(client, make_user, login):
+    login(make_user())
+
+    assert client.post("/upload_audio", data=b"raw", content_type="audio/mpeg").status_code == 400
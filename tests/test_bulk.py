@@ -0,0 +1,60 @@
+import io
+
+import pytest
+
+from models import User
+from services import bulk
+
+USERS_CSV = (
+    "email,interests\n"
+    'a@example.com,"[""Music"", ""Travel""]"\n'
+    'b@example.com,"[""Music"""\n'
+    "c@example.com,Music;Art\n"
+)
+
+
+def test_malformed_interests_are_rejected_per_row(database):
+    logged = []
+
+    written, rejected = bulk.import_rows("users", io.StringIO(USERS_CSV), log=logged.append)
+
+    assert (written, rejected) == (2, 1)
+    assert "line 3: interests: invalid JSON list" in "\n".join(logged)
+    assert {u.email: u.interests for u in User.query} == {
+        "a@example.com": '["Music", "Travel"]',
+        "c@example.com": '["Music", "Art"]',
+    }
+
+
+@pytest.mark.parametrize("value", [{"a": 1}, [1, 2], "[1, 2]"])
+def test_interests_must_be_a_list_of_strings(value):
+    with pytest.raises(bulk.RowError):
+        bulk._interests(value)
+
+
+def test_copy_rows_get_python_side_defaults():
+    entity = bulk.ENTITIES["users"]
+    rows = [bulk.validate(entity, {"email": f"{n}@example.com"}) for n in range(2)]
+
+    bulk._python_defaults(entity, rows)
+
+    for row in rows:
+        assert (row["gift_count"], row["flight_count"], row["news_count"]) == (0, 0, 0)
+        assert row["last_reset"] is not None and row["updated_at"] is not None
+        # Server defaults and the primary key are left to the database.
+        assert "sent_gifts_total" not in row and "id" not in row
+
+
+def test_users_sharing_an_email_local_part_get_distinct_uids(database):
+    rows = io.StringIO("email\nalice@a.com\nalice@b.com\n")
+
+    assert bulk.import_rows("users", rows, log=lambda message: None) == (2, 0)
+    uids = [u.uid for u in User.query.order_by(User.id)]
+    assert len(set(uids)) == 2 and all(uid.startswith("alice_") for uid in uids)
+
+
+def test_derived_uid_is_stable_across_imports():
+    entity = bulk.ENTITIES["users"]
+
+    assert bulk.validate(entity, {"email": "alice@a.com"})["uid"] == \
+        bulk.validate(entity, {"email": "alice@a.com"})["uid"]
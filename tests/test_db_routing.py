@@ -0,0 +1,92 @@
+"""Replica routing against two SQLite files standing in for primary and replica."""
+import shutil
+import sqlite3
+
+import pytest
+from flask import g
+from sqlalchemy import select, update
+
+import db_routing
+from app import create_app
+from conftest import Client
+from models import db, User, Zone
+
+
+@pytest.fixture
+def replica_app(tmp_path, monkeypatch):
+    primary, replica = tmp_path / "primary.db", tmp_path / "replica.db"
+    monkeypatch.setenv("SQLALCHEMY_DATABASE_URI", f"sqlite:///{primary}")
+    monkeypatch.setenv("SQLALCHEMY_REPLICA_URI", f"sqlite:///{replica}")
+    app = create_app()
+    app.config.update(TESTING=True)
+    app.test_client_class = Client
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([User(id=1, uid="u1", email="u1@example.com"),
+                            Zone(name="zone", latitude=0, longitude=0, radius_meters=10)])
+        db.session.commit()
+        db.session.remove()
+        # "Replicate", then let the copies diverge so each read shows its source.
+        shutil.copy(primary, replica)
+        for path in (primary, replica):
+            with sqlite3.connect(path) as conn:
+                conn.execute("UPDATE zones SET name = ?", (path.stem,))
+    yield app
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+    # init_app registered a metadata for the bind on the shared db object;
+    # apps created later without a replica would try to create_all on it.
+    db.metadatas.pop(db_routing.REPLICA, None)
+
+
+def _zone_names(client):
+    return [z["name"] for z in client.get("/api/zones").get_json()]
+
+
+def _login(client):
+    with client.session_transaction() as session:
+        session["_user_id"] = session["user_id"] = 1
+
+
+def test_read_replica_views_read_from_the_replica(replica_app):
+    client = replica_app.test_client()
+    _login(client)
+
+    assert _zone_names(client) == ["replica"]
+
+
+def test_reads_after_a_commit_stay_on_the_primary(replica_app, monkeypatch):
+    client = replica_app.test_client()
+    _login(client)
+
+    assert client.post("/update_location", json={"lat": 1.0, "lon": 2.0}).status_code == 200
+    with replica_app.app_context():
+        assert db.session.get(User, 1).latitude == 1.0
+    assert _zone_names(client) == ["primary"]
+
+    # Once the sticky window has passed, reads go back to the replica.
+    monkeypatch.setitem(replica_app.config, "DB_REPLICA_STICKY_SECONDS", -1)
+    client.post("/update_location", json={"lat": 3.0, "lon": 4.0})
+    assert _zone_names(client) == ["replica"]
+
+
+def test_writes_in_a_replica_view_go_to_the_primary(replica_app):
+    with replica_app.test_request_context():
+        g.use_replica = True
+        replica = db.engines[db_routing.REPLICA]
+
+        mapper = Zone.__mapper__
+        assert db.session.get_bind(mapper, clause=select(Zone)) is replica
+        assert db.session.get_bind(mapper, clause=update(Zone).values(name="x")) is db.engine
+        assert db.session.get_bind(mapper, clause=select(Zone).with_for_update()) is db.engine
+
+
+def test_without_a_replica_everything_uses_the_primary(app, client, make_user, login):
+    assert db_routing.REPLICA not in db.engines
+    login(make_user())
+
+    assert client.get("/api/zones").status_code == 200
+    with app.test_request_context():
+        g.use_replica = True
+        assert db.session.get_bind(Zone.__mapper__, clause=select(Zone)) is db.engine
@@ -0,0 +1,96 @@
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import inspect, text
+
+from models import db, Flight, FlightBooking
+from services import flights
+
+
+@pytest.mark.parametrize("raw", ["AF123", "af 0123", "AF-123", " Af0123 "])
+def test_flight_numbers_share_one_canonical_form(raw):
+    assert flights.canonical_flight_number(raw) == "AF123"
+
+
+@pytest.mark.parametrize("raw, canonical", [
+    ("U2 0012A", "U212A"), ("EZY8001", "EZY8001"), ("not a flight", "NOTAFLIGHT"), (None, ""),
+])
+def test_flight_number_edge_cases(raw, canonical):
+    assert flights.canonical_flight_number(raw) == canonical
+
+
+@pytest.mark.parametrize("raw, canonical", [
+    ("cdg", "CDG"), ("Paris (CDG)", "CDG"), ("  new   york  ", "NEW YORK"), (None, ""),
+])
+def test_canonical_airport(raw, canonical):
+    assert flights.canonical_airport(raw) == canonical
+
+
+@pytest.mark.parametrize("raw", [
+    "2025-03-05", "2025-03-05T10:00:00", "2025/03/05", "05/03/2025", "05.03.2025", "20250305",
+    "5 Mar 2025", "March 5, 2025", date(2025, 3, 5), datetime(2025, 3, 5, 10),
+])
+def test_parse_date(raw):
+    assert flights.parse_date(raw) == date(2025, 3, 5)
+
+
+@pytest.mark.parametrize("raw", ["", None, "tomorrow", "31/02/2025"])
+def test_unparseable_dates(raw):
+    assert flights.parse_date(raw) is None
+
+
+def test_normalize_rejects_incomplete_flights():
+    with pytest.raises(flights.FlightError, match="date"):
+        flights.normalize("AF123", "CDG", "JFK", "soon")
+    with pytest.raises(flights.FlightError, match="required"):
+        flights.normalize("AF123", " ", "JFK", "2025-03-05")
+
+
+def test_find_or_create_dedupes_spellings(database):
+    first = flights.find_or_create("af 0123", "Paris (CDG)", "jfk", "05/03/2025")
+    db.session.commit()
+    second = flights.find_or_create("AF-123", "CDG", "JFK", "2025-03-05")
+
+    assert second.id == first.id
+    assert Flight.query.count() == 1
+    assert (first.flight_number, first.departure, first.arrival, first.date) == \
+        ("AF123", "CDG", "JFK", date(2025, 3, 5))
+
+
+def test_book_once_per_user(database, make_user):
+    user = make_user()
+    flight = flights.find_or_create("AF123", "CDG", "JFK", "2025-03-05")
+
+    assert flights.book(user.id, flight.id) is True
+    assert flights.book(user.id, flight.id) is False
+    assert FlightBooking.query.count() == 1
+
+
+def test_migrate_merges_legacy_duplicates(database, make_user):
+    alice, bob = make_user(), make_user()
+    db.session.execute(text("DROP TABLE flight_bookings"))
+    db.session.execute(text("DROP TABLE flights"))
+    db.session.execute(text(
+        "CREATE TABLE flights (id INTEGER PRIMARY KEY, flight_number VARCHAR(50) NOT NULL, "
+        "departure VARCHAR(100), arrival VARCHAR(100), date VARCHAR(50))"))
+    db.session.execute(text(
+        "CREATE TABLE flight_bookings (id INTEGER PRIMARY KEY, user_id INTEGER, flight_id INTEGER, "
+        "seat_preference VARCHAR(50), created_at DATETIME)"))
+    db.session.execute(text("INSERT INTO flights VALUES (:id, :number, :departure, :arrival, :date)"), [
+        {"id": 1, "number": "af 0123", "departure": "Paris (CDG)", "arrival": "jfk", "date": "05/03/2025"},
+        {"id": 2, "number": "AF123", "departure": "CDG", "arrival": "JFK", "date": "2025-03-05"},
+        {"id": 3, "number": "AF123", "departure": "CDG", "arrival": "JFK", "date": "someday"},
+    ])
+    db.session.execute(text("INSERT INTO flight_bookings (user_id, flight_id) VALUES (:user, :flight)"), [
+        {"user": alice.id, "flight": 1}, {"user": alice.id, "flight": 2}, {"user": bob.id, "flight": 2},
+    ])
+    db.session.commit()
+
+    assert flights.migrate(log=lambda message: None) == (1, 2, 1, 1)
+
+    rows = db.session.execute(text("SELECT id, flight_number, departure, arrival, date FROM flights ORDER BY id"))
+    assert [tuple(r) for r in rows] == [(1, "AF123", "CDG", "JFK", "2025-03-05"), (3, "AF123", "CDG", "JFK", None)]
+    bookings = db.session.execute(text("SELECT user_id, flight_id FROM flight_bookings ORDER BY id"))
+    assert [tuple(b) for b in bookings] == [(alice.id, 1), (bob.id, 1)]
+    assert "uq_flights_number_date_route" in {i["name"] for i in inspect(db.engine).get_indexes("flights")}
+    assert flights.migrate(log=lambda message: None) == (0, 0, 0, 0)
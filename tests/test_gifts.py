@@ -0,0 +1,88 @@
+import pytest
+
+from models import db, Gift, Job, User
+from services import gifts
+
+
+def test_free_quota_then_fee(make_user):
+    sender = make_user()
+    recipients = [make_user() for _ in range(gifts.FREE_GIFTS_PER_MONTH + 2)]
+
+    fees = gifts.send_gifts(sender.id, [r.id for r in recipients], "Coffee")
+
+    assert fees == [0] * gifts.FREE_GIFTS_PER_MONTH + [gifts.GIFT_FEE_CENTS] * 2
+    assert [g.fee_cents for g in Gift.query.order_by(Gift.id)] == fees
+    assert gifts.send_gift(sender.id, recipients[0].id, "Coffee") == gifts.GIFT_FEE_CENTS
+
+
+def test_premium_sends_free(make_user):
+    sender = make_user(is_premium=True)
+    recipients = [make_user() for _ in range(gifts.FREE_GIFTS_PER_MONTH + 1)]
+
+    assert gifts.send_gifts(sender.id, [r.id for r in recipients], "Coffee") == [0] * len(recipients)
+
+
+def test_counters_follow_sends_and_redeems(make_user):
+    sender, recipient = make_user(), make_user()
+    gifts.send_gifts(sender.id, [recipient.id, recipient.id], "Coffee")
+    gift = Gift.query.one()
+
+    assert gifts.redeem_gift(gift.id, recipient.id)
+    assert not gifts.redeem_gift(gift.id, recipient.id)
+    sender, recipient = db.session.get(User, sender.id), db.session.get(User, recipient.id)
+    assert (sender.sent_gifts_total, recipient.received_gifts_total, recipient.unredeemed_gifts) == (1, 1, 0)
+
+
+@pytest.mark.parametrize("recipient_ids", ["12", {"id": 1}, None, 7])
+def test_recipients_must_be_a_list(make_user, recipient_ids):
+    sender = make_user()
+    with pytest.raises(gifts.GiftError):
+        gifts.send_gifts(sender.id, recipient_ids, "Coffee")
+
+
+def test_rejects_unknown_and_self(make_user):
+    sender = make_user()
+    with pytest.raises(gifts.GiftError, match="Unknown"):
+        gifts.send_gifts(sender.id, [sender.id + 100], "Coffee")
+    with pytest.raises(gifts.GiftError, match="yourself"):
+        gifts.send_gifts(sender.id, [sender.id], "Coffee")
+    assert Gift.query.count() == 0
+
+
+def test_one_queued_token_job_covers_many_sends(make_user):
+    sender = make_user(is_premium=True)
+    recipients = [make_user() for _ in range(3)]
+    for recipient in recipients:
+        gifts.send_gift(sender.id, recipient.id, "Coffee")
+
+    assert Job.query.filter_by(name="gifts.issue_tokens").count() == 1
+
+
+def test_bulk_endpoint_rejects_string_recipients(client, make_user, login):
+    sender, _ = make_user(), make_user()
+    login(sender)
+
+    response = client.post("/api/gifts/bulk", json={"recipient_ids": "12", "gift_type": "Coffee"})
+
+    assert response.status_code == 400
+    assert Gift.query.count() == 0
+
+
+def test_inbox_does_not_hold_sync_workers(client, make_user, login):
+    recipient = make_user()
+    login(recipient)
+
+    response = client.get("/api/gifts/inbox?total=0&wait=25")
+
+    assert response.json == {"wait": 0, "gifts": [], "total": 0, "last_id": 0}
+
+
+def test_inbox_returns_new_gifts(client, make_user, login):
+    sender, recipient = make_user(), make_user()
+    login(recipient)
+    gifts.send_gift(sender.id, recipient.id, "Coffee", "hi")
+
+    data = client.get("/api/gifts/inbox?total=0").json
+
+    assert data["total"] == 1
+    assert [(g["sender"], g["message"]) for g in data["gifts"]] == [(sender.display_name, "hi")]
@@ -0,0 +1,70 @@
+import os
+
+import pytest
+
+import images
+
+ICON = images.MANIFEST_ICON
+
+
+@pytest.fixture
+def cache_dir(app, tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, "IMAGE_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(images, "_cache_bytes", {})
+    return tmp_path
+
+
+def _cached(cache_dir):
+    return sorted(p for p in cache_dir.rglob("*.png"))
+
+
+def test_misses_below_the_limit_do_not_walk_the_cache(app, cache_dir, monkeypatch):
+    walks = []
+    real_walk = os.walk
+    monkeypatch.setattr(os, "walk", lambda top: walks.append(top) or real_walk(top))
+
+    with app.app_context():
+        source = images.source_path(ICON)
+        for width in images.WIDTHS[:4]:
+            images.derivative(source, width, "png")
+
+    assert len(_cached(cache_dir)) == 4
+    assert walks == [str(cache_dir)]  # the first write, to learn what is on disk
+
+
+def test_passing_the_limit_evicts_least_recently_used_to_low_water(app, cache_dir, monkeypatch):
+    with app.app_context():
+        source = images.source_path(ICON)
+        paths = []
+        for width in images.WIDTHS[:4]:
+            paths.append(images.derivative(source, width, "png"))
+            os.utime(paths[-1], (len(paths), len(paths)))
+        limit = sum(os.path.getsize(p) for p in paths)
+        monkeypatch.setitem(app.config, "IMAGE_CACHE_MAX_BYTES", limit)
+
+        newest = images.derivative(source, images.WIDTHS[4], "png")
+
+    remaining = _cached(cache_dir)
+    assert str(newest) in map(str, remaining) and paths[0] not in map(str, remaining)
+    assert sum(os.path.getsize(p) for p in remaining) <= limit * images.LOW_WATER
+    assert images._cache_bytes[str(cache_dir)] == sum(os.path.getsize(p) for p in remaining)
+
+
+def test_serve_rerenders_a_derivative_evicted_before_it_was_sent(client, cache_dir, monkeypatch):
+    real_derivative = images.derivative
+    evicted = []
+
+    def derivative_then_evict(*args):
+        path = real_derivative(*args)
+        if not evicted:
+            evicted.append(path)
+            os.remove(path)
+        return path
+
+    monkeypatch.setattr(images, "derivative", derivative_then_evict)
+
+    response = client.get(f"/img/{ICON}?w=48&fmt=png")
+
+    assert response.status_code == 200
+    assert response.mimetype == "image/png"
+    assert evicted and os.path.exists(evicted[0])
@@ -0,0 +1,82 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import db, Job
+from services import jobs
+
+calls = []
+
+
+@jobs.job("tests.record")
+def record(**payload):
+    calls.append(payload)
+
+
+@jobs.job("tests.fail")
+def fail():
+    raise RuntimeError("boom")
+
+
+@pytest.fixture(autouse=True)
+def clear_calls():
+    calls.clear()
+
+
+def test_claim_runs_highest_priority_first(database):
+    jobs.enqueue("tests.record", {"n": 1})
+    jobs.enqueue("tests.record", {"n": 2}, priority=5)
+
+    assert jobs.run_pending("w1") == 2
+    assert calls == [{"n": 2}, {"n": 1}]
+    assert {j.status for j in Job.query} == {"done"}
+
+
+def test_claimed_job_is_invisible_until_its_lock_expires(database):
+    queued = jobs.enqueue("tests.record")
+
+    first = jobs.claim("w1")
+    assert first.id == queued.id and first.attempts == 1
+    assert jobs.claim("w2") is None
+
+    Job.query.filter_by(id=queued.id).update({Job.locked_until: datetime.utcnow() - timedelta(seconds=1)})
+    db.session.commit()
+    again = jobs.claim("w2")
+    assert again.id == queued.id and again.locked_by == "w2" and again.attempts == 2
+
+
+def test_failed_job_is_retried_with_backoff_then_marked_failed(database):
+    queued = jobs.enqueue("tests.fail", max_attempts=2)
+
+    assert not jobs.run_job(jobs.claim("w1"))
+    retry = db.session.get(Job, queued.id, populate_existing=True)
+    assert retry.status == "queued" and retry.last_error == "boom"
+    assert retry.run_at > datetime.utcnow()
+    assert jobs.claim("w1") is None  # not due yet
+
+    Job.query.filter_by(id=queued.id).update({Job.run_at: datetime.utcnow()})
+    db.session.commit()
+    assert not jobs.run_job(jobs.claim("w1"))
+    failed = db.session.get(Job, queued.id, populate_existing=True)
+    assert failed.status == "failed" and failed.attempts == 2 and failed.finished_at
+
+
+def test_idempotency_key_dedupes(database):
+    first = jobs.enqueue("tests.record", idempotency_key="k")
+    assert jobs.enqueue("tests.record", idempotency_key="k").id == first.id
+    assert Job.query.count() == 1
+
+
+def test_purge_keeps_recent_and_pending_jobs(database):
+    old = datetime.utcnow() - timedelta(days=jobs.RETENTION_DAYS + 1)
+    for status, finished_at in [("done", old), ("failed", old), ("done", datetime.utcnow()), ("queued", None)]:
+        db.session.add(Job(name="tests.record", status=status, finished_at=finished_at))
+    db.session.commit()
+
+    assert jobs.purge_finished(batch_size=1) == 2
+    assert sorted(j.status for j in Job.query) == ["done", "queued"]
+
+
+def test_purge_reschedules_itself(database):
+    jobs.purge()
+    assert Job.query.filter_by(name="jobs.purge", status="queued").count() == 1
@@ -0,0 +1,103 @@
+import threading
+
+import pytest
+from flask import get_flashed_messages
+from werkzeug.security import generate_password_hash
+
+import passwords
+from models import db
+
+
+def busy(*args):
+    raise passwords.PasswordBusy()
+
+
+def test_saturated_hasher_sheds():
+    hasher = passwords.Hasher("pbkdf2:sha256:1000", workers=1, max_queue=0, timeout=1)
+    hasher.pending = 1
+
+    with pytest.raises(passwords.PasswordBusy):
+        hasher.run(passwords._hash, "secret", hasher.method)
+
+
+def test_hash_that_outlives_the_timeout_sheds_and_releases_its_slot():
+    hasher = passwords.Hasher("pbkdf2:sha256:1000", workers=1, max_queue=1, timeout=0.05)
+    release = threading.Event()
+
+    with pytest.raises(passwords.PasswordBusy):
+        hasher.run(release.wait)
+    assert hasher.pending == 1  # still running on the executor
+
+    # A queued job that times out is cancelled and gives its slot back at once.
+    with pytest.raises(passwords.PasswordBusy):
+        hasher.run(release.wait)
+    assert hasher.pending == 1
+
+    release.set()
+    hasher.executor.shutdown(wait=True)
+    assert hasher.pending == 0
+
+
+@pytest.fixture
+def hash_method(app, monkeypatch):
+    method = "pbkdf2:sha256:1500"
+    monkeypatch.setitem(app.config, "PASSWORD_HASH_METHOD", method)
+    monkeypatch.setitem(app.extensions, "passwords", passwords.Hasher(method, 0, 0, 1))
+    return method
+
+
+def test_login_upgrades_a_hash_made_with_other_parameters(client, make_user, hash_method):
+    user = make_user(email="a@example.com", password=generate_password_hash("pw", method="pbkdf2:sha256:2000"))
+
+    response = client.post("/login", data={"email": "a@example.com", "password": "pw"})
+
+    assert response.status_code == 302 and response.headers["Location"].endswith("/dashboard")
+    db.session.refresh(user)
+    assert user.password.startswith(f"{hash_method}$")
+    assert passwords.check_password_hash(user.password, "pw")
+
+
+def test_failed_login_leaves_the_hash_alone(client, make_user, hash_method):
+    stored = generate_password_hash("pw", method="pbkdf2:sha256:2000")
+    user = make_user(email="a@example.com", password=stored)
+
+    client.post("/login", data={"email": "a@example.com", "password": "wrong"})
+
+    db.session.refresh(user)
+    assert user.password == stored
+
+
+def test_busy_form_post_flashes_and_sends_the_browser_back(client, make_user, monkeypatch):
+    make_user(email="a@example.com")
+    monkeypatch.setattr(passwords, "verify", busy)
+
+    response = client.post("/login", data={"email": "a@example.com", "password": "x"},
+                           headers={"Referer": "http://localhost/login"})
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert response.headers["Location"] == "http://localhost/login"
+    assert response.headers["Refresh"] == "0; url=http://localhost/login"
+    with client.session_transaction() as session:
+        assert session["_flashes"] == [("warning", "Server busy, try again shortly.")]
+
+
+def test_busy_form_post_ignores_foreign_referrers(client, make_user, monkeypatch):
+    make_user(email="a@example.com")
+    monkeypatch.setattr(passwords, "verify", busy)
+
+    response = client.post("/login", data={"email": "a@example.com", "password": "x"},
+                           headers={"Referer": "https://evil.example/"})
+
+    assert response.status_code == 503
+    assert response.headers["Location"] == "/"
+
+
+def test_busy_json_request_gets_json(app):
+    with app.test_request_context("/login", method="POST", json={}):
+        response = app.handle_user_exception(passwords.PasswordBusy())
+
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+        assert response.get_json()["message"] == "Server busy, try again shortly."
+        assert get_flashed_messages() == []
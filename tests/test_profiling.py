@@ -0,0 +1,42 @@
+import time
+
+import pytest
+
+import profiling
+
+
+@pytest.fixture
+def admin(app, make_user, login, monkeypatch):
+    user = make_user(email="admin@example.com")
+    monkeypatch.setitem(app.config, "ADMIN_EMAILS", {"admin@example.com"})
+    login(user)
+    yield user
+    session = profiling._session
+    if session is not None:
+        session.stop()
+        session.join()
+
+
+@pytest.mark.parametrize("seconds", ["0", "-5", "nan"])
+def test_cpu_start_rejects_non_positive_durations(client, admin, seconds):
+    response = client.post(f"/admin/profile/cpu/start?seconds={seconds}")
+
+    assert response.status_code == 400
+    assert profiling._session is None
+
+
+@pytest.mark.parametrize("seconds, expected", [("0.01", profiling.MIN_SECONDS), ("1e9", profiling.MAX_SECONDS)])
+def test_cpu_start_clamps_the_duration(client, admin, seconds, expected):
+    assert client.post(f"/admin/profile/cpu/start?seconds={seconds}").status_code == 200
+
+    assert profiling._session.deadline - time.monotonic() == pytest.approx(expected, abs=0.5)
+
+
+def test_sampler_is_always_bounded():
+    assert profiling.Sampler(seconds=0).deadline <= time.monotonic() + profiling.MIN_SECONDS
+
+
+def test_profiling_is_admin_only(client, make_user, login):
+    login(make_user())
+
+    assert client.post("/admin/profile/cpu/start").status_code == 403
@@ -0,0 +1,50 @@
+"""Query budgets for the pages that used to issue one query per row."""
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from models import db, FlightBooking
+from query_stats import query_budget
+from services import flights, gifts
+
+FLIGHT = {"flight_number": "AF123", "departure": "CDG", "arrival": "NCE", "date": "2025-03-05"}
+
+
+@pytest.mark.parametrize("passengers", [2, 20])
+def test_flights_page_loads_companions_in_one_query(client, make_user, login, passengers):
+    flight = flights.find_or_create(*FLIGHT.values())
+    for _ in range(passengers):
+        db.session.add(FlightBooking(user_id=make_user(interests='["Music"]').id, flight_id=flight.id))
+    db.session.commit()
+    login(make_user(interests='["Music"]'))
+
+    with query_budget(10, n_plus_one_threshold=3):
+        response = client.post("/flights", data=FLIGHT)
+
+    assert response.status_code == 200
+    assert response.data.count(b"fa-user me-2") == passengers
+
+
+@pytest.mark.parametrize("senders", [2, 20])
+def test_received_gifts_joins_senders(client, make_user, login, senders):
+    recipient = make_user()
+    for _ in range(senders):
+        gifts.send_gift(make_user().id, recipient.id, "Coffee")
+    login(recipient)
+
+    with query_budget(2, n_plus_one_threshold=3):
+        response = client.get("/received_gifts")
+
+    assert response.status_code == 200
+    assert response.data.count(b"Coffee") >= senders
+
+
+def test_failed_statement_does_not_leak_its_start_time(database):
+    connection = db.session.connection()
+
+    with query_budget(1) as stats:
+        with pytest.raises(OperationalError):
+            connection.execute(text("SELECT * FROM no_such_table"))
+
+    assert connection.info.get("query_start") == []
+    assert stats.count == 1
@@ -0,0 +1,89 @@
+import pytest
+
+import ratelimit
+from app import create_app
+from conftest import Client
+from query_stats import query_budget
+
+
+def test_new_bucket_starts_full():
+    assert ratelimit.refill(None, 0, rate=1, burst=10, now=100) == (9, 0)
+
+
+def test_refill_is_proportional_to_elapsed_time_and_capped_at_burst():
+    assert ratelimit.refill(0, 100, rate=0.5, burst=5, now=104) == (1, 0)
+    assert ratelimit.refill(2, 100, rate=0.5, burst=5, now=1000) == (4, 0)
+
+
+def test_empty_bucket_reports_time_until_next_token():
+    tokens, retry_after = ratelimit.refill(0, 100, rate=0.5, burst=5, now=101)
+    assert tokens == 0.5
+    assert retry_after == pytest.approx(1)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        return ratelimit.MemoryBackend()
+    return ratelimit.SQLiteBackend(str(tmp_path / "ratelimit.db"))
+
+
+def test_backend_allows_burst_then_refills(backend):
+    rate, burst = 1, 3
+    assert [backend.take("k", rate, burst, 100) for _ in range(burst)] == [0] * burst
+    assert backend.take("k", rate, burst, 100) == pytest.approx(1)
+    assert backend.take("other", rate, burst, 100) == 0
+
+    # Rejected takes leave the partial token in place, so 1.5 s later one is due.
+    assert backend.take("k", rate, burst, 100.5) == pytest.approx(0.5)
+    assert backend.take("k", rate, burst, 101.5) == 0
+    assert backend.take("k", rate, burst, 101.5) > 0
+
+
+def test_memory_backend_prunes_idle_buckets():
+    backend = ratelimit.MemoryBackend(max_keys=2)
+    backend.take("old", 1, 1, 0)
+    backend.take("recent", 1, 1, ratelimit.PRUNE_AFTER)
+    backend.take("new", 1, 1, ratelimit.PRUNE_AFTER + 1)
+    assert set(backend.buckets) == {"recent", "new"}
+
+
+@pytest.mark.parametrize("header, waited", [
+    ("t=995", 5), ("995000", 5), ("995000000", 5), ("1005", 0), (None, None), ("bogus", None),
+])
+def test_queue_seconds(header, waited):
+    assert ratelimit.queue_seconds(header, 1000.0) == waited
+
+
+@pytest.fixture
+def limited_app(database, monkeypatch):
+    monkeypatch.setenv("RATELIMIT_ENABLED", "1")
+    app = create_app()
+    app.config.update(TESTING=True, RATELIMITS={"routes.check_zone": {"ip": (0.01, 2)}})
+    app.test_client_class = Client
+    return app
+
+
+def test_over_limit_requests_get_429_before_any_database_work(limited_app, make_user):
+    client = limited_app.test_client()
+    with client.session_transaction() as session:
+        session["_user_id"] = str(make_user().id)
+    for _ in range(2):
+        assert client.post("/check_zone", json={"lat": 1, "lon": 1}).status_code == 200
+
+    with query_budget(0):
+        response = client.post("/check_zone", json={"lat": 1, "lon": 1})
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "100"
+    assert response.get_json()["status"] == "error"
+
+
+def test_ip_buckets_key_on_the_forwarded_client_address(limited_app):
+    client = limited_app.test_client()
+    one = {"X-Forwarded-For": "203.0.113.1"}
+    for _ in range(2):
+        client.post("/check_zone", json={}, headers=one)
+
+    assert client.post("/check_zone", json={}, headers=one).status_code == 429
+    assert client.post("/check_zone", json={}, headers={"X-Forwarded-For": "203.0.113.2"}).status_code != 429
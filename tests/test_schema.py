@@ -0,0 +1,81 @@
+from datetime import datetime
+
+from sqlalchemy import inspect, select, text
+
+from models import db, User
+from services import schema
+
+# Tables as the baseline schema created them, before any later columns or indexes.
+BASELINE = [
+    """CREATE TABLE users (
+        id INTEGER PRIMARY KEY, uid VARCHAR(100) NOT NULL UNIQUE, email VARCHAR(120) NOT NULL UNIQUE,
+        display_name VARCHAR(100), password VARCHAR(200), latitude FLOAT, longitude FLOAT, interests TEXT,
+        created_at DATETIME, profile_complete BOOLEAN, is_premium BOOLEAN, gift_count INTEGER,
+        flight_count INTEGER, news_count INTEGER, last_reset DATETIME)""",
+    """CREATE TABLE gifts (
+        id INTEGER PRIMARY KEY, sender_id INTEGER REFERENCES users (id),
+        recipient_id INTEGER REFERENCES users (id), gift_type VARCHAR(100), message TEXT,
+        created_at DATETIME, fee_cents INTEGER, redeemed BOOLEAN, qr_code VARCHAR(255))""",
+    """CREATE TABLE subscriptions (
+        id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL REFERENCES users (id), start_date DATETIME,
+        end_date DATETIME, is_active BOOLEAN)""",
+]
+
+
+def baseline_database():
+    db.drop_all()
+    for statement in BASELINE:
+        db.session.execute(text(statement))
+    db.session.execute(text(
+        "INSERT INTO users (id, uid, email, display_name, created_at, last_reset, gift_count, flight_count, "
+        "news_count) VALUES (:id, :uid, :email, 'U', '2024-01-01 00:00:00', '2024-01-01 00:00:00', 0, 0, 0)"),
+        [{"id": i, "uid": f"u{i}", "email": f"u{i}@example.com"} for i in (1, 2, 3)])
+    db.session.execute(text(
+        "INSERT INTO gifts (sender_id, recipient_id, gift_type, redeemed, created_at) "
+        "VALUES (:s, :r, 'Coffee', :redeemed, '2024-01-01 00:00:00')"),
+        [{"s": 1, "r": 2, "redeemed": False}, {"s": 1, "r": 2, "redeemed": True}, {"s": 3, "r": 2, "redeemed": False},
+         {"s": 2, "r": 1, "redeemed": False}])
+    db.session.commit()
+
+
+def test_migrate_adds_columns_and_backfills_counters(database):
+    baseline_database()
+
+    columns, indexes = schema.migrate(log=lambda message: None)
+
+    assert columns == len(schema.COLUMNS)
+    assert indexes == len(schema.INDEXES)
+    counters = {
+        row.id: tuple(row[1:])
+        for row in db.session.execute(
+            select(User.id, User.sent_gifts_total, User.received_gifts_total, User.unredeemed_gifts))
+    }
+    assert counters == {1: (2, 1, 1), 2: (1, 3, 2), 3: (1, 0, 0)}
+    gift_indexes = {i["name"] for i in inspect(db.engine).get_indexes("gifts")}
+    assert {"ix_gifts_sender_id", "ix_gifts_recipient_id"} <= gift_indexes
+    subscription_indexes = {i["name"] for i in inspect(db.engine).get_indexes("subscriptions")}
+    assert "ix_subscriptions_active_end_date" in subscription_indexes
+
+
+def test_migrate_backfills_updated_at_so_users_load(client, login):
+    baseline_database()
+    schema.migrate(log=lambda message: None)
+
+    user = db.session.get(User, 1)
+    assert user.updated_at == datetime(2024, 1, 1)
+    login(user)
+    assert client.get("/sent_gifts").status_code == 200
+
+
+def test_migrate_is_idempotent(database):
+    baseline_database()
+    schema.migrate(log=lambda message: None)
+
+    assert schema.migrate(log=lambda message: None) == (0, 0)
+
+
+def test_dry_run_changes_nothing(database):
+    baseline_database()
+
+    assert schema.migrate(dry_run=True, log=lambda message: None) == (len(schema.COLUMNS), len(schema.INDEXES))
+    assert "sent_gifts_total" not in {c["name"] for c in inspect(db.engine).get_columns("users")}
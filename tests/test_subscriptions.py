@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event, text
+
+from models import db, Job, Subscription, User
+from services import subscriptions
+
+
+def test_expires_only_due_subscriptions(make_user):
+    now = datetime.utcnow()
+    due, current = make_user(is_premium=True), make_user(is_premium=True)
+    db.session.add_all([
+        Subscription(user_id=due.id, end_date=now - timedelta(days=1)),
+        Subscription(user_id=current.id, end_date=now + timedelta(days=1)),
+    ])
+    db.session.commit()
+
+    assert subscriptions.expire_due_subscriptions(now, batch_size=1) == 1
+    assert not db.session.get(User, due.id).is_premium
+    assert db.session.get(User, current.id).is_premium
+    assert Subscription.query.filter_by(is_active=True).count() == 1
+
+
+def test_failing_sweep_still_reschedules(database, monkeypatch):
+    def broken(*args, **kwargs):
+        raise RuntimeError("database unavailable")
+    monkeypatch.setattr(subscriptions, "expire_due_subscriptions", broken)
+
+    with pytest.raises(RuntimeError):
+        subscriptions.sweep()
+    assert Job.query.filter_by(name="subscriptions.expire", status="queued").count() == 1
+
+
+def test_renewal_during_the_sweep_keeps_premium(make_user):
+    now = datetime.utcnow()
+    user = make_user(is_premium=True)
+    subscription = Subscription(user_id=user.id, end_date=now - timedelta(days=1), is_active=True)
+    db.session.add(subscription)
+    db.session.commit()
+
+    # /upgrade commits a renewal after the sweep's SELECT, before its UPDATEs.
+    renewed = []
+
+    @event.listens_for(db.session, "do_orm_execute")
+    def renew(state):
+        if state.is_update and not renewed:
+            renewed.append(True)
+            state.session.execute(text("UPDATE subscriptions SET end_date = :end WHERE id = :id"),
+                                  {"end": now + timedelta(days=30), "id": subscription.id})
+
+    try:
+        subscriptions.expire_due_subscriptions(now)
+    finally:
+        event.remove(db.session, "do_orm_execute", renew)
+
+    assert renewed
+    assert db.session.get(Subscription, subscription.id).is_active
+    assert db.session.get(User, user.id).is_premium
+
+
+def test_user_with_another_active_subscription_keeps_premium(make_user):
+    now = datetime.utcnow()
+    user = make_user(is_premium=True)
+    db.session.add_all([
+        Subscription(user_id=user.id, end_date=now - timedelta(days=1), is_active=True),
+        Subscription(user_id=user.id, end_date=now + timedelta(days=30), is_active=True),
+    ])
+    db.session.commit()
+
+    assert subscriptions.expire_due_subscriptions(now) == 1
+    assert db.session.get(User, user.id).is_premium
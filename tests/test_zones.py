@@ -0,0 +1,45 @@
+import json
+import os
+import random
+
+from models import db, Zone
+from zones import cell, haversine, zone_candidates, zones_at
+
+
+def _zone(name, lat, lon, radius, interest="Music"):
+    return Zone(name=name, latitude=lat, longitude=lon, radius_meters=radius, interest=interest)
+
+
+def test_candidates_give_the_same_answer_anywhere_in_the_cell():
+    rng = random.Random(1)
+    zones = [_zone(f"z{i}", 48.8566 + rng.uniform(-0.003, 0.003), 2.3522 + rng.uniform(-0.003, 0.003),
+                   rng.choice([15, 30, 80])) for i in range(300)]
+    for _ in range(200):
+        lat, lon = 48.8566 + rng.uniform(-0.002, 0.002), 2.3522 + rng.uniform(-0.002, 0.002)
+        candidates = zone_candidates(*cell(lat, lon), zones)
+        assert zones_at(lat, lon, {"Music"}, candidates) == zones_at(lat, lon, {"Music"}, zones)
+
+
+def test_check_zone_uses_each_users_exact_position(app, client, make_user, login):
+    db.session.add(_zone("Bar", 48.85660, 2.35220, 15))
+    db.session.commit()
+    user = make_user(interests=json.dumps(["Music"]))
+    login(user)
+
+    # Both points round to the same 4- and 3-decimal cell; only the first is within 15 m.
+    inside, outside = (48.85672, 2.35220), (48.85674, 2.35220)
+    assert haversine(48.8566, 2.3522, *inside) < 15 < haversine(48.8566, 2.3522, *outside)
+    zones = [client.post("/check_zone", json={"lat": lat, "lon": lon}).get_json()["zones"]
+             for lat, lon in (inside, outside)]
+
+    assert zones == [[{"zone_name": "Bar", "interest": "Music"}], []]
+
+
+def test_matches_are_not_written_to_disk(app, client, make_user, login):
+    me = make_user(latitude=48.8566, longitude=2.3522, interests=json.dumps(["Music"]))
+    make_user(latitude=48.8570, longitude=2.3530, interests=json.dumps(["Music"]))
+    login(me)
+
+    assert client.get("/matches").status_code == 200
+    directory = app.config["SINGLEFLIGHT_DIR"]
+    assert not os.path.isdir(directory) or not os.listdir(directory)
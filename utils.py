@@ -1,17 +1,15 @@
 import os
 import logging
-import qrcode
 import io
 import base64
-import requests
 from datetime import datetime
-from firebase_admin import auth, firestore
 from app import db
 from models import User, Gift, FlightBooking
 
 def verify_firebase_token(token):
     """Verify Firebase ID token and return user data"""
     try:
+        from firebase_admin import auth
         decoded_token = auth.verify_id_token(token)
         return decoded_token
     except Exception as e:
@@ -68,6 +66,8 @@ def update_user_interests(uid, interests):
 def generate_gift_qr(gift_id):
     """Generate QR code for a digital gift"""
     try:
+        import qrcode
+
         # Create QR code with gift redemption URL
         qr_data = f"https://wingoo.app/redeem/{gift_id}"
         qr = qrcode.QRCode(version=1, box_size=10, border=5)
@@ -165,7 +165,9 @@ def get_personalized_news(interests):
         news_api_key = os.environ.get('NEWS_API_KEY')
         if not news_api_key:
             return []
-        
+
+        from services import upstream
+
         # Convert interests to news categories
         category_map = {
             'Technology': 'technology',
@@ -175,26 +177,31 @@ def get_personalized_news(interests):
             'Music': 'entertainment',
             'Cinema': 'entertainment'
         }
-        
-        articles = []
-        for interest in interests[:3]:  # Limit to 3 interests
-            category = category_map.get(interest, 'general')
-            
-            url = f"https://newsapi.org/v2/top-headlines"
-            params = {
+
+        # One request per interest, all in flight at once
+        url = os.environ.get('NEWS_API_URL', 'https://newsapi.org/v2') + "/top-headlines"
+        selected = interests[:3]  # Limit to 3 interests
+        calls = [
+            ("GET", url, {"params": {
                 'apiKey': news_api_key,
-                'category': category,
+                'category': category_map.get(interest, 'general'),
                 'language': 'en',
                 'pageSize': 5
-            }
-            
-            response = requests.get(url, params=params)
+            }})
+            for interest in selected
+        ]
+
+        articles = []
+        for interest, response in zip(selected, upstream.fetch_all(calls, deadline=10)):
+            if isinstance(response, upstream.UpstreamError):
+                logging.warning(f"News fetch for {interest} failed: {response}")
+                continue
             if response.status_code == 200:
                 data = response.json()
                 for article in data.get('articles', []):
                     article['interest_category'] = interest
                     articles.append(article)
-        
+
         return articles[:10]  # Return max 10 articles
         
     except Exception as e:
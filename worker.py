@@ -0,0 +1,23 @@
+import logging
+import signal
+
+from app import create_app
+from services import jobs, subscriptions
+
+app = create_app()
+stopping = False
+
+
+def stop(signum, frame):
+    global stopping
+    stopping = True
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    with app.app_context():
+        subscriptions.schedule_sweep()
+        jobs.schedule_purge()
+        jobs.work(should_stop=lambda: stopping)
@@ -1,5 +1,10 @@
 
 import math
+from types import SimpleNamespace
+
+CELL_DECIMALS = 3
+# A point is at most half a cell diagonal (~79 m) from its rounded cell centre.
+CELL_MARGIN_METERS = 0.5 * 10 ** -CELL_DECIMALS * 111320 * math.sqrt(2)
 
 def haversine(lat1, lon1, lat2, lon2):
     R = 6371.0
@@ -15,3 +20,35 @@ def haversine(lat1, lon1, lat2, lon2):
 
     distance_km = R * c
     return distance_km * 1000 
+
+
+def cell(lat, lon):
+    """Centre of the ~110 m grid cell containing (lat, lon)."""
+    return round(lat, CELL_DECIMALS), round(lon, CELL_DECIMALS)
+
+
+def zone_candidates(lat, lon, zones):
+    """Snapshots of the zones that could cover any point of the cell centred on (lat, lon).
+
+    ``zones_at`` over the candidates gives the same answer as over every zone
+    for each point in the cell.
+    """
+    return [
+        SimpleNamespace(name=zone.name, latitude=zone.latitude, longitude=zone.longitude,
+                        radius_meters=zone.radius_meters, interest=zone.interest)
+        for zone in zones
+        if haversine(lat, lon, zone.latitude, zone.longitude) <= zone.radius_meters + CELL_MARGIN_METERS
+    ]
+
+
+def zones_at(lat, lon, interests, zones):
+    """Zones whose radius covers (lat, lon) and whose interest is in ``interests``."""
+    matches = []
+    for zone in zones:
+        distance = haversine(lat, lon, zone.latitude, zone.longitude)
+        if distance <= zone.radius_meters and zone.interest in interests:
+            matches.append({
+                "zone_name": zone.name,
+                "interest": zone.interest
+            })
+    return matches